@@ -1,6 +1,8 @@
 from flask import Flask, render_template, request, redirect, url_for, flash
 import os
+import re
 import json
+import unicodedata
 
 app = Flask(__name__)
 app.secret_key = "secret_key_for_flash_messages"
@@ -26,16 +28,69 @@ class Book:
         return cls(data["book_id"], data["title"], data["author"], data["is_borrowed"])
 
 
+# Search index for the web catalog: every three-letter piece of a book's normalized title
+# and author (case-folded, accents stripped) points at the books containing it, so a search
+# only looks at books holding all the pieces of its words. Each word must appear in the
+# title or author; books matching on the title come first, then the rest in listing order.
+class SearchIndex:
+    WORD = re.compile(r"\w+")
+
+    def __init__(self, books):
+        self.grams = {}  # three-letter piece -> IDs of the books containing it
+        self.entries = {}  # book ID -> (book, normalized title, normalized author, position)
+        self.position = 0
+        for book in books:
+            self.add(book)
+
+    @classmethod
+    def words(cls, text):
+        decomposed = unicodedata.normalize("NFKD", text)
+        return cls.WORD.findall("".join(char for char in decomposed if not unicodedata.combining(char)).casefold())
+
+    @staticmethod
+    def grams_in(words):
+        return {word[i:i + 3] for word in words for i in range(len(word) - 2)}
+
+    def add(self, book):
+        title, author = " ".join(self.words(book.title)), " ".join(self.words(book.author))
+        self.entries[book.book_id] = (book, title, author, self.position)
+        self.position += 1
+        for gram in self.grams_in((title + " " + author).split()):
+            self.grams.setdefault(gram, set()).add(book.book_id)
+
+    def remove(self, book_id):
+        entry = self.entries.pop(book_id, None)
+        if entry is None:
+            return
+        for gram in self.grams_in((entry[1] + " " + entry[2]).split()):
+            self.grams[gram].discard(book_id)
+
+    def search(self, query):
+        words = self.words(query)
+        candidates = set(self.entries)
+        for gram in self.grams_in(words):
+            candidates &= self.grams.get(gram, set())
+        results = []
+        for book_id in candidates:
+            book, title, author, position = self.entries[book_id]
+            if all(word in title or word in author for word in words):
+                results.append((not all(word in title for word in words), position, book))
+        results.sort(key=lambda result: result[:2])
+        return [book for _, _, book in results]
+
+
 class Library:
     FILE_PATH = "library_books.json"
 
     def __init__(self):
         self.books = self.load_books()
+        self.index = SearchIndex(self.books)
 
     def add_book(self, book):
         if any(b.book_id == book.book_id for b in self.books):
             return False
         self.books.append(book)
+        self.index.add(book)
         self.save_books()
         return True
 
@@ -43,12 +98,13 @@ class Library:
         for book in self.books:
             if book.book_id == book_id:
                 self.books.remove(book)
+                self.index.remove(book_id)
                 self.save_books()
                 return True
         return False
 
     def search_books(self, keyword):
-        return [book for book in self.books if keyword.lower() in book.title.lower() or keyword.lower() in book.author.lower()]
+        return self.index.search(keyword)
 
     def borrow_book(self, book_id):
         for book in self.books:
@@ -0,0 +1,50 @@
+import importlib.util
+import os
+
+import pytest
+
+# The catalog app is the top-level app.py, which the app package shadows on import
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "app.py")
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # app.py loads library_books.json from the working directory
+    spec = importlib.util.spec_from_file_location("catalog_app", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def ids(books):
+    return [book.book_id for book in books]
+
+
+class TestSearch():
+    def test_accents_and_case_are_ignored(self, catalog):
+        library = catalog.Library()
+        library.add_book(catalog.Book("1", "Les Misérables", "Victor Hugo"))
+        library.add_book(catalog.Book("2", "Cien años de soledad", "Gabriel García Márquez"))
+        assert ids(library.search_books("MISERABLES")) == ["1"]
+        assert ids(library.search_books("garcia")) == ["2"]
+        assert ids(library.search_books("Años")) == ["2"]
+
+    def test_every_word_must_match_and_titles_come_first(self, catalog):
+        library = catalog.Library()
+        library.add_book(catalog.Book("1", "The Old Man and the Sea", "Ernest Hemingway"))
+        library.add_book(catalog.Book("2", "Hugo's Journey", "Someone"))
+        library.add_book(catalog.Book("3", "Notre-Dame de Paris", "Victor Hugo"))
+        assert ids(library.search_books("old sea")) == ["1"]
+        assert ids(library.search_books("old paris")) == []
+        assert ids(library.search_books("hugo")) == ["2", "3"]
+        assert ids(library.search_books("")) == ["1", "2", "3"]
+
+    def test_added_and_removed_books_are_found_or_not(self, catalog):
+        library = catalog.Library()
+        library.add_book(catalog.Book("1", "Dune", "Frank Herbert"))
+        assert ids(library.search_books("dune")) == ["1"]
+        library.add_book(catalog.Book("2", "Dune Messiah", "Frank Herbert"))
+        assert ids(library.search_books("herbert")) == ["1", "2"]
+        library.remove_book("1")
+        assert ids(library.search_books("dune")) == ["2"]
+        assert ids(catalog.Library().search_books("messiah")) == ["2"]  # reloaded from the saved file
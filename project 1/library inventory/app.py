@@ -1,12 +1,23 @@
 import os
+import re
+import sys
+import csv
 import json
+import time
+import shlex
+import argparse
+import unicodedata
+from contextlib import contextmanager
 
 # Book and Library classes
 class Book:
+    # No per-book __dict__; large inventories hold a million of these
+    __slots__ = ("book_id", "title", "author", "quantity", "borrowed")
+
     def __init__(self, book_id, title, author, quantity, borrowed=0):
         self.book_id = book_id
         self.title = title
-        self.author = author
+        self.author = sys.intern(author)  # one shared string per author, however many books they wrote
         self.quantity = quantity  # Total quantity of the book
         self.borrowed = borrowed  # Number of borrowed copies
 
@@ -23,68 +34,303 @@ class Book:
         }
 
     @classmethod
-    def from_dict(cls, data): 
+    def from_dict(cls, data):
+        # Saved files may have been edited by hand; say which book is wrong instead of failing deep inside
+        for field in ("title", "author"):
+            if not isinstance(data[field], str):
+                raise ValueError(f"book {data['book_id']!r}: {field} must be text, not {data[field]!r}")
         return cls(data["book_id"], data["title"], data["author"], data["quantity"], data["borrowed"])
 
 
+# Append-only change log: one JSON line per change, each holding the book's new state
+# (or its removal), so replaying a record twice is harmless. Lines are flushed as they
+# are written and fsynced every SYNC_EVERY changes or SYNC_INTERVAL seconds; a torn
+# last line left by a crash is ignored on replay and cut off when the journal reopens.
+class Journal:
+    SYNC_EVERY = 64
+    SYNC_INTERVAL = 1.0  # seconds
+
+    def __init__(self, path):
+        self.path = path
+        records, valid_bytes = self.read(path)
+        self.records = len(records)
+        self.file = open(path, "ab")
+        self.file.truncate(valid_bytes)
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    @staticmethod
+    def read(path):
+        # Returns (records, bytes up to the end of the last complete record)
+        if not os.path.exists(path):
+            return [], 0
+        with open(path, "rb") as file:
+            data = file.read()
+        records, offset = [], 0
+        while True:
+            end = data.find(b"\n", offset)
+            if end == -1:
+                break
+            try:
+                records.append(json.loads(data[offset:end]))
+            except ValueError:
+                break
+            offset = end + 1
+        return records, offset
+
+    def append(self, record):
+        self.file.write(json.dumps(record).encode() + b"\n")
+        self.file.flush()
+        self.records += 1
+        self.pending += 1
+        if self.pending >= self.SYNC_EVERY or time.monotonic() - self.last_sync >= self.SYNC_INTERVAL:
+            self.sync()
+
+    def sync(self):
+        if self.pending:
+            os.fsync(self.file.fileno())
+            self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def reset(self):
+        # Called once a snapshot holding every change is safely in place
+        self.file.truncate(0)
+        self.sync()
+        self.records = 0
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+
+# Search index. Titles and authors are normalized once (case-folded, accents stripped,
+# words joined by single spaces) and every three-letter piece of their words points at
+# the books containing it, so a query only checks the books holding all the pieces of
+# its words instead of scanning every book. Each query word must appear in the title or
+# author; results come back best match first, then in listing order. The index is built
+# on the first search, so runs that never search don't pay for it, and is kept up to
+# date by add and remove from then on.
+class SearchIndex:
+    WORD = re.compile(r"\w+")
+
+    def __init__(self, books):
+        self.books = books  # the library's live collection of books, read when the index is built
+        self.grams = None  # three-letter piece -> IDs of the books containing it
+        self.entries = {}  # book ID -> (book, normalized title, normalized author, position)
+        self.position = 0
+
+    def build(self):
+        self.grams = {}
+        for book in self.books:
+            self.add(book)
+
+    @staticmethod
+    def normalize(text):
+        if text.isascii():
+            return text.lower()
+        decomposed = unicodedata.normalize("NFKD", text)
+        return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+    @staticmethod
+    def grams_of(word):
+        return {word[i:i + 3] for i in range(len(word) - 2)}
+
+    @staticmethod
+    def grams_in(key):
+        return {word[i:i + 3] for word in key.split() for i in range(len(word) - 2)}
+
+    def key(self, text):
+        # " the hobbit ": padded, so " word " and " word" find whole words and word starts
+        return " " + " ".join(self.WORD.findall(self.normalize(text))) + " "
+
+    def add(self, book):
+        if self.grams is None:
+            return
+        title, author = self.key(book.title), self.key(book.author)
+        self.entries[book.book_id] = (book, title, author, self.position)
+        self.position += 1
+        grams = self.grams
+        for gram in self.grams_in(title + author):
+            ids = grams.get(gram)
+            if ids is None:
+                grams[gram] = {book.book_id}
+            else:
+                ids.add(book.book_id)
+
+    def remove(self, book_id):
+        entry = self.entries.pop(book_id, None)
+        if entry is None:
+            return
+        for gram in self.grams_in(entry[1] + entry[2]):
+            ids = self.grams[gram]
+            ids.discard(book_id)
+            if not ids:
+                del self.grams[gram]
+
+    def search(self, query):
+        if self.grams is None:
+            self.build()
+        words = self.WORD.findall(self.normalize(query))
+        if not words:
+            return [entry[0] for entry in self.entries.values()]
+        postings = [self.grams.get(gram, set()) for word in words for gram in self.grams_of(word)]
+        if postings:
+            postings.sort(key=len)
+            candidates = postings[0].intersection(*postings[1:])
+        else:
+            candidates = self.entries  # only one- and two-letter words: check every book
+        phrase = " " + " ".join(words)
+        results = []
+        for book_id in candidates:
+            book, title, author, position = self.entries[book_id]
+            score = self.score(words, phrase, title, author)
+            if score:
+                results.append((-score, position, book))
+        results.sort()  # positions are unique, so books themselves are never compared
+        return [book for _, _, book in results]
+
+    def score(self, words, phrase, title, author):
+        # Title beats author; a whole word beats the start of a word beats the middle of one
+        score = 5 if phrase in title else 0
+        for word in words:
+            for text, weight in ((title, 3), (author, 2)):
+                if word in text:
+                    score += weight + (2 if f" {word} " in text else 1 if f" {word}" in text else 0)
+                    break
+            else:
+                return 0
+        return score
+
 
 class Library:
     FILE_PATH = "library_books.json"
+    JOURNAL_PATH = "library_books.journal"
+    COMPACT_MIN = 1000  # journal records before it may be folded into a new snapshot
 
-    def __init__(self):
+    def __init__(self, journal=False):
+        # Books keyed by ID; dicts keep insertion order, so listing order is unchanged
         self.books = self.load_books()
+        # In journal mode each change appends a record instead of rewriting the whole file
+        self.journal = Journal(self.JOURNAL_PATH) if journal else None
+        self.index = SearchIndex(self.books.values())
+        self.deferred = None  # IDs changed inside batch(), saved when it ends
+
+    def get_book(self, book_id):
+        return self.books.get(book_id)
 
     def add_book(self, book):
-        for b in self.books:
-            if b.book_id == book.book_id:
-                b.quantity += book.quantity
-                self.save_books()
-                return True
-        self.books.append(book)
-        self.save_books()
+        existing = self.books.get(book.book_id)
+        if existing:
+            existing.quantity += book.quantity
+        else:
+            self.books[book.book_id] = book
+            self.index.add(book)
+        self.save_book(book.book_id)
         return True
 
     def remove_book(self, book_id):
-        for book in self.books:
-            if book.book_id == book_id:
-                self.books.remove(book)
-                self.save_books()
-                return True
-        return False
+        if self.books.pop(book_id, None) is None:
+            return False
+        self.index.remove(book_id)
+        self.save_book(book_id)
+        return True
 
-    def borrow_book(self, book_id):
-        for book in self.books:
-            if book.book_id == book_id and book.available_quantity() > 0:
-                book.borrowed += 1
-                self.save_books()
-                return True
+    def borrow_book(self, book_id, copies=1):
+        book = self.books.get(book_id)
+        if book and book.available_quantity() >= copies:
+            book.borrowed += copies
+            self.save_book(book_id)
+            return True
         return False
 
-    def return_book(self, book_id):
-        for book in self.books:
-            if book.book_id == book_id and book.borrowed > 0:
-                book.borrowed -= 1
-                self.save_books()
-                return True
+    def return_book(self, book_id, copies=1):
+        book = self.books.get(book_id)
+        if book and book.borrowed >= copies:
+            book.borrowed -= copies
+            self.save_book(book_id)
+            return True
         return False
 
     def list_books(self):
-        return self.books
+        return list(self.books.values())
+
+    def search_books(self, keyword):
+        return self.index.search(keyword)
+
+    @contextmanager
+    def batch(self):
+        # Apply any number of changes in memory and persist them together at the end:
+        # one snapshot, or in journal mode one record per changed book and one fsync
+        self.deferred = set()
+        try:
+            yield
+        except BaseException:
+            self.deferred = None
+            raise
+        changed, self.deferred = self.deferred, None
+        if not changed:
+            return
+        if not self.journal:
+            self.save_books()
+            return
+        for book_id in changed:
+            self.save_book(book_id)
+        self.journal.sync()
+
+    def save_book(self, book_id):
+        # Persist one book's current state (or its removal)
+        if self.deferred is not None:
+            self.deferred.add(book_id)
+            return
+        if not self.journal:
+            self.save_books()
+            return
+        book = self.books.get(book_id)
+        if book:
+            self.journal.append({"op": "put", "book": book.to_dict()})
+        else:
+            self.journal.append({"op": "remove", "book_id": book_id})
+        # Compacting once the journal is as long as the inventory keeps the cost per change constant
+        if self.journal.records >= max(self.COMPACT_MIN, len(self.books)):
+            self.save_books()
 
     def save_books(self):
-        with open(self.FILE_PATH, "w") as file:
-            json.dump([book.to_dict() for book in self.books], file)
+        # Write a full snapshot next to the old one and swap it in, so a crash leaves one or the other
+        temp_path = self.FILE_PATH + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump([book.to_dict() for book in self.books.values()], file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.FILE_PATH)
+        sync_directory(self.FILE_PATH)
+        if self.journal:
+            self.journal.reset()
+        elif os.path.exists(self.JOURNAL_PATH):
+            os.remove(self.JOURNAL_PATH)
 
     def load_books(self):
+        books = {}
         if os.path.exists(self.FILE_PATH):
             with open(self.FILE_PATH, "r") as file:
-                data = json.load(file)
-                return [Book.from_dict(item) for item in data]
-        return []
+                # Each record becomes a Book as it is parsed, so its dict is freed right away
+                data = json.load(file, object_hook=Book.from_dict)
+                books = {book.book_id: book for book in data}
+        # Changes made since that snapshot
+        for record in Journal.read(self.JOURNAL_PATH)[0]:
+            if record["op"] == "put":
+                book = Book.from_dict(record["book"])
+                books[book.book_id] = book
+            else:
+                books.pop(record["book_id"], None)
+        return books
+
+    def close(self):
+        if self.journal:
+            self.journal.close()
 
     def search_and_select_books(self):
         keyword = input("Enter keyword to search: ")
-        found_books = [book for book in self.books if keyword.lower() in book.title.lower() or keyword.lower() in book.author.lower()]
+        found_books = self.search_books(keyword)
         
         if found_books:
             print("\nSearch Results:")
@@ -130,8 +376,19 @@ class Library:
                 break
 
 
-# Initialize library
-library = Library()
+# Make a renamed file's new directory entry durable (not possible on Windows)
+def sync_directory(path):
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# Initialize library; LIBRARY_JOURNAL=1 turns on journal mode
+library = Library(journal=os.environ.get("LIBRARY_JOURNAL") == "1")
 
 # Main menu function
 def main_menu():
@@ -161,6 +418,7 @@ def main_menu():
         elif choice == "6":
             return_book()       
         elif choice == "7":
+            library.close()
             print("Exiting the system. Goodbye!")
             break
 
@@ -192,67 +450,63 @@ def add_book():
 # Function to remove a book
 def remove_book():
     book_id = input("Enter Book ID to remove: ")
+    book = library.get_book(book_id)
+    if not book:
+        print("Book not found. Please try again.")
+        return
+
+    print(f"Total copies available: {book.quantity}")
+    copies_to_remove = int(input("Enter number of copies to remove: "))
     
-    for book in library.books:
-        if book.book_id == book_id:
-            print(f"Total copies available: {book.quantity}")
-            copies_to_remove = int(input("Enter number of copies to remove: "))
-            
-            if copies_to_remove > book.quantity:
-                print("Error: You cannot remove more copies than currently available.")
-                return
-            
-            book.quantity -= copies_to_remove
-            
-            if book.quantity == 0:
-                library.books.remove(book)
-                print("All copies removed. Book deleted from the library.")
-            else:
-                library.save_books()
-                print(f"{copies_to_remove} copies removed. Remaining copies: {book.quantity}")
-            
-            return
+    if copies_to_remove > book.quantity:
+        print("Error: You cannot remove more copies than currently available.")
+        return
+    
+    book.quantity -= copies_to_remove
     
-    print("Book not found. Please try again.")
+    if book.quantity == 0:
+        library.remove_book(book_id)
+        print("All copies removed. Book deleted from the library.")
+    else:
+        library.save_book(book_id)
+        print(f"{copies_to_remove} copies removed. Remaining copies: {book.quantity}")
 
 def borrow_book():
     book_id = input("Enter Book ID to borrow: ")
+    book = library.get_book(book_id)
+    if not book:
+        print("Book not found. Please try again.")
+        return
+
+    print(f"Total copies available: {book.available_quantity()}")
+    copies_to_borrow = int(input("Enter number of copies to borrow: "))
     
-    for book in library.books:
-        if book.book_id == book_id:
-            print(f"Total copies available: {book.available_quantity()}")
-            copies_to_borrow = int(input("Enter number of copies to borrow: "))
-            
-            if copies_to_borrow > book.available_quantity():
-                print("Error: Not enough copies available to borrow.")
-                return
-            
-            book.borrowed += copies_to_borrow
-            library.save_books()
-            print(f"{copies_to_borrow} copies borrowed successfully.")
-            return
+    if copies_to_borrow > book.available_quantity():
+        print("Error: Not enough copies available to borrow.")
+        return
     
-    print("Book not found. Please try again.")
+    book.borrowed += copies_to_borrow
+    library.save_book(book_id)
+    print(f"{copies_to_borrow} copies borrowed successfully.")
 
 
 def return_book():
     book_id = input("Enter Book ID to return: ")
+    book = library.get_book(book_id)
+    if not book:
+        print("Book not found. Please try again.")
+        return
+
+    print(f"Copies currently borrowed: {book.borrowed}")
+    copies_to_return = int(input("Enter number of copies to return: "))
     
-    for book in library.books:
-        if book.book_id == book_id:
-            print(f"Copies currently borrowed: {book.borrowed}")
-            copies_to_return = int(input("Enter number of copies to return: "))
-            
-            if copies_to_return > book.borrowed:
-                print("Error: You cannot return more copies than you have borrowed.")
-                return
-            
-            book.borrowed -= copies_to_return
-            library.save_books()
-            print(f"{copies_to_return} copies returned successfully.")
-            return
+    if copies_to_return > book.borrowed:
+        print("Error: You cannot return more copies than you have borrowed.")
+        return
     
-    print("Book not found. Please try again.")
+    book.borrowed -= copies_to_return
+    library.save_book(book_id)
+    print(f"{copies_to_return} copies returned successfully.")
 
 
 # Helper function to handle input with validation
@@ -264,6 +518,231 @@ def get_input(prompt, valid_options):
         print("Invalid input. Please try again.")
 
 
-# Run the program
+# Command-line interface. Every command prints one JSON object per line; "run" reads
+# commands (in the same syntax, one per line) from a file or stdin. All changes of one
+# invocation are applied in memory and persisted with a single write at the end.
+class CommandError(Exception):
+    pass
+
+
+class CommandParser(argparse.ArgumentParser):
+    def error(self, message):
+        raise CommandError(message)
+
+
+# For lines of a script: asking for help fails the line instead of printing it and exiting
+class ScriptParser(CommandParser):
+    def print_help(self, file=None):
+        raise CommandError("help is not available in scripts")
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive number, got {value}")
+    return number
+
+
+def build_parser(parser_class=CommandParser):
+    parser = parser_class(prog="app.py", description="Library inventory. Run without a command for the interactive menu.")
+    commands = parser.add_subparsers(dest="command", metavar="command", parser_class=parser_class)
+
+    commands.add_parser("list", help="list every book")
+
+    add = commands.add_parser("add", help="add a book, or copies of one already listed")
+    add.add_argument("book_id")
+    add.add_argument("title")
+    add.add_argument("author")
+    add.add_argument("quantity", type=positive_int, nargs="?", default=1)
+
+    remove = commands.add_parser("remove", help="remove copies of a book, or the whole book")
+    remove.add_argument("book_id")
+    remove.add_argument("--copies", type=positive_int, help="default: every copy")
+
+    for name, verb in (("borrow", "borrow"), ("return", "return")):
+        command = commands.add_parser(name, help=f"{verb} copies of a book")
+        command.add_argument("book_id")
+        command.add_argument("--copies", type=positive_int, default=1)
+
+    search = commands.add_parser("search", help="search titles and authors, best match first")
+    search.add_argument("keyword", nargs="+")
+    search.add_argument("--limit", type=positive_int)
+
+    for name, verb, direction in (("import", "add books from", "read"), ("export", "write every book to", "write")):
+        command = commands.add_parser(name, help=f"{verb} a JSON or CSV file")
+        command.add_argument("path", help=f"file to {direction}, or - for standard {'input' if direction == 'read' else 'output'}")
+        command.add_argument("--format", choices=["json", "csv"], help="default: from the file extension, else json")
+
+    run = commands.add_parser("run", help="run commands from a file or standard input, one per line")
+    run.add_argument("path", nargs="?", default="-")
+    return parser
+
+
+def file_format(args):
+    return args.format or ("csv" if args.path.lower().endswith(".csv") else "json")
+
+
+@contextmanager
+def open_path(path, mode):
+    if path == "-":
+        yield sys.stdin if mode == "r" else sys.stdout
+    else:
+        with open(path, mode, newline="" if mode == "w" else None) as file:
+            yield file
+
+
+def find_book(book_id):
+    book = library.get_book(book_id)
+    if not book:
+        raise CommandError(f"book {book_id} not found")
+    return book
+
+
+def command_list(args):
+    return {"books": [book.to_dict() for book in library.list_books()]}
+
+
+def command_add(args):
+    library.add_book(Book(args.book_id, args.title, args.author, args.quantity))
+    return {"book": library.get_book(args.book_id).to_dict()}
+
+
+def command_remove(args):
+    book = find_book(args.book_id)
+    copies = args.copies or book.quantity
+    # Copies on loan stay in the inventory until they are returned
+    if copies > book.available_quantity():
+        raise CommandError(f"only {book.available_quantity()} copies to remove, {book.borrowed} on loan")
+    book.quantity -= copies
+    if book.quantity == 0:
+        library.remove_book(args.book_id)
+        return {"removed": True, "book_id": args.book_id}
+    library.save_book(args.book_id)
+    return {"removed": False, "book": book.to_dict()}
+
+
+def command_borrow(args):
+    book = find_book(args.book_id)
+    if not library.borrow_book(args.book_id, args.copies):
+        raise CommandError(f"only {book.available_quantity()} copies available")
+    return {"book": book.to_dict()}
+
+
+def command_return(args):
+    book = find_book(args.book_id)
+    if not library.return_book(args.book_id, args.copies):
+        raise CommandError(f"only {book.borrowed} copies borrowed")
+    return {"book": book.to_dict()}
+
+
+def command_search(args):
+    books = library.search_books(" ".join(args.keyword))
+    return {"count": len(books), "books": [book.to_dict() for book in books[:args.limit]]}
+
+
+def command_import(args):
+    with open_path(args.path, "r") as file:
+        if file_format(args) == "csv":
+            rows = csv.DictReader(file)
+        else:
+            rows = json.load(file)
+        # Every record is checked before any is added, so a bad file changes nothing
+        books = []
+        for number, row in enumerate(rows, start=1):
+            try:
+                book = Book(str(row["book_id"]), str(row["title"]), str(row["author"]), int(row["quantity"]), int(row.get("borrowed") or 0))
+            except KeyError as e:
+                raise CommandError(f"record {number}: missing {e}")
+            except (AttributeError, TypeError, ValueError) as e:
+                raise CommandError(f"record {number}: {e}")
+            if book.quantity < 1:
+                raise CommandError(f"record {number}: quantity must be at least 1")
+            if not 0 <= book.borrowed <= book.quantity:
+                raise CommandError(f"record {number}: borrowed must be between 0 and the quantity")
+            books.append(book)
+    for book in books:
+        library.add_book(book)
+    return {"imported": len(books)}
+
+
+def command_export(args):
+    books = (book.to_dict() for book in library.list_books())
+    with open_path(args.path, "w") as file:
+        if file_format(args) == "csv":
+            writer = csv.DictWriter(file, fieldnames=["book_id", "title", "author", "quantity", "borrowed"])
+            writer.writeheader()
+            writer.writerows(books)
+        else:
+            json.dump(list(books), file)
+            file.write("\n")
+    return {"exported": len(library.books), "path": args.path}
+
+
+COMMANDS = {
+    "list": command_list,
+    "add": command_add,
+    "remove": command_remove,
+    "borrow": command_borrow,
+    "return": command_return,
+    "search": command_search,
+    "import": command_import,
+    "export": command_export,
+}
+
+
+def run_command(args, **context):
+    # Prints the command's result (or error) as one JSON line; returns whether it succeeded
+    try:
+        result = {"op": args.command, "ok": True, **context, **COMMANDS[args.command](args)}
+    except (CommandError, OSError, ValueError) as e:
+        result = {"op": args.command, "ok": False, **context, "error": str(e)}
+    if args.command == "export" and args.path == "-" and result["ok"]:
+        return True  # the books themselves went to standard output
+    print(json.dumps(result))
+    return result["ok"]
+
+
+def run_script(path):
+    parser = build_parser(ScriptParser)
+    ok = True
+    with open_path(path, "r") as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            try:
+                args = parser.parse_args(shlex.split(line))
+                if args.command in (None, "run"):
+                    raise CommandError("expected one of: " + ", ".join(COMMANDS))
+            except (CommandError, ValueError) as e:
+                print(json.dumps({"op": None, "ok": False, "line": number, "error": str(e)}))
+                ok = False
+                continue
+            ok = run_command(args, line=number) and ok
+    return ok
+
+
+def main(argv):
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except CommandError as e:
+        parser.print_usage(sys.stderr)
+        print(f"app.py: error: {e}", file=sys.stderr)
+        return 2
+    if args.command is None:
+        parser.print_help()
+        return 2
+    with library.batch():
+        if args.command == "run":
+            ok = run_script(args.path)
+        else:
+            ok = run_command(args)
+    library.close()
+    return 0 if ok else 1
+
+
+# Run the program: the menu without arguments, otherwise one command
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(main(sys.argv[1:]))
     main_menu()
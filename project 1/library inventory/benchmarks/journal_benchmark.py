@@ -0,0 +1,68 @@
+"""Compare the cost of one change in snapshot mode and in journal mode.
+
+Usage: python benchmarks/journal_benchmark.py [--sizes 1000 10000 100000] [--ops 50]
+
+For each inventory size, runs borrow/return pairs on random books with a
+Library in the default mode (every change rewrites library_books.json) and in
+journal mode (every change appends a record; the journal is compacted into a
+new snapshot once it is as long as the inventory). Journal runs make at least
+as many changes as there are books, so at least one compaction is included in
+the average. Reports the time and the bytes written per change in a scratch
+directory.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+os.chdir(tempfile.mkdtemp())  # app builds a Library from the working directory on import
+
+from app import Book, Library  # noqa: E402
+
+
+def disk_bytes():
+    with open(f"/proc/{os.getpid()}/io") as file:
+        return int(next(line for line in file if line.startswith("wchar:")).split()[1])
+
+
+def run(size, ops, journal):
+    for path in (Library.FILE_PATH, Library.JOURNAL_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+    library = Library()
+    for n in range(size):
+        library.books[str(n)] = Book(str(n), f"Title {n}", f"Author {n % 1000}", 3)
+    library.save_books()
+    library = Library(journal=journal)
+
+    rng = random.Random(size)
+    ids = [str(rng.randrange(size)) for _ in range(ops)]
+    written = disk_bytes()
+    started = time.perf_counter()
+    for book_id in ids:
+        library.borrow_book(book_id)
+        library.return_book(book_id)
+    library.close()
+    elapsed = time.perf_counter() - started
+    return elapsed / (2 * ops) * 1e6, (disk_bytes() - written) / (2 * ops)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--ops", type=int, default=50, help="borrow/return pairs per snapshot run")
+    args = parser.parse_args()
+
+    print(f"{'books':>8}{'snapshot us':>13}{'snapshot B':>12}{'journal us':>12}{'journal B':>11}")
+    for size in args.sizes:
+        snapshot_us, snapshot_bytes = run(size, args.ops, journal=False)
+        journal_us, journal_bytes = run(size, max(args.ops, size), journal=True)
+        print(f"{size:>8}{snapshot_us:>13.0f}{snapshot_bytes:>12.0f}{journal_us:>12.0f}{journal_bytes:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Time Library lookups and updates as the inventory grows.
+
+Usage: python benchmarks/lookup_benchmark.py [--sizes 1000 10000 100000 1000000] [--ops 100000]
+
+Builds an in-memory Library of each size and times get_book, borrow/return
+and remove/add on random IDs, reporting nanoseconds per operation. Saving is
+switched off so only the in-memory work is measured; with the ID index the
+numbers should stay flat as the size grows.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+os.chdir(tempfile.mkdtemp())  # app builds a Library from the working directory on import
+
+from app import Book, Library  # noqa: E402
+
+
+def build(size):
+    library = Library()
+    library.save_books = lambda: None
+    for n in range(size):
+        library.books[str(n)] = Book(str(n), f"Title {n}", f"Author {n % 1000}", 3)
+    return library
+
+
+def timed(ops, run):
+    started = time.perf_counter()
+    run()
+    return (time.perf_counter() - started) / ops * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--ops", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'books':>9}{'get ns':>10}{'borrow+return ns':>18}{'remove+add ns':>15}")
+    for size in args.sizes:
+        library = build(size)
+        rng = random.Random(size)
+        ids = [str(rng.randrange(size)) for _ in range(args.ops)]
+
+        def get():
+            for book_id in ids:
+                library.get_book(book_id)
+
+        def borrow_return():
+            for book_id in ids:
+                library.borrow_book(book_id)
+                library.return_book(book_id)
+
+        def remove_add():
+            for book_id in ids:
+                book = library.get_book(book_id)
+                library.remove_book(book_id)
+                library.add_book(book)
+
+        print(f"{size:>9}{timed(args.ops, get):>10.0f}{timed(args.ops, borrow_return):>18.0f}"
+              f"{timed(args.ops, remove_add):>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Measure the memory an inventory takes once loaded.
+
+Usage: python benchmarks/memory_benchmark.py [--books 1000000] [--authors 50000]
+
+Writes a library_books.json of synthetic books in a scratch directory, then
+loads it into a Library under tracemalloc and reports bytes per
+book kept after loading and at the peak of loading. The same file loaded the
+old way (a plain class with a __dict__, built from a fully parsed list of
+dicts) is measured for comparison.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+os.chdir(tempfile.mkdtemp())  # app builds a Library from the working directory on import
+
+from app import Library  # noqa: E402
+
+
+class PlainBook:
+    def __init__(self, book_id, title, author, quantity, borrowed=0):
+        self.book_id = book_id
+        self.title = title
+        self.author = author
+        self.quantity = quantity
+        self.borrowed = borrowed
+
+
+def load_plain():
+    with open(Library.FILE_PATH) as file:
+        data = json.load(file)
+    return {item["book_id"]: PlainBook(item["book_id"], item["title"], item["author"],
+                                       item["quantity"], item["borrowed"]) for item in data}
+
+
+def measure(load, books):
+    gc.collect()
+    tracemalloc.start()
+    loaded = load()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del loaded
+    return current / books, peak / books
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=1000000)
+    parser.add_argument("--authors", type=int, default=50000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with open(Library.FILE_PATH, "w") as file:
+        json.dump([{"book_id": str(n), "title": f"Title {n}", "author": f"Author {rng.randrange(args.authors)}",
+                    "quantity": rng.choice((1, 2, 3, 5)), "borrowed": 0} for n in range(args.books)], file)
+
+    print(f"{args.books} books, {args.authors} authors")
+    print(f"{'':<24}{'bytes/book':>12}{'peak bytes/book':>17}")
+    for name, load in (("plain objects", load_plain), ("Library", lambda: Library().books)):
+        kept, peak = measure(load, args.books)
+        print(f"{name:<24}{kept:>12.0f}{peak:>17.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Compare indexed search with the old lowercase-and-scan search.
+
+Usage: python benchmarks/search_benchmark.py [--sizes 1000 10000 100000 1000000] [--queries 200]
+
+Builds a Library of synthetic books for each size, with titles drawn from a
+vocabulary of 5000 made-up words (common words far more likely than rare
+ones), and times a set of queries with Library.search_books() and with the
+linear scan it replaced. Reports median microseconds per query and the time
+to build the index, which a library does on its first search. Queries that
+match a fixed share of the books (a common word) stay linear with either
+method, since every match has to be returned and ranked.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+os.chdir(tempfile.mkdtemp())  # app builds a Library from the working directory on import
+
+from app import Book, Library, SearchIndex  # noqa: E402
+
+SYLLABLES = ("ka", "lo", "mi", "ra", "ven", "dor", "sel", "tha", "mir", "qu", "an", "es", "to", "bri", "nel",
+             "vo", "ga", "rin", "shu", "ler")
+FIRST_NAMES = ("Zoë", "Ana", "Lena", "Omar", "Karim", "José", "Mona", "Adam")
+
+
+def vocabulary(rng, size=5000):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def linear_search(library, keyword):
+    return [book for book in library.books.values()
+            if keyword.lower() in book.title.lower() or keyword.lower() in book.author.lower()]
+
+
+def build(size, rng, words):
+    library = Library()
+    for n in range(size):
+        title = " ".join(words[int(len(words) * rng.random() ** 2)].title() for _ in range(rng.randint(1, 4)))
+        author = f"{rng.choice(FIRST_NAMES)} {words[rng.randrange(len(words))].title()}"
+        library.books[str(n)] = Book(str(n), title, author, 1)
+    started = time.perf_counter()
+    library.index = SearchIndex(library.books.values())
+    library.index.build()
+    return library, time.perf_counter() - started
+
+
+def timed(queries, search):
+    # Median, so an occasional garbage collection pass over the index doesn't skew the result
+    times = []
+    for query in queries:
+        started = time.perf_counter()
+        search(query)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    words = vocabulary(random.Random(0))
+    queries = {
+        "rare word": words[-7],
+        "two words": f"{words[40]} {words[900]}",
+        "fragment": words[-7][1:5],
+        "author": f"jose {words[123]}",
+        "common word": words[0],
+    }
+    print("queries: " + ", ".join(f"{name} {query!r}" for name, query in queries.items()))
+    print(f"{'books':>9}{'build s':>9}" + "".join(f"{name + ' idx/scan us':>26}" for name in queries))
+    for size in args.sizes:
+        library, build_seconds = build(size, random.Random(size), words)
+        row = f"{size:>9}{build_seconds:>9.2f}"
+        for query in queries.values():
+            indexed = timed([query] * args.queries, library.search_books)
+            scanned = timed([query] * max(1, args.queries // 20), lambda q: linear_search(library, q))
+            row += f"{f'{indexed:.0f}/{scanned:.0f}':>26}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
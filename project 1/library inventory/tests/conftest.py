@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(HERE, "app.py")
+sys.path.insert(0, HERE)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Library files are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("LIBRARY_JOURNAL", raising=False)
+    return tmp_path
+
+
+@pytest.fixture
+def cli(workdir):
+    """Run app.py with arguments; returns (exit status, JSON lines printed)."""
+    def run(*args, input=None, env=None):
+        result = subprocess.run(
+            [sys.executable, APP, *args], input=input, capture_output=True, text=True, cwd=workdir,
+            env={**os.environ, **(env or {})},
+        )
+        return result.returncode, [json.loads(line) for line in result.stdout.splitlines() if line.startswith("{")]
+    return run
+
+
+def stored_books(workdir):
+    with open(workdir / "library_books.json") as file:
+        return {book["book_id"]: book for book in json.load(file)}
@@ -0,0 +1,101 @@
+import json
+
+from conftest import stored_books
+
+
+def test_commands_print_json_and_set_the_exit_status(cli, workdir):
+    status, [added] = cli("add", "1", "Dune", "Frank Herbert", "3")
+    assert status == 0
+    assert added == {"op": "add", "ok": True,
+                     "book": {"book_id": "1", "title": "Dune", "author": "Frank Herbert", "quantity": 3, "borrowed": 0}}
+
+    status, [borrowed] = cli("borrow", "1", "--copies", "2")
+    assert status == 0 and borrowed["book"]["borrowed"] == 2
+
+    status, [failed] = cli("borrow", "1", "--copies", "2")
+    assert status == 1
+    assert failed == {"op": "borrow", "ok": False, "error": "only 1 copies available"}
+
+    assert cli("borrow", "1", "--copies", "0")[0] == 2
+    assert cli("bogus")[0] == 2
+    assert stored_books(workdir)["1"]["borrowed"] == 2
+
+
+def test_run_applies_a_script_with_one_write(cli, workdir):
+    script = "\n".join([
+        "# restock",
+        'add 3 "The Hobbit" "J. R. R. Tolkien" 2',
+        "borrow 3",
+        "borrow 3 --copies 5",  # fails and changes nothing
+        "remove 9",
+        "return 3",
+        "borrow 3",
+    ])
+    status, results = cli("run", input=script)
+    assert status == 1
+    assert [(r["line"], r["op"], r["ok"]) for r in results] == [
+        (2, "add", True), (3, "borrow", True), (4, "borrow", False), (5, "remove", False),
+        (6, "return", True), (7, "borrow", True),
+    ]
+    assert stored_books(workdir)["3"]["borrowed"] == 1
+    assert not (workdir / "library_books.journal").exists()
+
+
+def test_help_in_a_script_fails_only_that_line(cli, workdir):
+    status, results = cli("run", input="add 3 X Y 2\nborrow 3\nlist --help\nborrow 3\n")
+    assert status == 1
+    assert [(r["line"], r["ok"]) for r in results] == [(1, True), (2, True), (3, False), (4, True)]
+    assert stored_books(workdir)["3"]["borrowed"] == 2
+
+
+def test_batch_saves_once(workdir):
+    from app import Book, Library
+
+    library = Library()
+    saves = []
+    library.save_books = lambda: saves.append(len(library.books))
+    with library.batch():
+        for n in range(5):
+            library.add_book(Book(str(n), f"Title {n}", "Author", 2))
+        library.borrow_book("1")
+        library.remove_book("4")
+        assert saves == []
+    assert saves == [4]
+
+
+def test_import_rejects_inconsistent_records_and_adds_nothing(cli, workdir):
+    cli("add", "1", "Dune", "Frank Herbert")
+    for record in ({"quantity": 1, "borrowed": 5}, {"quantity": 0}, {"quantity": 2, "borrowed": -1}):
+        books = [{"book_id": 2, "title": "Emma", "author": "Jane Austen", "quantity": 1},
+                 {"book_id": 3, "title": "X", "author": "Y", **record}]
+        status, [result] = cli("import", "-", input=json.dumps(books))
+        assert status == 1
+        assert result["ok"] is False and result["error"].startswith("record 2:")
+    assert list(stored_books(workdir)) == ["1"]
+
+
+def test_import_and_export_round_trip_csv(cli, workdir):
+    cli("add", "1", "Les Misérables", "Victor Hugo", "2")
+    cli("borrow", "1")
+    assert cli("export", "books.csv")[0] == 0
+    (workdir / "library_books.json").unlink()
+
+    status, [result] = cli("import", "books.csv")
+    assert status == 0 and result["imported"] == 1
+    assert stored_books(workdir)["1"] == {"book_id": "1", "title": "Les Misérables", "author": "Victor Hugo",
+                                          "quantity": 2, "borrowed": 1}
+
+
+def test_remove_keeps_copies_on_loan(cli, workdir):
+    cli("add", "1", "Dune", "Frank Herbert", "3")
+    cli("borrow", "1", "--copies", "2")
+
+    status, [failed] = cli("remove", "1", "--copies", "2")
+    assert status == 1
+    assert failed["error"] == "only 1 copies to remove, 2 on loan"
+    assert cli("remove", "1")[0] == 1  # the whole book, loans and all
+    assert stored_books(workdir)["1"]["quantity"] == 3
+
+    status, [removed] = cli("remove", "1", "--copies", "1")
+    assert status == 0
+    assert (removed["book"]["quantity"], removed["book"]["borrowed"]) == (2, 2)
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from conftest import stored_books
+
+
+def put(book_id, title="Title", author="Author", quantity=1, borrowed=0):
+    book = {"book_id": book_id, "title": title, "author": author, "quantity": quantity, "borrowed": borrowed}
+    return json.dumps({"op": "put", "book": book}) + "\n"
+
+
+def test_journal_replays_over_the_snapshot(workdir):
+    from app import Book, Library
+
+    library = Library(journal=True)
+    for n in range(3):
+        library.add_book(Book(str(n), f"Title {n}", "Author", 2))
+    library.save_books()
+    library.borrow_book("0", copies=2)
+    library.remove_book("1")
+    library.add_book(Book("3", "Later", "Author", 1))
+    library.close()
+
+    assert stored_books(workdir)["0"]["borrowed"] == 0  # the snapshot is untouched
+    assert len((workdir / "library_books.journal").read_text().splitlines()) == 3
+    reopened = Library(journal=True)
+    assert list(reopened.books) == ["0", "2", "3"]
+    assert reopened.get_book("0").borrowed == 2
+    reopened.close()
+
+
+def test_torn_last_line_is_ignored_and_cut_off(workdir):
+    from app import Book, Library
+
+    journal = workdir / "library_books.journal"
+    journal.write_text(put("1", "Dune") + put("2", "Emma")[:25])
+
+    library = Library(journal=True)
+    assert list(library.books) == ["1"]
+    assert journal.read_text() == put("1", "Dune")
+    library.add_book(Book("3", "Ulysses", "James Joyce", 1))
+    library.close()
+    assert list(Library(journal=True).books) == ["1", "3"]
+
+
+def test_compaction_writes_a_snapshot_and_resets_the_journal(workdir):
+    from app import Book, Library
+
+    library = Library(journal=True)
+    library.COMPACT_MIN = 3
+    library.add_book(Book("1", "Dune", "Frank Herbert", 1))
+    library.add_book(Book("2", "Emma", "Jane Austen", 1))
+    assert not (workdir / "library_books.json").exists()
+    library.add_book(Book("3", "Ulysses", "James Joyce", 1))
+
+    assert list(stored_books(workdir)) == ["1", "2", "3"]
+    assert (workdir / "library_books.journal").read_bytes() == b""
+    assert library.journal.records == 0
+    library.close()
+
+
+def test_default_mode_folds_in_and_removes_a_leftover_journal(workdir):
+    from app import Book, Library
+
+    (workdir / "library_books.journal").write_text(put("1", "Dune"))
+    library = Library()
+    assert list(library.books) == ["1"]
+    library.add_book(Book("2", "Emma", "Jane Austen", 1))
+
+    assert list(stored_books(workdir)) == ["1", "2"]
+    assert not (workdir / "library_books.journal").exists()
+
+
+def test_snapshot_with_a_non_text_author_is_rejected_clearly(workdir):
+    from app import Library
+
+    books = [{"book_id": "1", "title": "Dune", "author": "Frank Herbert", "quantity": 1, "borrowed": 0},
+             {"book_id": "2", "title": "Numbered", "author": 1984, "quantity": 1, "borrowed": 0}]
+    (workdir / "library_books.json").write_text(json.dumps(books))
+    with pytest.raises(ValueError, match="book '2': author must be text, not 1984"):
+        Library()
@@ -0,0 +1,47 @@
+def ids(books):
+    return [book.book_id for book in books]
+
+
+def library_of(*books):
+    from app import Book, Library
+
+    library = Library()
+    with library.batch():
+        for book_id, title, author in books:
+            library.add_book(Book(book_id, title, author, 1))
+    return library
+
+
+def test_accents_and_case_are_ignored(workdir):
+    library = library_of(
+        ("1", "Les Misérables", "Victor Hugo"),
+        ("2", "Cien años de soledad", "Gabriel García Márquez"),
+    )
+    assert ids(library.search_books("MISERABLES")) == ["1"]
+    assert ids(library.search_books("garcia")) == ["2"]
+    assert ids(library.search_books("Años")) == ["2"]
+
+
+def test_every_word_must_match_and_better_matches_come_first(workdir):
+    library = library_of(
+        ("1", "The Old Man and the Sea", "Ernest Hemingway"),
+        ("2", "Notre-Dame de Paris", "Victor Hugo"),
+        ("3", "Hugo", "Someone"),
+        ("4", "Hugolina", "Someone"),
+    )
+    assert ids(library.search_books("old sea")) == ["1"]
+    assert ids(library.search_books("old paris")) == []
+    assert ids(library.search_books("hugo")) == ["3", "4", "2"]  # whole title word, title prefix, author
+    assert ids(library.search_books("  ")) == ["1", "2", "3", "4"]
+
+
+def test_index_follows_adds_and_removes(workdir):
+    from app import Book
+
+    library = library_of(("1", "Dune", "Frank Herbert"))
+    assert ids(library.search_books("dune")) == ["1"]  # builds the index
+    library.add_book(Book("2", "Dune Messiah", "Frank Herbert", 1))
+    assert ids(library.search_books("herbert")) == ["1", "2"]
+    library.remove_book("1")
+    assert ids(library.search_books("dune")) == ["2"]
+    assert ids(library.search_books("du")) == ["2"]  # too short for the index, checked directly
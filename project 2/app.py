@@ -1,12 +1,34 @@
-from flask import Flask, render_template, redirect, url_for, request, flash
+from flask import Flask, Response, abort, render_template, redirect, url_for, request, flash, g, has_request_context, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import bindparam, delete, event, func, insert, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from itsdangerous import URLSafeTimedSerializer
-from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_mail import Mail, Message
+from collections import Counter
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from flask_mail import Mail
+import click
+import hashlib
 import os
 
+import migrations
+import search
+from outbox import OutboxDispatcher
+from hashing import HashingBusy, PasswordHasher
+from cache import TTLCache
+from sharedcache import CatalogCache, MemoryStore, make_store
+from dbconfig import EngineSettings, apply_pragmas
+from pagecache import PageCache
+from metrics import RequestMetrics
+from jsonapi import json_response, make_etag, ndjson_response, not_modified, wants_ndjson
+from catalog_import import CatalogImporter, detect_format, iter_rows, text_stream
+from pagination import KeysetPagination
+from seeding import SeedGenerator
+from stats import CatalogStats
+from overdue import OverdueScanner
+
 
 
 
@@ -14,8 +36,17 @@ import os
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your_secret_key')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///library.db'
+# Database and engine tuning: DATABASE_URL, DB_PROFILE (see dbconfig.PROFILES) and
+# DB_* / SQLITE_* overrides for single pool options and pragmas
+db_settings = EngineSettings.from_env()
+app.config['SQLALCHEMY_DATABASE_URI'] = db_settings.uri
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = db_settings.engine_options
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['DB_PROFILE'] = db_settings.profile
+# Run on every new SQLite connection, e.g. {'journal_mode': 'WAL', 'busy_timeout': 5000}
+app.config['SQLITE_PRAGMAS'] = db_settings.pragmas
+# Maximum SQL statements per request, enforced only when TESTING is on
+app.config['QUERY_BUDGET'] = None
 
 # Flask-Mail configuration
 app.config['MAIL_SERVER'] = 'smtp.example.com'
@@ -25,11 +56,73 @@ app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
 app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
 app.config['MAIL_DEFAULT_SENDER'] = 'noreply@library.com'
 
+# Password hashing: werkzeug method string (e.g. 'scrypt', 'pbkdf2:sha256:600000').
+# Hashes made under another method are upgraded on the next successful login.
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+# Processes to hash in (0 hashes in the request thread) and how many hashes may run at once
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+app.config['PASSWORD_HASH_CONCURRENCY'] = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', 4))
+app.config['PASSWORD_HASH_QUEUE_TIMEOUT'] = 10  # seconds to wait for a slot before answering 503
+
+# Logged-in identities are cached in the catalog cache file shared by every worker (per
+# process only if that file is unusable), and invalidated everywhere when the user row changes
+app.config['IDENTITY_CACHE_TTL'] = 60  # seconds; bounds staleness if an invalidation is ever lost
+
+# Rendered book/author pages kept per process, keyed by the page's version in the database
+app.config['PAGE_CACHE_SIZE'] = 2048
+app.config['PAGE_CACHE_TTL'] = 600  # seconds
+
+# Book and author rows shared by all worker processes on this host: 'sqlite' (a cache file),
+# 'memory' (per process) or 'off'. Write routes invalidate what they change after committing.
+app.config['CATALOG_CACHE'] = os.environ.get('CATALOG_CACHE', 'sqlite')
+app.config['CATALOG_CACHE_PATH'] = os.environ.get('CATALOG_CACHE_PATH') or os.path.join(app.instance_path, 'catalog_cache.db')
+app.config['CATALOG_CACHE_TTL'] = 300  # seconds; bounds staleness if a bump is ever lost
+
+# Author typeahead: suggestions per request, and hot prefixes kept per process
+app.config['AUTHOR_SEARCH_LIMIT'] = 10
+app.config['AUTHOR_PREFIX_CACHE_SIZE'] = 2048
+app.config['AUTHOR_PREFIX_CACHE_TTL'] = 30  # seconds; bounds staleness in other processes
+
+# Most books one batch checkout or return may cover
+app.config['BATCH_LOAN_LIMIT'] = 20
+
+# Loan period, and how often a reader with overdue books is reminded (days)
+app.config['LOAN_DAYS'] = int(os.environ.get('LOAN_DAYS', 14))
+app.config['OVERDUE_REMIND_EVERY'] = int(os.environ.get('OVERDUE_REMIND_EVERY', 7))
+app.config['OVERDUE_BATCH_SIZE'] = 500  # readers per batch, each batch one transaction
+
+# Bulk catalog import: rows per transaction
+app.config['IMPORT_BATCH_SIZE'] = 5000
+
+# Outbox: routes queue mail, a background dispatcher delivers it
+app.config['OUTBOX_DISPATCHER_THREAD'] = os.environ.get('OUTBOX_DISPATCHER_THREAD', '1') == '1'
+app.config['OUTBOX_BATCH_SIZE'] = 50
+app.config['OUTBOX_MAX_ATTEMPTS'] = 5
+app.config['OUTBOX_BACKOFF'] = 30  # seconds, doubled after each failed attempt
+
+# Request metrics on /metrics. Every request is counted; METRICS_SAMPLE_RATE of them are timed
+# in detail. Statements over SLOW_QUERY_MS are logged. Scrapers send METRICS_TOKEN if it is set.
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') == '1'
+app.config['METRICS_SAMPLE_RATE'] = float(os.environ.get('METRICS_SAMPLE_RATE', 1.0))
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 200))
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
 # Initialize extensions
+request_metrics = RequestMetrics(
+    sample_rate=app.config['METRICS_SAMPLE_RATE'], slow_query_ms=app.config['SLOW_QUERY_MS']
+)
+if app.config['METRICS_ENABLED']:
+    request_metrics.init_app(app)
 db = SQLAlchemy(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 mail = Mail(app)
+password_hasher = PasswordHasher(
+    method=app.config['PASSWORD_HASH_METHOD'],
+    workers=app.config['PASSWORD_HASH_WORKERS'],
+    concurrency=app.config['PASSWORD_HASH_CONCURRENCY'],
+    queue_timeout=app.config['PASSWORD_HASH_QUEUE_TIMEOUT'],
+)
 
 # User model
 class User(UserMixin, db.Model):
@@ -37,54 +130,520 @@ class User(UserMixin, db.Model):
     first_name = db.Column(db.String(80), nullable=False)
     last_name = db.Column(db.String(80), nullable=False)
     username = db.Column(db.String(80), unique=True, nullable=False)
-    password = db.Column(db.String(120), nullable=False)
+    password = db.Column(db.String(255), nullable=False)
     phone_number = db.Column(db.String(20), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
 
+# What current_user needs from a User, as plain fields so the shared cache can hold it
+class CachedUser(UserMixin):
+    def __init__(self, id, username, first_name, last_name, is_admin):
+        self.id = id
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+        self.is_admin = is_admin
+
+# The file every worker process shares (see sharedcache.py). Identities always use it when
+# it is usable, whatever CATALOG_CACHE says, so role changes reach every worker.
+shared_store = make_store('sqlite', app.config['CATALOG_CACHE_PATH'], ttl=app.config['CATALOG_CACHE_TTL'])
+shared_namespace = hashlib.blake2b(app.config['SQLALCHEMY_DATABASE_URI'].encode(), digest_size=4).hexdigest() + ':'
+
+identity_cache = CatalogCache(shared_store, namespace=shared_namespace, ttl=app.config['IDENTITY_CACHE_TTL'])
+
+@event.listens_for(db.session, 'after_flush')
+def collect_changed_users(session, flush_context):
+    changed = [obj.id for obj in list(session.dirty) + list(session.deleted) if isinstance(obj, User)]
+    if changed:
+        session.info.setdefault('changed_users', set()).update(changed)
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_changed_users(session):
+    # Bumps the shared version, so every worker drops its copy, including one
+    # loaded from the old row while this transaction was in flight
+    changed = session.info.pop('changed_users', ())
+    if changed:
+        identity_cache.invalidate(*(f'user:{user_id}' for user_id in sorted(changed)))
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_changed_users(session):
+    session.info.pop('changed_users', None)
+
 # Author model
 class Author(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(120), nullable=False)
+    name = db.Column(db.String(120), nullable=False, index=True)
     bio = db.Column(db.Text, nullable=True)
     books = db.relationship('Book', backref='author', lazy=True)
 
+    # Case-insensitive prefix search for the author typeahead
+    __table_args__ = (db.Index('ix_author_name_lower', func.lower(name)),)
+
 # Book model
 class Book(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(120), nullable=False)
+    title = db.Column(db.String(120), nullable=False, index=True)
     description = db.Column(db.Text, nullable=True)
     quantity = db.Column(db.Integer, default=1)
     borrowed = db.Column(db.Integer, default=0)
-    author_id = db.Column(db.Integer, db.ForeignKey('author.id'), nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('author.id'), nullable=False, index=True)
 
     # Relationship to BorrowedBook
     borrowed_by = db.relationship('BorrowedBook', backref='borrowed_book', lazy=True)
 
 # BorrowedBook model
+def loan_due_at(context):
+    borrowed_at = context.get_current_parameters().get('borrowed_at') or datetime.utcnow()
+    return borrowed_at + timedelta(days=app.config['LOAN_DAYS'])
+
+def first_reminder_at(context):
+    return context.get_current_parameters()['due_at']
+
 class BorrowedBook(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=False, index=True)
     borrowed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    due_at = db.Column(db.DateTime, default=loan_due_at)
+    next_reminder_at = db.Column(db.DateTime, default=first_reminder_at, index=True)  # moved on by each reminder
+
+    # The overdue scan checks next_reminder_at's index for anything due, then walks the
+    # readers with a reminder due through this one
+    __table_args__ = (db.Index('ix_borrowed_book_user_id_next_reminder_at', 'user_id', 'next_reminder_at'),)
 
     # Relationships
     user = db.relationship('User', backref='borrowed_books')
     book = db.relationship('Book', backref='borrowed_books')
 
+# Version of each cacheable page ('book:<id>', 'author:<id>'), bumped by the writes that change it
+class PageVersion(db.Model):
+    key = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+page_cache = PageCache(db, PageVersion, maxsize=app.config['PAGE_CACHE_SIZE'], ttl=app.config['PAGE_CACHE_TTL'])
+
+# Catalog totals, books per author and borrow counts, adjusted by the writes that change them
+class CatalogStat(db.Model):
+    kind = db.Column(db.String(20), primary_key=True)
+    subject_id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 0 for totals
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.Index('ix_catalog_stat_ranking', 'kind', 'value'),)
+
+catalog_stats = CatalogStats(db, CatalogStat, Author, Book, BorrowedBook)
+
+catalog_cache = CatalogCache(
+    shared_store if app.config['CATALOG_CACHE'] == 'sqlite' else MemoryStore(ttl=app.config['CATALOG_CACHE_TTL']),
+    enabled=app.config['CATALOG_CACHE'] != 'off',
+    namespace=shared_namespace,
+)
+
+request_metrics.register('library_cache_hits_total', 'Cache hits in this process.', lambda: {
+    (('cache', 'identity'),): identity_cache.hits, (('cache', 'page'),): page_cache.fragments.hits,
+    (('cache', 'catalog'),): catalog_cache.hits,
+}, kind='counter')
+request_metrics.register('library_cache_misses_total', 'Cache misses in this process.', lambda: {
+    (('cache', 'identity'),): identity_cache.misses, (('cache', 'page'),): page_cache.fragments.misses,
+    (('cache', 'catalog'),): catalog_cache.misses,
+}, kind='counter')
+request_metrics.register('library_catalog_cache_errors_total', 'Shared catalog cache operations that failed.',
+                         lambda: catalog_cache.errors, kind='counter')
+
+def catalog_changed(*keys):
+    """Mark 'book:<id>' / 'author:<id>' as changed by the current transaction.
+
+    Page versions are bumped in the transaction; the shared row cache is bumped
+    once it has committed, so no other process can re-cache the old row.
+    """
+    page_cache.bump(*keys)
+    db.session.info.setdefault('catalog_cache_keys', set()).update(keys)
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_catalog_cache(session):
+    keys = session.info.pop('catalog_cache_keys', None)
+    if keys:
+        catalog_cache.invalidate(*sorted(keys))
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_catalog_changes(session):
+    session.info.pop('catalog_cache_keys', None)
+
+def cached_book(book_id):
+    """The book's columns as a dict, through the shared cache; None if there is no such book."""
+    def load():
+        row = db.session.execute(
+            db.select(Book.id, Book.title, Book.description, Book.quantity, Book.borrowed, Book.author_id)
+            .where(Book.id == book_id)
+        ).first()
+        return row._asdict() if row else None
+    return catalog_cache.get(f'book:{book_id}', load)
+
+def cached_author(author_id):
+    def load():
+        row = db.session.execute(
+            db.select(Author.id, Author.name, Author.bio).where(Author.id == author_id)
+        ).first()
+        return row._asdict() if row else None
+    return catalog_cache.get(f'author:{author_id}', load)
+
+author_prefix_cache = TTLCache(
+    maxsize=app.config['AUTHOR_PREFIX_CACHE_SIZE'], ttl=app.config['AUTHOR_PREFIX_CACHE_TTL']
+)
+
+def authors_by_prefix(prefix, limit):
+    """First ``limit`` authors whose name starts with ``prefix``, ignoring case."""
+    key = (prefix.lower(), limit)
+    matches = author_prefix_cache.get(key)
+    if matches is None:
+        # A range on lower(name) rather than LIKE, so it walks ix_author_name_lower in order
+        name, lowered = func.lower(Author.name), func.lower(prefix)
+        rows = db.session.execute(
+            db.select(Author.id, Author.name)
+            .where(name >= lowered, name < lowered.concat('\U0010ffff'))
+            .order_by(name, Author.id)
+            .limit(limit)
+        )
+        matches = [{'id': row.id, 'name': row.name} for row in rows]
+        author_prefix_cache.set(key, matches)
+    return matches
+
+def viewer_class():
+    """Which variant of a cached page the current visitor sees."""
+    if not current_user.is_authenticated:
+        return 'anonymous'
+    return 'admin' if current_user.is_admin else 'user'
+
+# Progress of a bulk catalog import, so a failed run can resume where it stopped
+class ImportJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(255), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, failed, done, abandoned
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+def catalog_importer(progress=None, batch_size=None):
+    return CatalogImporter(
+        db, Author, Book, ImportJob, page_cache=page_cache, stats=catalog_stats,
+        batch_size=batch_size or app.config['IMPORT_BATCH_SIZE'], progress=progress
+    )
+
+@app.cli.command('import-catalog')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', type=int, help='Rows per transaction.')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint of an unfinished import of this file.')
+def import_catalog_command(path, fmt, batch_size, restart):
+    """Bulk-load books and authors from a CSV or JSON Lines file."""
+    def progress(rows_done, inserted, elapsed):
+        rate = inserted / elapsed if elapsed else 0
+        print(f'{rows_done} rows read, {inserted} books inserted, {rate:.0f} rows/s')
+
+    with open(path, encoding='utf-8', newline='') as stream:
+        result = catalog_importer(progress, batch_size).run(
+            iter_rows(stream, fmt or detect_format(path)), os.path.abspath(path), restart=restart
+        )
+    print(f'Done: {result.inserted} books inserted, {result.skipped} rows skipped, '
+          f'{result.rate:.0f} rows/s (resumed from row {result.resumed_from}).')
+
+# Synthetic data for load tests; every seeded account's password is SEED_PASSWORD
+SEED_PASSWORD = 'password'
+
+def seed_generator(seed=0, batch_size=10000, progress=None):
+    return SeedGenerator(
+        db, User, Author, Book, BorrowedBook, password_hasher.hash(SEED_PASSWORD),
+        page_cache=page_cache, stats=catalog_stats, batch_size=batch_size, seed=seed, progress=progress,
+        loan_days=app.config['LOAN_DAYS'],
+    )
+
+@app.cli.command('seed-data')
+@click.option('--users', type=int, default=1000, show_default=True)
+@click.option('--admins', type=int, default=1, show_default=True)
+@click.option('--authors', type=int, default=500, show_default=True)
+@click.option('--books', type=int, default=10000, show_default=True)
+@click.option('--loans', type=int, default=2000, show_default=True)
+@click.option('--seed', type=int, default=0, show_default=True, help='Random seed, for repeatable data.')
+@click.option('--batch-size', type=int, default=10000, show_default=True, help='Rows per transaction.')
+def seed_data_command(users, admins, authors, books, loans, seed, batch_size):
+    """Fill the database with synthetic users, authors, books and loans."""
+    def progress(table, rows_done):
+        print(f'{table}: {rows_done} rows')
+
+    result = seed_generator(seed, batch_size, progress).run(
+        users=users, authors=authors, books=books, loans=loans, admins=admins
+    )
+    counts = result.counts
+    print(f"Done in {result.elapsed:.1f}s: {counts['users']} readers, {counts['authors']} authors, "
+          f"{counts['books']} books, {counts['loans']} loans. Password for every account: {SEED_PASSWORD!r}")
+
+# Queued email, delivered by OutboxDispatcher
+class OutboxMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = db.Column(db.String(32), nullable=True, index=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (db.Index('ix_outbox_message_due', 'status', 'next_attempt_at'),)
+
+outbox_dispatcher = OutboxDispatcher(
+    app, db, OutboxMessage, mail,
+    batch_size=app.config['OUTBOX_BATCH_SIZE'],
+    max_attempts=app.config['OUTBOX_MAX_ATTEMPTS'],
+    backoff=app.config['OUTBOX_BACKOFF'],
+)
+
+@app.before_request
+def start_outbox_dispatcher():
+    if app.config['OUTBOX_DISPATCHER_THREAD'] and not app.testing:
+        outbox_dispatcher.start()
+
+@app.cli.command('outbox-dispatch')
+@click.option('--once', is_flag=True, help='Send everything that is due, then exit.')
+def outbox_dispatch_command(once):
+    """Deliver queued email."""
+    if once:
+        print(f'Sent {outbox_dispatcher.drain()} message(s).')
+    else:
+        outbox_dispatcher.run()
+
+def overdue_scanner(batch_size=None):
+    return OverdueScanner(
+        db, BorrowedBook, Book, User, OutboxMessage,
+        batch_size=batch_size or app.config['OVERDUE_BATCH_SIZE'],
+        remind_every=timedelta(days=app.config['OVERDUE_REMIND_EVERY']),
+    )
+
+@app.cli.command('overdue-scan')
+@click.option('--batch-size', type=int, default=None, help='Readers reminded per batch.')
+def overdue_scan_command(batch_size):
+    """Queue one reminder per reader with overdue books; run it daily from cron."""
+    result = overdue_scanner(batch_size).scan()
+    print(f'Queued {result.readers} reminder(s) covering {result.loans} overdue loan(s) '
+          f'in {result.elapsed:.1f}s.')
+
+# Database setup
+def init_db():
+    """Create or upgrade the schema and the book full-text index."""
+    applied = migrations.upgrade(db, loan_days=app.config['LOAN_DAYS'])
+    search.install(db.engine)
+    return applied
+
+def drop_db():
+    """Drop every table, including the ones the models don't know about."""
+    db.drop_all()
+    search.drop(db.engine)
+    with db.engine.begin() as connection:
+        connection.execute(db.text('DROP TABLE IF EXISTS schema_migrations'))
+    catalog_cache.clear()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the database, or upgrade an existing one in place."""
+    for step in init_db():
+        print(f'Applied migration {step}')
+    print('Database is up to date.')
+
+@app.cli.command('reconcile-stats')
+@click.option('--dry-run', is_flag=True, help='Report drift without correcting it.')
+def reconcile_stats_command(dry_run):
+    """Recompute the catalog statistics from the tables and report any drift."""
+    drift = catalog_stats.reconcile(fix=not dry_run)
+    for kind, subject_id, stored, actual in drift:
+        subject = '' if kind in ('titles', 'copies', 'on_loan') else f' #{subject_id}'
+        print(f'{kind}{subject}: stored {stored}, actual {actual}')
+    if not drift:
+        print('Statistics are consistent.')
+    elif not dry_run:
+        print(f'Corrected {len(drift)} statistics.')
+    else:
+        raise SystemExit(1)
+
+@app.cli.command('db-config')
+def db_config_command():
+    """Show the engine profile, pool options and SQLite pragmas in effect."""
+    settings = db_settings.describe()
+    print(f"Profile: {settings['profile']}")
+    for name, value in settings['engine_options'].items():
+        print(f'  {name} = {value}')
+    for name, value in settings['pragmas'].items():
+        print(f'  PRAGMA {name} = {value}')
+
+# SQLite connection setup
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    apply_pragmas(dbapi_connection, app.config['SQLITE_PRAGMAS'])
+
+# Query budget guard
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+@app.after_request
+def enforce_query_budget(response):
+    budget = app.config['QUERY_BUDGET']
+    if app.testing and budget is not None and g.get('query_count', 0) > budget:
+        raise QueryBudgetExceeded(
+            f'{request.endpoint} ran {g.query_count} queries, budget is {budget}'
+        )
+    return response
+
 # User loader
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    def load():
+        row = db.session.execute(
+            db.select(User.id, User.username, User.first_name, User.last_name, User.is_admin)
+            .where(User.id == user_id)
+        ).first()
+        return row._asdict() if row else None
+    fields = identity_cache.get(f'user:{user_id}', load)
+    return CachedUser(**fields) if fields else None
 
 # Utility functions
+def checkout_copy(book_id, user_id):
+    """Lend one copy of a book, atomically. Returns False if no copy is free.
+
+    The availability check and the counter change are a single conditional
+    UPDATE, so concurrent workers can never lend more copies than exist.
+    """
+    result = db.session.execute(
+        update(Book)
+        .where(Book.id == book_id, Book.borrowed < Book.quantity)
+        .values(borrowed=Book.borrowed + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        return False
+    db.session.add(BorrowedBook(user_id=user_id, book_id=book_id))
+    catalog_changed(f'book:{book_id}')
+    catalog_stats.borrowed(book_id)
+    db.session.commit()
+    return True
+
+def checkin_copy(loan_id, book_id):
+    """Close a loan, atomically. Returns False if it was already returned."""
+    result = db.session.execute(
+        delete(BorrowedBook)
+        .where(BorrowedBook.id == loan_id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        return False
+    db.session.execute(
+        update(Book)
+        .where(Book.id == book_id, Book.borrowed > 0)
+        .values(borrowed=Book.borrowed - 1)
+        .execution_options(synchronize_session=False)
+    )
+    catalog_changed(f'book:{book_id}')
+    catalog_stats.returned()
+    db.session.commit()
+    return True
+
+def change_counters(copies, delta):
+    """Move ``borrowed`` by ``delta`` copies per book in one executemany.
+
+    Each row only changes if the result stays within 0..quantity; returns how
+    many books did, so the caller can tell whether all of them were allowed.
+    """
+    book = Book.__table__
+    change = bindparam('change')
+    new_value = book.c.borrowed + change
+    result = db.session.execute(
+        update(book)
+        .where(book.c.id == bindparam('book_id'), new_value >= 0, new_value <= book.c.quantity)
+        .values(borrowed=new_value),
+        [{'book_id': book_id, 'change': delta * count} for book_id, count in copies.items()],
+    )
+    return result.rowcount
+
+def checkout_copies(book_ids, user_id):
+    """Lend one copy of each book in ``book_ids`` (repeat an id for more), all or nothing.
+
+    Returns a list of problems, empty on success. Availability of every book is
+    read in one query; the counter updates are still conditional, so a copy
+    taken by someone else in between fails the whole batch rather than overlending.
+    """
+    copies = Counter(book_ids)
+    free = dict(db.session.execute(
+        db.select(Book.id, Book.quantity - Book.borrowed).where(Book.id.in_(copies))
+    ).all())
+    problems = [
+        {'book_id': book_id, 'error': 'not found' if book_id not in free else 'not available'}
+        for book_id, count in copies.items() if free.get(book_id, 0) < count
+    ]
+    if problems:
+        return problems
+    if change_counters(copies, 1) != len(copies):
+        db.session.rollback()
+        return [{'book_id': None, 'error': 'availability changed, try again'}]
+    db.session.execute(insert(BorrowedBook), [{'user_id': user_id, 'book_id': book_id} for book_id in book_ids])
+    catalog_changed(*(f'book:{book_id}' for book_id in copies))
+    for book_id, count in copies.items():
+        catalog_stats.borrowed(book_id, count)
+    db.session.commit()
+    return []
+
+def checkin_copies(book_ids, user_id=None):
+    """Return one copy of each book in ``book_ids``, all or nothing.
+
+    Closes the oldest open loans of ``user_id`` (any user's when None).
+    Returns a list of problems, empty on success.
+    """
+    copies = Counter(book_ids)
+    query = db.select(BorrowedBook.id, BorrowedBook.book_id).where(BorrowedBook.book_id.in_(copies))
+    if user_id is not None:
+        query = query.where(BorrowedBook.user_id == user_id)
+    loans = {}
+    for loan_id, book_id in db.session.execute(query.order_by(BorrowedBook.id)):
+        if len(loans.setdefault(book_id, [])) < copies[book_id]:
+            loans[book_id].append(loan_id)
+    problems = [{'book_id': book_id, 'error': 'no open loan'}
+                for book_id, count in copies.items() if len(loans.get(book_id, ())) < count]
+    if problems:
+        return problems
+
+    loan_ids = [loan_id for ids in loans.values() for loan_id in ids]
+    deleted = db.session.execute(
+        delete(BorrowedBook).where(BorrowedBook.id.in_(loan_ids)).execution_options(synchronize_session=False)
+    ).rowcount
+    if deleted != len(loan_ids) or change_counters(copies, -1) != len(copies):
+        db.session.rollback()
+        return [{'book_id': None, 'error': 'loans changed, try again'}]
+    catalog_changed(*(f'book:{book_id}' for book_id in copies))
+    catalog_stats.returned(len(loan_ids))
+    db.session.commit()
+    return []
+
+def queue_email(recipient, subject, body):
+    """Add an email to the outbox; the dispatcher sends it outside the request."""
+    db.session.add(OutboxMessage(recipient=recipient, subject=subject, body=body))
+    db.session.commit()
+
 def send_reset_email(user):
     serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'])
     token = serializer.dumps(user.email, salt='password-reset')
     reset_url = url_for('reset_password', token=token, _external=True)
-    msg = Message('Password Reset Request', recipients=[user.email])
-    msg.body = f'To reset your password, visit the following link: {reset_url}'
-    mail.send(msg)
+    queue_email(
+        user.email,
+        'Password Reset Request',
+        f'To reset your password, visit the following link: {reset_url}'
+    )
 
 def verify_reset_token(token, expiration=3600):
     serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'])
@@ -94,6 +653,10 @@ def verify_reset_token(token, expiration=3600):
         return None
     return User.query.filter_by(email=email).first()
 
+@app.errorhandler(HashingBusy)
+def hashing_busy(e):
+    return 'Too many sign-ins at once, please try again in a moment.', 503, {'Retry-After': '5'}
+
 # Routes
 @app.route('/')
 def index():
@@ -130,7 +693,7 @@ def register():
             first_name=first_name,
             last_name=last_name,
             username=username,
-            password=generate_password_hash(password),
+            password=password_hasher.hash(password),
             phone_number=phone_number,
             email=email,
             is_admin=is_admin
@@ -155,7 +718,10 @@ def login():
         password = request.form['password']
 
         user = User.query.filter((User.username == login_input) | (User.email == login_input)).first()
-        if user and check_password_hash(user.password, password):
+        if user and password_hasher.verify(user.password, password):
+            if password_hasher.needs_rehash(user.password):
+                user.password = password_hasher.hash(password)
+                db.session.commit()
             login_user(user)
             return redirect(url_for('dashboard'))
         else:
@@ -189,7 +755,7 @@ def reset_password(token):
         return redirect(url_for('reset_password_request'))
     if request.method == 'POST':
         password = request.form['password']
-        user.password = generate_password_hash(password)
+        user.password = password_hasher.hash(password)
         db.session.commit()
         flash('Your password has been reset.')
         return redirect(url_for('login'))
@@ -201,22 +767,31 @@ def dashboard():
     welcome_message = f"Welcome, {current_user.first_name} {current_user.last_name}!"
     search_query = request.args.get('search', '')
     page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
 
-    # Filter books based on search query
+    # Filter books based on search query, best matches first
     if search_query:
-        books = Book.query.join(Author).filter(
-            (Book.title.ilike(f'%{search_query}%')) | (Author.name.ilike(f'%{search_query}%'))
+        books = search.apply(
+            Book.query.join(Author).options(contains_eager(Book.author)), Book.id, search_query, db.engine,
+            fallback=(Book.title, Author.name)
         ).paginate(page=page, per_page=10)
     else:
-        books = Book.query.paginate(page=page, per_page=10)
+        # The plain listing walks (title, id) with a cursor, so deep pages cost the same as page 1
+        books = KeysetPagination(
+            Book.query.options(joinedload(Book.author)), (Book.title, Book.id), cursor=cursor, per_page=10
+        )
 
     return render_template('dashboard.html', welcome_message=welcome_message, books=books, search_query=search_query)
 
 @app.route('/book/<int:book_id>')
 def book_details(book_id):
-    book = Book.query.get_or_404(book_id)
-    author = Author.query.get(book.author_id)
-    return render_template('book_details.html', book=book, author=author)
+    def render():
+        book = cached_book(book_id)
+        if book is None:
+            abort(404)
+        author = cached_author(book['author_id'])
+        return render_template('book_details.html', book=book, author=author)
+    return page_cache.respond(f'book:{book_id}', viewer_class(), render)
 
 @app.route('/add_book', methods=['GET', 'POST'])
 @login_required
@@ -252,7 +827,12 @@ def add_book():
 
         try:
             db.session.add(new_book)
+            db.session.flush()
+            catalog_changed(f'book:{new_book.id}', f'author:{new_book.author_id}')
+            catalog_stats.book_added(new_book.author_id, new_book.quantity)
             db.session.commit()
+            if new_author_name:
+                author_prefix_cache.clear()
             flash('Book added successfully')
             return redirect(url_for('dashboard'))
         except Exception as e:
@@ -260,9 +840,8 @@ def add_book():
             flash('An error occurred. Please try again.')
             return redirect(url_for('add_book'))
 
-    # Fetch all authors for the dropdown
-    authors = Author.query.all()
-    return render_template('add_book.html', authors=authors)
+    # Authors are looked up as the admin types, through author_search
+    return render_template('add_book.html')
 
 @app.route('/add_author', methods=['GET', 'POST'])
 @login_required
@@ -286,7 +865,10 @@ def add_author():
 
         try:
             db.session.add(new_author)
+            db.session.flush()
+            catalog_changed(f'author:{new_author.id}')
             db.session.commit()
+            author_prefix_cache.clear()
             flash('Author added successfully')
             return redirect(url_for('dashboard'))
         except Exception as e:
@@ -298,8 +880,10 @@ def add_author():
 
 @app.route('/author/<int:author_id>')
 def author_details(author_id):
-    author = Author.query.get_or_404(author_id)
-    return render_template('author_details.html', author=author)
+    def render():
+        author = Author.query.options(selectinload(Author.books)).get_or_404(author_id)
+        return render_template('author_details.html', author=author)
+    return page_cache.respond(f'author:{author_id}', viewer_class(), render)
 
 @app.route('/remove_author/<int:author_id>')
 @login_required
@@ -315,7 +899,9 @@ def remove_author(author_id):
         else:
             try:
                 db.session.delete(author)
+                catalog_changed(f'author:{author.id}')
                 db.session.commit()
+                author_prefix_cache.clear()
                 flash('Author removed successfully')
             except Exception as e:
                 db.session.rollback()
@@ -336,10 +922,12 @@ def remove_book(book_id):
     if book:
         try:
             # Delete all BorrowedBook records associated with this book
-            BorrowedBook.query.filter_by(book_id=book.id).delete()
+            open_loans = BorrowedBook.query.filter_by(book_id=book.id).delete()
 
             # Now delete the book
             db.session.delete(book)
+            catalog_changed(f'book:{book.id}', f'author:{book.author_id}')
+            catalog_stats.book_removed(book.id, book.author_id, book.quantity or 0, open_loans)
             db.session.commit()
             flash('Book removed successfully')
         except Exception as e:
@@ -353,21 +941,98 @@ def remove_book(book_id):
 @app.route('/borrow_book/<int:book_id>', methods=['POST'])
 @login_required
 def borrow_book(book_id):
-    book = Book.query.get(book_id)
-    if book and book.quantity > book.borrowed:
-        try:
-            book.borrowed += 1
-            borrowed_book = BorrowedBook(user_id=current_user.id, book_id=book.id)
-            db.session.add(borrowed_book)
-            db.session.commit()
+    try:
+        if checkout_copy(book_id, current_user.id):
             flash('Book borrowed successfully')
-        except Exception as e:
+        else:
+            flash('Book is not available')
+    except Exception as e:
+        db.session.rollback()
+        flash('An error occurred. Please try again.')
+    return redirect(request.referrer or url_for('dashboard'))
+
+def requested_book_ids():
+    """Book ids from a JSON body ({"book_ids": [...]}) or repeated book_ids form fields."""
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict) or not isinstance(payload.get('book_ids'), list):
+            return None
+        values = payload['book_ids']
+        # JSON says what type each id is; 1.5 or true is a mistake, not book 1
+        if not all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+            return None
+    else:
+        values = request.form.getlist('book_ids')
+    try:
+        return [int(value) for value in values]
+    except (TypeError, ValueError):
+        return None
+
+def batch_loans(action, verb):
+    book_ids = requested_book_ids()
+    limit = app.config['BATCH_LOAN_LIMIT']
+    if not book_ids or len(book_ids) > limit:
+        problems = [{'book_id': None, 'error': f'send between 1 and {limit} book ids'}]
+    else:
+        try:
+            problems = action(book_ids)
+        except Exception:
             db.session.rollback()
-            flash('An error occurred. Please try again.')
+            problems = [{'book_id': None, 'error': 'an error occurred, try again'}]
+
+    if request.is_json:
+        if problems:
+            return jsonify(error=f'Nothing was {verb}', problems=problems), 409
+        return jsonify({verb: book_ids})
+    if problems:
+        flash(f'Nothing was {verb}: ' + '; '.join(
+            f"book {p['book_id']} {p['error']}" if p['book_id'] else p['error'] for p in problems
+        ))
     else:
-        flash('Book is not available')
+        flash(f'{len(book_ids)} books {verb} successfully')
     return redirect(request.referrer or url_for('dashboard'))
 
+@app.route('/borrow_books', methods=['POST'])
+@login_required
+def borrow_books():
+    return batch_loans(lambda book_ids: checkout_copies(book_ids, current_user.id), 'borrowed')
+
+@app.route('/return_books', methods=['POST'])
+@login_required
+def return_books():
+    # Admins may return any copy, as with return_book
+    user_id = None if current_user.is_admin else current_user.id
+    return batch_loans(lambda book_ids: checkin_copies(book_ids, user_id), 'returned')
+
+@app.route('/admin/import', methods=['POST'])
+@login_required
+def import_catalog():
+    if not current_user.is_admin:
+        return jsonify(error='You do not have permission to import books'), 403
+
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify(error='Upload a CSV or JSON Lines file as "file"'), 400
+    fmt = request.form.get('format') or detect_format(upload.filename)
+    source = request.form.get('source') or upload.filename
+    restart = request.form.get('restart') == '1'
+
+    try:
+        result = catalog_importer().run(iter_rows(text_stream(upload.stream), fmt), source, restart=restart)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    finally:
+        author_prefix_cache.clear()
+    return jsonify(result.to_dict())
+
+@app.route('/admin/stats')
+@login_required
+def catalog_statistics():
+    if not current_user.is_admin:
+        flash('You do not have permission to view statistics')
+        return redirect(url_for('dashboard'))
+    return render_template('stats.html', stats=catalog_stats.snapshot())
+
 @app.route('/borrowed_books')
 @login_required
 def borrowed_books():
@@ -375,39 +1040,71 @@ def borrowed_books():
         flash('You do not have permission to view this page')
         return redirect(url_for('dashboard'))
 
-    # Fetch all borrowed books with user and book details
-    borrowed_books = BorrowedBook.query.join(User).join(Book).all()
-
-    # Group borrowed books by book
-    grouped_books = {}
-    for borrowed_book in borrowed_books:
-        book = borrowed_book.book
-        if book not in grouped_books:
-            grouped_books[book] = []
-        grouped_books[book].append(borrowed_book)
-
-    return render_template('borrowed_books.html', borrowed_books=grouped_books)
+    page = request.args.get('page', 1, type=int)
+    book_filter = request.args.get('book', '').strip()
+    user_filter = request.args.get('user', '').strip()
+
+    # One row per borrowed book with its loan count, grouped and paginated in SQL.
+    # Borrower details are fetched per book by borrowed_book_loans() when expanded.
+    groups = db.session.query(
+        Book.id, Book.title, Author.name.label('author_name'), func.count(BorrowedBook.id).label('loan_count')
+    ).join(BorrowedBook, BorrowedBook.book_id == Book.id).join(Author, Author.id == Book.author_id)
+    if book_filter:
+        groups = groups.filter(Book.title.ilike(f'%{book_filter}%'))
+    if user_filter:
+        groups = groups.join(User, User.id == BorrowedBook.user_id).filter(User.username.ilike(f'{user_filter}%'))
+    groups = groups.group_by(Book.id, Book.title, Author.name).order_by(Book.title, Book.id)
+
+    return render_template(
+        'borrowed_books.html',
+        groups=groups.paginate(page=page, per_page=20),
+        book_filter=book_filter,
+        user_filter=user_filter
+    )
+
+@app.route('/borrowed_books/<int:book_id>/loans')
+@login_required
+def borrowed_book_loans(book_id):
+    if not current_user.is_admin:
+        return jsonify(error='You do not have permission to view this page'), 403
+
+    loans = db.session.query(
+        BorrowedBook.id, BorrowedBook.borrowed_at, User.id.label('user_id'),
+        User.username, User.email, User.phone_number
+    ).join(User, User.id == BorrowedBook.user_id).filter(BorrowedBook.book_id == book_id)
+    user_filter = request.args.get('user', '').strip()
+    if user_filter:
+        loans = loans.filter(User.username.ilike(f'{user_filter}%'))
+
+    return jsonify(loans=[{
+        'id': loan.id,
+        'user_id': loan.user_id,
+        'username': loan.username,
+        'email': loan.email,
+        'phone_number': loan.phone_number,
+        'borrowed_at': loan.borrowed_at.strftime('%d/%m - %H:%M') if loan.borrowed_at else '',
+    } for loan in loans.order_by(BorrowedBook.borrowed_at, BorrowedBook.id)])
 
 @app.route('/return_book/<int:book_id>', methods=['POST'])
 @login_required
 def return_book(book_id):
-    book = Book.query.get(book_id)
+    book = cached_book(book_id)
     if not book:
         flash('Book not found')
         return redirect(url_for('dashboard'))
 
     # Allow admins to return any book, or users to return their own books
     if current_user.is_admin:
-        borrowed_book = BorrowedBook.query.filter_by(book_id=book.id).first()
+        borrowed_book = BorrowedBook.query.filter_by(book_id=book_id).first()
     else:
-        borrowed_book = BorrowedBook.query.filter_by(book_id=book.id, user_id=current_user.id).first()
+        borrowed_book = BorrowedBook.query.filter_by(book_id=book_id, user_id=current_user.id).first()
 
     if borrowed_book:
         try:
-            book.borrowed -= 1
-            db.session.delete(borrowed_book)
-            db.session.commit()
-            flash('Book returned successfully')
+            if checkin_copy(borrowed_book.id, book_id):
+                flash('Book returned successfully')
+            else:
+                flash('You cannot return this book')
         except Exception as e:
             db.session.rollback()
             flash('An error occurred. Please try again.')
@@ -418,8 +1115,150 @@ def return_book(book_id):
 
 
 
+@app.route('/metrics')
+def metrics():
+    token = app.config['METRICS_TOKEN']
+    if not app.config['METRICS_ENABLED']:
+        return 'Metrics are disabled', 404
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return 'Forbidden', 403
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# JSON API
+# Listings page by id with a cursor, or stream as NDJSON with ?format=ndjson.
+# ETags come from the catalog version (a single book from its own and its author's),
+# so unchanged polls are answered with a 304.
+API_MAX_LIMIT = 500
+MAX_ID = 2 ** 63 - 1  # SQLite integers are 64-bit; larger ids can't name a row and fail in the driver
+
+def api_etag(*parts, version=None):
+    if version is None:
+        version = page_cache.catalog_version()[0]
+    return make_etag(version, request.path,
+                     sorted(request.args.items(multi=True)), wants_ndjson(), *parts)
+
+def api_limit():
+    return max(1, min(request.args.get('limit', 50, type=int), API_MAX_LIMIT))
+
+def book_row(row):
+    return {
+        'id': row.id,
+        'title': row.title,
+        'author_id': row.author_id,
+        'author': row.author,
+        'quantity': row.quantity,
+        'borrowed': row.borrowed,
+        'available': row.quantity - row.borrowed,
+    }
+
+def api_book_query():
+    return db.session.query(
+        Book.id, Book.title, Book.author_id, Author.name.label('author'), Book.quantity, Book.borrowed
+    ).join(Author, Author.id == Book.author_id)
+
+def api_listing(query, key_column, serialize, name, etag):
+    if wants_ndjson():
+        rows = query.order_by(key_column).yield_per(1000)
+        return ndjson_response((serialize(row) for row in rows), etag)
+    page = KeysetPagination(query, (key_column,), cursor=request.args.get('cursor'), per_page=api_limit())
+    return json_response({name: [serialize(row) for row in page.items], 'next_cursor': page.next_cursor}, etag)
+
+@app.route('/api/v1/books')
+def api_books():
+    etag = api_etag()
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    query = api_book_query()
+    author_id = request.args.get('author_id', type=int)
+    if author_id:
+        query = query.filter(Book.author_id == author_id)
+    return api_listing(query, Book.id, book_row, 'books', etag)
+
+@app.route('/api/v1/books/<int:book_id>')
+def api_book(book_id):
+    if book_id > MAX_ID:
+        return jsonify(error='Book not found'), 404
+    # Versions are read before the rows, so a change racing this request can
+    # only leave the ETag older than the body, never newer.
+    book_version = page_cache.version(f'book:{book_id}')[0]
+    book = cached_book(book_id)
+    if book is None:
+        return json_response({'error': 'Book not found'}, api_etag(version=book_version), status=404)
+    author_version = page_cache.version(f'author:{book["author_id"]}')[0]
+    etag = api_etag(version=f'{book_version}.{author_version}')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    author = cached_author(book['author_id'])
+    return json_response(book_row(SimpleNamespace(**book, author=author and author['name'])), etag)
+
+@app.route('/api/v1/authors')
+def api_authors():
+    etag = api_etag()
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    query = db.session.query(Author.id, Author.name, Author.bio)
+    return api_listing(query, Author.id, lambda row: {'id': row.id, 'name': row.name, 'bio': row.bio}, 'authors', etag)
+
+@app.route('/api/v1/authors/search')
+def author_search():
+    prefix = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', app.config['AUTHOR_SEARCH_LIMIT'], type=int), 50))
+    return jsonify(authors=authors_by_prefix(prefix, limit) if prefix else [])
+
+@app.route('/api/v1/stats')
+def api_stats():
+    if not current_user.is_authenticated or not current_user.is_admin:
+        return jsonify(error='Statistics are for admins'), 403
+    limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+    return jsonify(catalog_stats.snapshot(limit))
+
+@app.route('/api/v1/availability')
+def api_availability():
+    try:
+        ids = [int(value) for value in request.args.get('ids', '').split(',') if value.strip()]
+    except ValueError:
+        return jsonify(error='ids must be a comma-separated list of book ids'), 400
+    if any(abs(book_id) > MAX_ID for book_id in ids):
+        return jsonify(error='ids must be a comma-separated list of book ids'), 400
+    if len(ids) > API_MAX_LIMIT:
+        return jsonify(error=f'At most {API_MAX_LIMIT} ids per request'), 400
+    etag = api_etag()
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    rows = db.session.query(Book.id, Book.quantity, Book.borrowed).filter(Book.id.in_(ids)) if ids else []
+    return json_response({'availability': {str(row.id): row.quantity - row.borrowed for row in rows}}, etag)
+
+@app.route('/api/v1/loans')
+def api_loans():
+    if not current_user.is_authenticated:
+        return jsonify(error='Log in to see loans'), 401
+    etag = api_etag(current_user.id)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    query = db.session.query(
+        BorrowedBook.id, BorrowedBook.book_id, Book.title, BorrowedBook.user_id, BorrowedBook.borrowed_at,
+        BorrowedBook.due_at,
+    ).join(Book, Book.id == BorrowedBook.book_id)
+    if not current_user.is_admin:
+        query = query.filter(BorrowedBook.user_id == current_user.id)
+    elif request.args.get('user_id', type=int):
+        query = query.filter(BorrowedBook.user_id == request.args.get('user_id', type=int))
+    return api_listing(query, BorrowedBook.id, lambda row: {
+        'id': row.id,
+        'book_id': row.book_id,
+        'title': row.title,
+        'user_id': row.user_id,
+        'borrowed_at': row.borrowed_at.isoformat() if row.borrowed_at else None,
+        'due_at': row.due_at.isoformat() if row.due_at else None,
+    }, 'loans', etag)
+
 # Run the app
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        init_db()
     app.run(debug=True)
\ No newline at end of file
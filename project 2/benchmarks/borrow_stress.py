@@ -0,0 +1,103 @@
+"""Hammer borrow/return from several worker processes against one SQLite file.
+
+Usage: python benchmarks/borrow_stress.py [--workers 1 2 4 8] [--ops 500]
+
+For each worker count, the database is re-seeded with a handful of scarce
+books and every worker loops over checkout/checkin. The script reports
+throughput and checks that ``0 <= borrowed <= quantity`` and that
+``borrowed`` equals the number of open loans for every book.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SCRATCH = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(SCRATCH, 'stress.db')
+os.environ['CATALOG_CACHE_PATH'] = os.path.join(SCRATCH, 'catalog_cache.db')
+
+from app import app, db, init_db, drop_db, Author, Book, BorrowedBook, User, checkout_copy, checkin_copy
+
+
+def worker(seed, ops, book_ids, user_id, start, counter):
+    rng = random.Random(seed)
+    done = 0
+    start.wait()
+    with app.app_context():
+        for _ in range(ops):
+            book_id = rng.choice(book_ids)
+            if rng.random() < 0.6:
+                checkout_copy(book_id, user_id)
+            else:
+                loan_id = db.session.execute(
+                    db.select(BorrowedBook.id).filter_by(book_id=book_id).limit(1)
+                ).scalar()
+                if loan_id:
+                    checkin_copy(loan_id, book_id)
+            done += 1
+    with counter.get_lock():
+        counter.value += done
+
+
+def run(workers, ops):
+    with app.app_context():
+        drop_db()
+        init_db()
+        author = Author(name='Stress')
+        user = User(first_name='S', last_name='T', username='stress', password='x',
+                    phone_number='0', email='stress@example.com')
+        db.session.add_all([author, user])
+        db.session.flush()
+        books = [Book(title=f'Stress {i}', quantity=3, borrowed=0, author_id=author.id) for i in range(5)]
+        db.session.add_all(books)
+        db.session.commit()
+        book_ids, user_id = [b.id for b in books], user.id
+        db.session.remove()
+        db.engine.dispose()
+
+    start = multiprocessing.Event()
+    counter = multiprocessing.Value('i', 0)
+    processes = [
+        multiprocessing.Process(target=worker, args=(n, ops, book_ids, user_id, start, counter))
+        for n in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    began = time.perf_counter()
+    start.set()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - began
+
+    with app.app_context():
+        violations = 0
+        for book in Book.query.all():
+            loans = BorrowedBook.query.filter_by(book_id=book.id).count()
+            if not 0 <= book.borrowed <= book.quantity or book.borrowed != loans:
+                violations += 1
+        db.session.remove()
+        db.engine.dispose()
+
+    print(f'workers={workers:<3} ops={counter.value:<6} {counter.value / elapsed:8.0f} ops/s  '
+          f'invariant {"OK" if not violations else f"BROKEN for {violations} books"}')
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--ops', type=int, default=500, help='operations per worker')
+    args = parser.parse_args()
+
+    failures = 0
+    for workers in args.workers:
+        failures += run(workers, args.ops)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Compare database profiles on the dashboard and borrow/return paths.
+
+Usage: python benchmarks/engine_profiles.py [--profiles baseline default throughput]
+                                            [--books 5000] [--requests 300] [--threads 1 4]
+                                            [--memory]
+
+Each profile runs in a fresh interpreter (the engine is built when app.py is
+imported) against its own scratch SQLite file, or an in-memory database with
+``--memory`` (single-threaded: it is one shared connection). A seeded catalog is then hit through the test client: dashboard
+listing pages, a dashboard search, and borrow/return pairs, from one or more
+threads. The table shows overall requests per second and the mean and 95th
+percentile latency of each path in milliseconds (borrow is a borrow plus a return).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+PATHS = ('dashboard', 'search', 'borrow')
+
+
+def seed(books):
+    from sqlalchemy import insert
+    from app import db, init_db, drop_db, Author, Book
+
+    drop_db()
+    init_db()
+    authors = [{'name': f'Author {n}', 'bio': ''} for n in range(max(1, books // 25))]
+    db.session.execute(insert(Author), authors)
+    author_ids = [row[0] for row in db.session.execute(db.select(Author.id))]
+    db.session.execute(insert(Book), [
+        {'title': f'Title {n:06d}', 'description': 'Seeded', 'quantity': 1000, 'borrowed': 0,
+         'author_id': author_ids[n % len(author_ids)]}
+        for n in range(books)
+    ])
+    db.session.commit()
+    return [row[0] for row in db.session.execute(db.select(Book.id).limit(50))]
+
+
+def make_reader(number):
+    from app import db, password_hasher, User
+
+    user = User(first_name='Bench', last_name=str(number), username=f'bench{number}',
+                password=password_hasher.hash('secret'), phone_number='0',
+                email=f'bench{number}@example.com')
+    db.session.add(user)
+    db.session.commit()
+    return user.username
+
+
+def timed(client, path, method='get'):
+    started = time.perf_counter()
+    response = getattr(client, method)(path)
+    elapsed = time.perf_counter() - started
+    if response.status_code >= 400:
+        raise RuntimeError(f'{path} answered {response.status_code}')
+    return elapsed
+
+
+def drive(app, username, book_ids, requests, results, lock):
+    client = app.test_client()
+    client.post('/login', data={'login_input': username, 'password': 'secret'})
+    local = {path: [] for path in PATHS}
+    for n in range(requests):
+        local['dashboard'].append(timed(client, f'/dashboard?page={n % 20 + 1}'))
+        local['search'].append(timed(client, f'/dashboard?search=Title+{n % 100:04d}'))
+        book_id = book_ids[n % len(book_ids)]
+        local['borrow'].append(timed(client, f'/borrow_book/{book_id}', 'post')
+                               + timed(client, f'/return_book/{book_id}', 'post'))
+    with lock:
+        for path, samples in local.items():
+            results[path].extend(samples)
+
+
+def run_profile(args):
+    """Child process: measure one profile and print the result as JSON."""
+    from app import app, db, password_hasher
+
+    password_hasher.method = 'pbkdf2:sha256:1000'
+    with app.app_context():
+        book_ids = seed(args.books)
+        usernames = [make_reader(n) for n in range(max(args.threads))]
+        db.session.remove()
+
+    report = {}
+    for threads in args.threads:
+        results, lock = {path: [] for path in PATHS}, threading.Lock()
+        workers = [
+            threading.Thread(target=drive, args=(app, usernames[n], book_ids, args.requests, results, lock))
+            for n in range(threads)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        wall = time.perf_counter() - started
+        count = sum(len(samples) for samples in results.values())
+        report[threads] = {'rps': count / wall}
+        for path, samples in results.items():
+            samples.sort()
+            report[threads][path] = {
+                'mean_ms': 1000 * sum(samples) / len(samples),
+                'p95_ms': 1000 * samples[int(len(samples) * 0.95)],
+            }
+    print(json.dumps(report))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', nargs='+', default=['baseline', 'default', 'throughput'])
+    parser.add_argument('--books', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=300, help='iterations per thread')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--memory', action='store_true', help='use in-memory SQLite')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_profile(args)
+        return
+    if args.memory:
+        args.threads = [1]
+
+    print(f"{'profile':<12}{'threads':>8}{'req/s':>8}"
+          + ''.join(f'{path + " mean":>16}{"p95 ms":>8}' for path in PATHS))
+    for profile in args.profiles:
+        scratch = tempfile.mkdtemp()
+        env = dict(os.environ, DB_PROFILE=profile, OUTBOX_DISPATCHER_THREAD='0',
+                   CATALOG_CACHE_PATH=os.path.join(scratch, 'catalog_cache.db'))
+        env['DATABASE_URL'] = 'sqlite://' if args.memory else 'sqlite:///' + os.path.join(scratch, f'{profile}.db')
+        command = [sys.executable, os.path.abspath(__file__), '--child', profile,
+                   '--books', str(args.books), '--requests', str(args.requests),
+                   '--threads', *map(str, args.threads)]
+        output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+        for threads, paths in report.items():
+            print(f"{profile:<12}{threads:>8}{paths['rps']:>8.0f}" + ''.join(
+                f"{paths[path]['mean_ms']:>16.2f}{paths[path]['p95_ms']:>8.2f}" for path in PATHS
+            ))
+
+
+if __name__ == '__main__':
+    main()
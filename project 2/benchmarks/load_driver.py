@@ -0,0 +1,265 @@
+"""Weighted-scenario load driver with per-route latency percentiles.
+
+Usage: python benchmarks/load_driver.py [--threads 4] [--duration 20]
+                                        [--weights login=1 search=4 paginate=6 borrow=3 admin=1]
+                                      [--users 1000 --books 20000 --loans 2000 | --no-seed]
+                                      [--url http://127.0.0.1:5000] [--json]
+
+By default the app runs in process behind the Flask test client, against a
+scratch SQLite file seeded with ``seed-data``'s generator (``DATABASE_URL`` and
+``--no-seed`` reuse an existing database instead). With ``--url`` the same
+scenarios are sent over HTTP to a running server, which must already hold
+seeded data. Each thread logs in as its own reader (and admin) and then picks
+scenarios at random by weight until the time is up:
+
+    login     log out and back in
+    search    dashboard search for a title word
+    paginate  walk the dashboard listing by cursor
+    borrow    borrow a book and return it
+    admin     admin borrowed_books overview, with a random page
+
+The report shows requests, req/s, p50/p95/p99 latency in milliseconds and
+errors per route; ``--json`` prints it machine-readable for comparing runs.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+DEFAULT_WEIGHTS = {'login': 1, 'search': 4, 'paginate': 6, 'borrow': 3, 'admin': 1}
+SEARCH_WORDS = ('Silent', 'Garden', 'River', 'Golden Clock', 'Forest', 'Winter', 'Library', 'Voyage')
+NEXT_CURSOR = re.compile(r'cursor=([A-Za-z0-9_\-=%]+)[^>]*>\s*Next', re.S)
+
+
+class TestClientSession:
+    """Requests through the Flask test client, in process."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        return response.status_code, response.get_data(as_text=True)
+
+
+class HttpSession:
+    """Requests over HTTP with a cookie jar; redirects are not followed."""
+
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), self.NoRedirect
+        )
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                return response.status, response.read().decode()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read().decode(errors='replace')
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def add(self, route, elapsed, ok):
+        with self.lock:
+            self.samples.setdefault(route, []).append(elapsed)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    def report(self, wall):
+        rows = {}
+        for route, samples in sorted(self.samples.items()):
+            samples = sorted(samples)
+            rows[route] = {
+                'requests': len(samples),
+                'rps': len(samples) / wall,
+                'p50_ms': 1000 * percentile(samples, 50),
+                'p95_ms': 1000 * percentile(samples, 95),
+                'p99_ms': 1000 * percentile(samples, 99),
+                'errors': self.errors.get(route, 0),
+            }
+        return rows
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class VirtualUser:
+    def __init__(self, session, admin_session, username, admin, password, book_ids, recorder, rng):
+        self.session = session
+        self.admin_session = admin_session
+        self.username = username
+        self.admin = admin
+        self.password = password
+        self.book_ids = book_ids
+        self.recorder = recorder
+        self.rng = rng
+        self.cursor = None
+
+    def call(self, route, method, path, data=None, session=None, expect=(200, 302, 304)):
+        started = time.perf_counter()
+        status, body = (session or self.session).request(method, path, data)
+        self.recorder.add(route, time.perf_counter() - started, status in expect)
+        return body
+
+    def log_in(self, session, username):
+        self.call('POST /login', 'POST', '/login',
+                  {'login_input': username, 'password': self.password}, session=session)
+
+    def login(self):
+        self.call('GET /logout', 'GET', '/logout')
+        self.log_in(self.session, self.username)
+
+    def search(self):
+        query = urllib.parse.quote_plus(self.rng.choice(SEARCH_WORDS))
+        self.call('GET /dashboard?search', 'GET', f'/dashboard?search={query}')
+
+    def paginate(self):
+        path = f'/dashboard?cursor={self.cursor}' if self.cursor else '/dashboard'
+        body = self.call('GET /dashboard', 'GET', path)
+        match = NEXT_CURSOR.search(body)
+        # Restart from the first page now and then, as readers do
+        self.cursor = match.group(1) if match and self.rng.random() < 0.8 else None
+
+    def borrow(self):
+        book_id = self.rng.choice(self.book_ids)
+        self.call('POST /borrow_book', 'POST', f'/borrow_book/{book_id}')
+        self.call('POST /return_book', 'POST', f'/return_book/{book_id}')
+
+    def admin_overview(self):
+        page = self.rng.randint(1, 5)
+        self.call('GET /borrowed_books', 'GET', f'/borrowed_books?page={page}', session=self.admin_session,
+                  expect=(200, 404))
+
+
+def use_scratch_files():
+    """Point the app at scratch files unless told otherwise; call before importing app."""
+    scratch = tempfile.mkdtemp()
+    if not os.environ.get('DATABASE_URL'):
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(scratch, 'load.db')
+    os.environ.setdefault('CATALOG_CACHE_PATH', os.path.join(scratch, 'catalog_cache.db'))
+    os.environ.setdefault('OUTBOX_DISPATCHER_THREAD', '0')
+
+
+def prepare_in_process(args):
+    from app import app, db, init_db, seed_generator
+
+    with app.app_context():
+        init_db()
+        if not args.no_seed:
+            result = seed_generator(seed=args.seed).run(
+                users=args.users, authors=max(1, args.books // 20), books=args.books, loans=args.loans,
+                admins=args.threads,
+            )
+            print(f'Seeded in {result.elapsed:.1f}s: {result.counts}', file=sys.stderr)
+        accounts = account_names(db)
+        db.session.remove()
+    return lambda: TestClientSession(app), accounts
+
+
+def account_names(db):
+    from app import Book, User
+
+    readers = db.session.execute(
+        db.select(User.username).filter_by(is_admin=False).order_by(User.id.desc()).limit(500)
+    ).scalars().all()
+    admins = db.session.execute(
+        db.select(User.username).filter_by(is_admin=True).order_by(User.id.desc()).limit(50)
+    ).scalars().all()
+    book_ids = db.session.execute(db.select(Book.id).order_by(Book.id).limit(2000)).scalars().all()
+    return readers, admins, book_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=20, help='seconds')
+    parser.add_argument('--weights', nargs='+', default=[], metavar='SCENARIO=WEIGHT')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--books', type=int, default=20000)
+    parser.add_argument('--loans', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-seed', action='store_true', help='use the data already in DATABASE_URL')
+    parser.add_argument('--url', help='drive a running server instead of the in-process app')
+    parser.add_argument('--accounts', nargs=2, metavar=('READER', 'ADMIN'),
+                        help="with --url: usernames to log in as (with the seeded accounts' password)")
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+    use_scratch_files()
+    from app import SEED_PASSWORD
+
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in args.weights:
+        name, _, weight = item.partition('=')
+        if name not in DEFAULT_WEIGHTS:
+            parser.error(f'unknown scenario {name!r}; expected one of {sorted(DEFAULT_WEIGHTS)}')
+        weights[name] = float(weight)
+
+    if args.url:
+        if not args.accounts:
+            parser.error('--url needs --accounts READER ADMIN')
+        make_session = lambda: HttpSession(args.url)
+        readers, admins, book_ids = [args.accounts[0]], [args.accounts[1]], list(range(1, 201))
+    else:
+        make_session, (readers, admins, book_ids) = prepare_in_process(args)
+    if not readers or not admins or not book_ids:
+        sys.exit('The database needs at least one reader, one admin and one book.')
+
+    recorder = Recorder()
+    deadline = time.perf_counter() + args.duration
+
+    def run(n):
+        rng = random.Random(args.seed + n)
+        user = VirtualUser(make_session(), make_session(), readers[n % len(readers)],
+                           admins[n % len(admins)], SEED_PASSWORD, book_ids, recorder, rng)
+        user.log_in(user.session, user.username)
+        user.log_in(user.admin_session, user.admin)
+        scenarios = {'login': user.login, 'search': user.search, 'paginate': user.paginate,
+                     'borrow': user.borrow, 'admin': user.admin_overview}
+        names = [name for name in scenarios if weights[name] > 0]
+        while time.perf_counter() < deadline:
+            scenarios[rng.choices(names, [weights[name] for name in names])[0]]()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report = recorder.report(time.perf_counter() - started)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{'route':<26}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for route, row in report.items():
+        print(f"{route:<26}{row['requests']:>9}{row['rps']:>9.1f}{row['p50_ms']:>9.2f}"
+              f"{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}{row['errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
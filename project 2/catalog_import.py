@@ -0,0 +1,208 @@
+"""Bulk catalog import from CSV or JSON Lines.
+
+Rows carry ``title``, ``author`` and optionally ``description``, ``quantity``
+and ``author_bio``. Authors are resolved through an in-memory name -> id map
+loaded once, and rows are written in large batches with executemany, one
+transaction per batch. Each batch commits together with the import job's
+checkpoint, so an import that dies part way can be re-run with the same
+source name and continues after the last committed batch.
+"""
+import csv
+import io
+import json
+import time
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+MAX_QUANTITY = 100_000  # copies of one title; anything above is a typo, not a library
+
+
+def iter_rows(stream, fmt):
+    """Yield dict rows from a text stream in ``csv`` or ``jsonl`` format."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'jsonl':
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if line:
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise ValueError(f'Line {number} is not a JSON object')
+                yield row
+    else:
+        raise ValueError(f'Unknown import format: {fmt}')
+
+
+def book_fields(row):
+    """``(title, author, author_bio, description, quantity)`` from a row, or None if it is unusable."""
+    texts = [row.get(field) or '' for field in ('title', 'author', 'author_bio', 'description')]
+    if not all(isinstance(text, str) for text in texts):
+        return None
+    title, name, bio, description = (text.strip() for text in texts)
+    quantity = row.get('quantity') or 1
+    if isinstance(quantity, bool) or not isinstance(quantity, (int, str)):
+        return None
+    try:
+        quantity = int(quantity)
+    except ValueError:
+        return None
+    if not title or not name or not 1 <= quantity <= MAX_QUANTITY:
+        return None
+    return title, name, bio, description, quantity
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def text_stream(binary):
+    return io.TextIOWrapper(binary, encoding='utf-8', newline='')
+
+
+class ImportResult:
+    def __init__(self, job, inserted, skipped, resumed_from, elapsed):
+        self.job = job
+        self.inserted = inserted
+        self.skipped = skipped
+        self.resumed_from = resumed_from
+        self.elapsed = elapsed
+
+    @property
+    def rate(self):
+        return self.inserted / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self):
+        return {
+            'source': self.job.source,
+            'status': self.job.status,
+            'rows_done': self.job.rows_done,
+            'inserted': self.inserted,
+            'skipped': self.skipped,
+            'resumed_from': self.resumed_from,
+            'seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rate, 1),
+        }
+
+
+class CatalogImporter:
+    def __init__(self, db, author_model, book_model, job_model, page_cache=None, stats=None,
+                 batch_size=5000, progress=None):
+        self.db = db
+        self.Author = author_model
+        self.Book = book_model
+        self.Job = job_model
+        self.page_cache = page_cache
+        self.stats = stats
+        self.batch_size = batch_size
+        self.progress = progress  # called as progress(rows_done, inserted, elapsed) after each batch
+
+    def _job(self, source, restart):
+        job = self.Job.query.filter(self.Job.source == source, self.Job.status != 'done').first()
+        if job and restart:
+            job.status = 'abandoned'
+            job = None
+        if job is None:
+            job = self.Job(source=source, rows_done=0, status='running', started_at=datetime.utcnow())
+            self.db.session.add(job)
+        job.status = 'running'
+        self.db.session.commit()
+        return job
+
+    def _author_ids(self):
+        ids = {}
+        for author_id, name in self.db.session.execute(
+            select(self.Author.id, self.Author.name).order_by(self.Author.id)
+        ):
+            ids.setdefault(name, author_id)
+        return ids
+
+    def run(self, rows, source, restart=False):
+        """Import ``rows`` (an iterable of dicts) under the job name ``source``."""
+        session = self.db.session
+        job = self._job(source, restart)
+        resumed_from = job.rows_done
+        authors = self._author_ids()
+        inserted = skipped = 0
+        started = time.perf_counter()
+
+        position = 0
+        batch = []
+        try:
+            for row in rows:
+                position += 1
+                if position <= resumed_from:
+                    continue
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    added, dropped = self._write(batch, authors, job, position)
+                    inserted += added
+                    skipped += dropped
+                    batch = []
+                    self._report(job, inserted, started)
+            if batch:
+                added, dropped = self._write(batch, authors, job, position)
+                inserted += added
+                skipped += dropped
+                self._report(job, inserted, started)
+        except Exception:
+            session.rollback()
+            job.status = 'failed'
+            session.commit()
+            raise
+
+        job.status = 'done'
+        job.finished_at = datetime.utcnow()
+        session.commit()
+        return ImportResult(job, inserted, skipped, resumed_from, time.perf_counter() - started)
+
+    def _write(self, batch, authors, job, position):
+        """Insert one batch and advance the checkpoint, in one transaction."""
+        session = self.db.session
+        books, new_authors, skipped = [], {}, 0
+        for row in batch:
+            fields = book_fields(row)
+            if fields is None:
+                skipped += 1
+                continue
+            title, name, bio, description, quantity = fields
+            if name not in authors and name not in new_authors:
+                new_authors[name] = bio
+            books.append({
+                'title': title,
+                'description': description,
+                'quantity': quantity,
+                'borrowed': 0,
+                'author': name,
+            })
+
+        if new_authors:
+            created = session.execute(
+                insert(self.Author).returning(self.Author.id, self.Author.name, sort_by_parameter_order=True),
+                [{'name': name, 'bio': bio} for name, bio in new_authors.items()],
+            )
+            for author_id, name in created:
+                authors[name] = author_id
+
+        for book in books:
+            book['author_id'] = authors[book.pop('author')]
+        if books:
+            session.execute(insert(self.Book), books)
+            if self.page_cache is not None:
+                self.page_cache.bump(*sorted({f"author:{book['author_id']}" for book in books}))
+            if self.stats is not None:
+                per_author = Counter(book['author_id'] for book in books)
+                self.stats.adjust(
+                    ('titles', 0, len(books)),
+                    ('copies', 0, sum(book['quantity'] for book in books)),
+                    *(('author_books', author_id, count) for author_id, count in per_author.items()),
+                )
+
+        job.rows_done = position
+        session.commit()
+        return len(books), skipped
+
+    def _report(self, job, inserted, started):
+        if self.progress is not None:
+            self.progress(job.rows_done, inserted, time.perf_counter() - started)
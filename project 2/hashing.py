@@ -0,0 +1,73 @@
+"""Password hashing policy.
+
+``PasswordHasher`` wraps werkzeug's hash functions with a configurable
+method/cost, tells callers when a stored hash was made under an older policy,
+and caps how many hashes run at once. With ``workers`` > 0 the hashing itself
+runs in a process pool, so a burst of logins queues there instead of holding
+the GIL against catalog requests.
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised when no hashing slot frees up within the queue timeout."""
+
+
+class PasswordHasher:
+    def __init__(self, method='scrypt', workers=0, concurrency=4, queue_timeout=10):
+        self.method = method
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def method(self):
+        return self._method
+
+    @method.setter
+    def method(self, method):
+        self._method = method
+        self._prefix = None
+
+    @property
+    def prefix(self):
+        """The ``method$`` header werkzeug writes for the current policy, e.g. ``scrypt:32768:8:1``."""
+        if self._prefix is None:
+            self._prefix = generate_password_hash('', self._method).split('$', 1)[0]
+        return self._prefix
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HashingBusy()
+        try:
+            if not self.workers:
+                return function(*args)
+            return self._executor().submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self._method)
+
+    def verify(self, stored, password):
+        return self._run(check_password_hash, stored, password)
+
+    def needs_rehash(self, stored):
+        return stored.split('$', 1)[0] != self.prefix
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
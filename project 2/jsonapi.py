@@ -0,0 +1,53 @@
+"""Helpers for the JSON catalog API.
+
+Responses are built from plain row tuples and serialized with compact
+``json.dumps``. Every response carries an ETag derived from the catalog
+version (one primary-key lookup) plus the request arguments, so a poller
+that sends ``If-None-Match`` gets a 304 without any listing query or
+serialization. Large listings can be streamed as NDJSON, one object per line.
+"""
+import hashlib
+import json
+
+from flask import Response, request, stream_with_context
+
+
+def dumps(payload):
+    return json.dumps(payload, separators=(',', ':'), default=str)
+
+
+def make_etag(version, *parts):
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+    return f'{version}-{digest}'
+
+
+def wants_ndjson():
+    return (request.args.get('format') == 'ndjson'
+            or request.accept_mimetypes.best == 'application/x-ndjson')
+
+
+def not_modified(etag):
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
+def json_response(payload, etag, status=200):
+    response = Response(dumps(payload), status=status, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def ndjson_response(rows, etag):
+    """Stream ``rows`` (an iterable of dicts, consumed lazily) as NDJSON."""
+    def generate():
+        for row in rows:
+            yield dumps(row) + '\n'
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
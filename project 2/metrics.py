@@ -0,0 +1,219 @@
+"""Per-request SQL and latency metrics in Prometheus text format.
+
+Every request is counted by endpoint, method and status. A sampled share of
+requests (``sample_rate``) is also measured: total latency, the number of SQL
+statements and the time spent in them, and the time spent rendering
+templates, each kept as a histogram per endpoint. Statements slower than
+``slow_query_ms`` are logged with their SQL normalized (literals and IN lists
+collapsed) whether or not the request was sampled, and counted; the latest
+ones are kept for inspection.
+
+Measuring costs two ``perf_counter`` calls per statement and a few locked
+additions per request; no extra queries are made.
+"""
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.I)
+_SPACE = re.compile(r'\s+')
+
+
+def normalize_sql(statement):
+    """Collapse a statement to its shape, so similar queries group together."""
+    sql = _STRING.sub('?', statement)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for v in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self.values)
+        for labels, value in sorted(values.items()):
+            yield f'{self.name}{_labels(self.labelnames, labels)} {value}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets, labelnames=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = labelnames
+        self.series = {}  # labels -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self.series.items()}
+        names = self.labelnames + ('le',)
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                yield f'{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {values[-1]}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}'
+
+
+class Callback:
+    """A value read when metrics are scraped, e.g. a cache's hit counter."""
+
+    def __init__(self, name, help, kind, read):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.read = read  # returns a number, or a dict of {(label, value) pairs: number}
+
+    def samples(self):
+        value = self.read()
+        if not isinstance(value, dict):
+            yield f'{self.name} {value}'
+            return
+        for labels, number in sorted(value.items()):
+            yield f'{self.name}{_labels([k for k, _ in labels], [v for _, v in labels])} {number}'
+
+
+class RequestMetrics:
+    def __init__(self, app=None, sample_rate=1.0, slow_query_ms=200, prefix='library'):
+        self.sample_rate = sample_rate
+        self.slow_query_seconds = slow_query_ms / 1000 if slow_query_ms is not None else None
+        self.slow_queries = deque(maxlen=100)  # (when, seconds, endpoint, normalized SQL)
+        self.logger = logging.getLogger('slow_query')
+        self.requests = Counter(f'{prefix}_requests_total', 'Requests handled.', ('endpoint', 'method', 'status'))
+        self.latency = Histogram(f'{prefix}_request_duration_seconds', 'Request latency (sampled).',
+                                 LATENCY_BUCKETS, ('endpoint', 'method'))
+        self.db_time = Histogram(f'{prefix}_request_db_seconds', 'Time spent in SQL per request (sampled).',
+                                 LATENCY_BUCKETS, ('endpoint',))
+        self.render_time = Histogram(f'{prefix}_request_render_seconds',
+                                     'Time spent rendering templates per request (sampled).',
+                                     LATENCY_BUCKETS, ('endpoint',))
+        self.queries = Histogram(f'{prefix}_request_queries', 'SQL statements per request (sampled).',
+                                 QUERY_BUCKETS, ('endpoint',))
+        self.slow = Counter(f'{prefix}_slow_queries_total', 'Statements slower than the slow-query threshold.',
+                            ('endpoint',))
+        self.metrics = [self.requests, self.latency, self.db_time, self.render_time, self.queries, self.slow]
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, engine=None):
+        """Hook ``app``'s requests and templates, and every engine (or just ``engine``)."""
+        from sqlalchemy.engine import Engine
+
+        self.logger = logging.getLogger(f'{app.logger.name}.slow_query')
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._finish_render, app)
+        target = engine if engine is not None else Engine
+        event.listen(target, 'before_cursor_execute', self._start_query)
+        event.listen(target, 'after_cursor_execute', self._finish_query)
+
+    def register(self, name, help, read, kind='gauge'):
+        self.metrics.append(Callback(name, help, kind, read))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+    # Request hooks
+
+    def _start_request(self):
+        sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+        # [started, statements, SQL seconds, render seconds, render started]
+        g._metrics = [time.perf_counter(), 0, 0.0, 0.0, None] if sampled else None
+
+    def _finish_request(self, response):
+        endpoint = request.endpoint or 'unmatched'
+        self.requests.inc((endpoint, request.method, response.status_code))
+        state = g.pop('_metrics', None)
+        if state is not None:
+            self.latency.observe((endpoint, request.method), time.perf_counter() - state[0])
+            self.queries.observe((endpoint,), state[1])
+            self.db_time.observe((endpoint,), state[2])
+            self.render_time.observe((endpoint,), state[3])
+        return response
+
+    def _start_render(self, sender, template, context, **extra):
+        state = g.get('_metrics')
+        if state is not None:
+            state[4] = time.perf_counter()
+
+    def _finish_render(self, sender, template, context, **extra):
+        state = g.get('_metrics')
+        if state is not None and state[4] is not None:
+            state[3] += time.perf_counter() - state[4]
+            state[4] = None
+
+    # Engine hooks
+
+    def _start_query(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    def _finish_query(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('metrics_started')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        in_request = has_request_context()
+        state = g.get('_metrics') if in_request else None
+        if state is not None:
+            state[1] += 1
+            state[2] += elapsed
+        if self.slow_query_seconds is not None and elapsed >= self.slow_query_seconds:
+            endpoint = (request.endpoint or 'unmatched') if in_request else 'none'
+            sql = normalize_sql(statement)
+            self.slow.inc((endpoint,))
+            self.slow_queries.append((time.time(), elapsed, endpoint, sql))
+            self.logger.warning('Slow query (%.1f ms) in %s: %s', elapsed * 1000, endpoint, sql)
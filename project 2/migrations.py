@@ -0,0 +1,111 @@
+"""Versioned schema migrations.
+
+``db.create_all()`` only creates tables that are missing; it never touches a
+table that already exists, so an old ``instance/library.db`` would keep its
+original shape forever. ``upgrade()`` creates missing tables, then applies
+every numbered step in ``MIGRATIONS`` that the database has not recorded in
+``schema_migrations``, each in its own transaction. Steps must be safe on a
+database that ``create_all()`` just built from the current models, which
+already has their indexes and columns (hence ``IF NOT EXISTS`` and
+``add_column``). Settings the app is configured with (``loan_days``) are
+passed to ``upgrade()`` and bound as parameters of the backfills.
+"""
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+
+def add_column(table, column, ddl, backfill=None):
+    """A migration step adding ``column`` to ``table`` unless it is already there."""
+    def step(connection, settings):
+        columns = {c['name'] for c in inspect(connection).get_columns(table)}
+        if column not in columns:
+            connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+            if backfill:
+                connection.execute(text(backfill), settings)
+    return step
+
+
+MIGRATIONS = [
+    (1, 'Baseline schema', []),
+    (2, 'Indexes for loan, author and title lookups', [
+        'CREATE INDEX IF NOT EXISTS ix_borrowed_book_book_id ON borrowed_book (book_id)',
+        'CREATE INDEX IF NOT EXISTS ix_borrowed_book_user_id ON borrowed_book (user_id)',
+        'CREATE INDEX IF NOT EXISTS ix_book_author_id ON book (author_id)',
+        'CREATE INDEX IF NOT EXISTS ix_book_title ON book (title)',
+        'CREATE INDEX IF NOT EXISTS ix_author_name ON author (name)',
+    ]),
+    (3, 'Case-insensitive author name index for the typeahead', [
+        'CREATE INDEX IF NOT EXISTS ix_author_name_lower ON author (lower(name))',
+    ]),
+    (4, 'Catalog statistics, computed from the existing rows', [
+        'DELETE FROM catalog_stat',
+        "INSERT INTO catalog_stat (kind, subject_id, value) SELECT 'titles', 0, count(*) FROM book",
+        "INSERT INTO catalog_stat (kind, subject_id, value) SELECT 'copies', 0, coalesce(sum(quantity), 0) FROM book",
+        "INSERT INTO catalog_stat (kind, subject_id, value) SELECT 'on_loan', 0, count(*) FROM borrowed_book",
+        "INSERT INTO catalog_stat (kind, subject_id, value) "
+        "SELECT 'author_books', author_id, count(*) FROM book GROUP BY author_id",
+        # Borrow history starts from the loans open today
+        "INSERT INTO catalog_stat (kind, subject_id, value) "
+        "SELECT 'book_borrows', book_id, count(*) FROM borrowed_book GROUP BY book_id",
+    ]),
+    (5, 'Loan due dates and overdue reminders', [
+        # Open loans get the configured loan period from when they were borrowed
+        add_column('borrowed_book', 'due_at', 'DATETIME',
+                   backfill="UPDATE borrowed_book SET due_at = "
+                            "datetime(coalesce(borrowed_at, CURRENT_TIMESTAMP), '+' || :loan_days || ' days')"),
+        add_column('borrowed_book', 'next_reminder_at', 'DATETIME',
+                   backfill='UPDATE borrowed_book SET next_reminder_at = due_at'),
+        'CREATE INDEX IF NOT EXISTS ix_borrowed_book_due_at ON borrowed_book (due_at)',
+        'CREATE INDEX IF NOT EXISTS ix_borrowed_book_next_reminder_at ON borrowed_book (next_reminder_at)',
+    ]),
+    (6, 'Overdue scan walks readers instead of loans', [
+        'CREATE INDEX IF NOT EXISTS ix_borrowed_book_user_id_next_reminder_at '
+        'ON borrowed_book (user_id, next_reminder_at)',
+        'DROP INDEX IF EXISTS ix_borrowed_book_next_reminder_at',
+    ]),
+    (7, 'Overdue scan stops early when nothing is due', [
+        'CREATE INDEX IF NOT EXISTS ix_borrowed_book_next_reminder_at ON borrowed_book (next_reminder_at)',
+        'DROP INDEX IF EXISTS ix_borrowed_book_due_at',  # nothing filters or sorts on due_at
+    ]),
+]
+
+VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        description VARCHAR(200) NOT NULL,
+        applied_at DATETIME NOT NULL
+    )
+"""
+
+
+def current_version(connection):
+    connection.execute(text(VERSION_TABLE))
+    return connection.execute(text('SELECT max(version) FROM schema_migrations')).scalar() or 0
+
+
+def upgrade(db, loan_days=14):
+    """Bring the database up to date. Returns the descriptions of the steps applied."""
+    settings = {'loan_days': loan_days}
+    engine = db.engine
+    with engine.begin() as connection:
+        version = current_version(connection)
+    db.create_all()
+
+    applied = []
+    for number, description, steps in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as connection:
+            for step in steps:
+                if callable(step):
+                    step(connection, settings)
+                else:
+                    connection.execute(text(step))
+            connection.execute(
+                text('INSERT INTO schema_migrations (version, description, applied_at) '
+                     'VALUES (:version, :description, :applied_at)'),
+                {'version': number, 'description': description, 'applied_at': datetime.utcnow()},
+            )
+        applied.append(f'{number}: {description}')
+    return applied
@@ -0,0 +1,122 @@
+"""Background delivery for queued email.
+
+Routes only insert a row into the outbox table; ``OutboxDispatcher`` picks
+due rows up in batches, sends each batch over one SMTP connection and
+reschedules failures with exponential backoff. Several dispatchers (one per
+gunicorn worker, or a separate ``flask outbox-dispatch`` process) can run at
+once: each batch is claimed with a single conditional UPDATE, so a message is
+never handed to two of them.
+"""
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from flask_mail import Message
+from sqlalchemy import select, update
+
+
+class OutboxDispatcher:
+    def __init__(self, app, db, model, mail, batch_size=50, max_attempts=5,
+                 backoff=30, lease=300, poll_interval=5):
+        self.app = app
+        self.db = db
+        self.model = model
+        self.mail = mail
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff  # seconds before the first retry, doubled on each failure
+        self.lease = lease  # seconds a claimed batch stays hidden from other dispatchers
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def claim_batch(self):
+        """Reserve up to ``batch_size`` due messages for this call."""
+        model, session = self.model, self.db.session
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        due = (
+            select(model.id)
+            .where(model.status == 'pending', model.next_attempt_at <= now)
+            .order_by(model.next_attempt_at, model.id)
+            .limit(self.batch_size)
+        )
+        session.execute(
+            update(model)
+            .where(model.id.in_(due), model.status == 'pending', model.next_attempt_at <= now)
+            .values(claim_token=token, next_attempt_at=now + timedelta(seconds=self.lease))
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        return model.query.filter_by(claim_token=token, status='pending').order_by(model.id).all()
+
+    def dispatch_once(self):
+        """Send one batch. Returns the number of messages delivered."""
+        batch = self.claim_batch()
+        if not batch:
+            return 0
+
+        sent = 0
+        try:
+            with self.mail.connect() as connection:
+                for message in batch:
+                    try:
+                        connection.send(Message(
+                            message.subject, recipients=[message.recipient], body=message.body
+                        ))
+                    except Exception as e:
+                        self._record_failure(message, e)
+                    else:
+                        message.status = 'sent'
+                        message.sent_at = datetime.utcnow()
+                        message.claim_token = None
+                        sent += 1
+        except Exception as e:
+            # Could not connect (or the connection broke on close): retry whatever is left.
+            for message in batch:
+                if message.status == 'pending' and message.claim_token is not None:
+                    self._record_failure(message, e)
+        self.db.session.commit()
+        return sent
+
+    def _record_failure(self, message, error):
+        message.attempts = (message.attempts or 0) + 1
+        message.last_error = f'{type(error).__name__}: {error}'[:500]
+        message.claim_token = None
+        if message.attempts >= self.max_attempts:
+            message.status = 'failed'
+        else:
+            delay = self.backoff * 2 ** (message.attempts - 1)
+            message.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+    def drain(self):
+        """Send batches until nothing is due. Returns the number delivered."""
+        total = 0
+        while True:
+            sent = self.dispatch_once()
+            total += sent
+            if not sent:
+                return total
+
+    def run(self):
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    self.drain()
+                except Exception:
+                    self.db.session.rollback()
+                    self.app.logger.exception('Outbox dispatch failed')
+                finally:
+                    self.db.session.remove()
+                self._stop.wait(self.poll_interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name='outbox-dispatcher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
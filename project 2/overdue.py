@@ -0,0 +1,123 @@
+"""Overdue loan reminders, one digest per reader.
+
+Each loan carries ``next_reminder_at``: its due date at first, then moved
+``remind_every`` past each reminder. ``OverdueScanner.scan`` first asks the
+``next_reminder_at`` index whether any reminder is due at all, which costs
+one index probe however many loans are open; most daily runs stop there.
+Otherwise it walks the readers who have a reminder due in keyset order of
+``user_id``, through the ``(user_id, next_reminder_at)`` index,
+``batch_size`` readers at a time.
+Each batch loads only those readers' due loans, queues their digests in the
+outbox and moves the loans' ``next_reminder_at`` on, all in one transaction,
+so memory is bounded by the batch and a scan that is interrupted and re-run
+never reminds anyone twice.
+"""
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import exists, insert, select, update
+
+
+class ScanResult:
+    def __init__(self, loans, readers, elapsed):
+        self.loans = loans
+        self.readers = readers
+        self.elapsed = elapsed
+
+    def to_dict(self):
+        return {'loans': self.loans, 'readers': self.readers, 'seconds': round(self.elapsed, 3)}
+
+
+class OverdueScanner:
+    def __init__(self, db, loan_model, book_model, user_model, outbox_model,
+                 batch_size=500, remind_every=timedelta(days=7)):
+        self.db = db
+        self.Loan = loan_model
+        self.Book = book_model
+        self.User = user_model
+        self.Outbox = outbox_model
+        self.batch_size = batch_size  # readers per batch and outbox transaction
+        self.remind_every = remind_every
+
+    def anything_due(self, now):
+        return self.db.session.execute(select(exists().where(self.Loan.next_reminder_at <= now))).scalar()
+
+    def due_readers(self, now, after=None):
+        """The next ``batch_size`` reader ids past ``after`` with a reminder due."""
+        Loan = self.Loan
+        query = (
+            select(Loan.user_id).distinct()
+            .where(Loan.next_reminder_at <= now)
+            .order_by(Loan.user_id)
+            .limit(self.batch_size)
+        )
+        if after is not None:
+            query = query.where(Loan.user_id > after)
+        return self.db.session.execute(query).scalars().all()
+
+    def due_loans(self, readers, now):
+        """``{user_id: [(loan_id, book_id, due_at), ...]}`` for the loans due a reminder."""
+        Loan = self.Loan
+        per_reader = defaultdict(list)
+        for loan_id, user_id, book_id, due_at in self.db.session.execute(
+            select(Loan.id, Loan.user_id, Loan.book_id, Loan.due_at)
+            .where(Loan.user_id.in_(readers), Loan.next_reminder_at <= now)
+        ):
+            per_reader[user_id].append((loan_id, book_id, due_at))
+        return per_reader
+
+    def scan(self, now=None):
+        """Queue a digest for every reader with loans due a reminder."""
+        started = time.perf_counter()
+        now = now or datetime.utcnow()
+        loans = readers = 0
+        after = None
+        more = self.anything_due(now)
+        while more:
+            batch = self.due_readers(now, after)
+            if batch:
+                loans += self._send(self.due_loans(batch, now), now)
+                readers += len(batch)
+                after = batch[-1]
+            more = len(batch) == self.batch_size
+        self.db.session.rollback()  # end the last read transaction
+        return ScanResult(loans, readers, time.perf_counter() - started)
+
+    def _send(self, chunk, now):
+        session, User, Book, Loan = self.db.session, self.User, self.Book, self.Loan
+        users = {row.id: row for row in session.execute(
+            select(User.id, User.first_name, User.email).where(User.id.in_(chunk))
+        )}
+        book_ids = {book_id for loans in chunk.values() for _, book_id, _ in loans}
+        titles = dict(session.execute(select(Book.id, Book.title).where(Book.id.in_(book_ids))).all())
+
+        messages = []
+        for user_id, loans in chunk.items():
+            user = users.get(user_id)
+            if user is None:
+                continue
+            lines = [
+                f'- {titles.get(book_id, "Unknown book")}, due {due_at:%Y-%m-%d} '
+                f'({(now - due_at).days} days overdue)'
+                for _, book_id, due_at in sorted(loans, key=lambda loan: loan[2])
+            ]
+            messages.append({
+                'recipient': user.email,
+                'subject': f'{len(loans)} overdue book{"s" if len(loans) > 1 else ""}',
+                'body': f'Hello {user.first_name},\n\nPlease return these books:\n' + '\n'.join(lines),
+                'status': 'pending',
+                'attempts': 0,
+                'next_attempt_at': now,
+                'created_at': now,
+            })
+
+        loan_ids = [loan_id for loans in chunk.values() for loan_id, _, _ in loans]
+        if messages:
+            session.execute(insert(self.Outbox), messages)
+        session.execute(
+            update(Loan).where(Loan.id.in_(loan_ids)).values(next_reminder_at=now + self.remind_every)
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        return len(loan_ids)
@@ -0,0 +1,113 @@
+"""Versioned page cache with HTTP validators.
+
+Each cacheable page has a key (``book:12``, ``author:3``) whose version lives
+in the database and is bumped, in the same transaction, by every write that
+changes what the page shows. Serving a page then costs one primary-key lookup:
+the version becomes the ETag, a matching ``If-None-Match`` (or a fresh enough
+``If-Modified-Since``) gets a 304, and otherwise the rendered HTML is taken
+from a per-process cache keyed by that ETag, so stale entries are never hit.
+"""
+import zlib
+from datetime import datetime, timezone
+
+from flask import make_response, request
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from cache import TTLCache
+
+# Whole-catalog listings validate against the sum of a few stripe rows. Each
+# write bumps only the stripe its first key hashes to, so concurrent writers
+# rarely wait on the same row, and the sum still moves on every change.
+CATALOG_KEY = 'catalog'
+CATALOG_STRIPES = 16
+STRIPE_KEYS = [f'{CATALOG_KEY}:{stripe}' for stripe in range(CATALOG_STRIPES)]
+
+
+def catalog_stripe(key):
+    return STRIPE_KEYS[zlib.crc32(key.encode()) % CATALOG_STRIPES]
+
+
+class PageCache:
+    def __init__(self, db, model, maxsize=2048, ttl=600):
+        self.db = db
+        self.model = model
+        self.fragments = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def bump(self, *keys):
+        """Invalidate pages; call inside the transaction that changes them."""
+        if not keys:
+            return
+        keys = list(dict.fromkeys(keys + (catalog_stripe(keys[0]),)))
+        table, session = self.model.__table__, self.db.session
+        now = datetime.utcnow()
+        rows = [{'key': key, 'version': 1, 'updated_at': now} for key in keys]
+        if session.get_bind().dialect.name == 'sqlite':
+            upsert = sqlite_insert(table)
+            session.execute(
+                upsert.on_conflict_do_update(
+                    index_elements=['key'],
+                    set_={'version': table.c.version + 1, 'updated_at': upsert.excluded.updated_at},
+                ),
+                rows,
+            )
+            return
+        existing = set(session.execute(select(table.c.key).where(table.c.key.in_(keys))).scalars())
+        if existing:
+            session.execute(
+                update(table)
+                .where(table.c.key.in_(existing))
+                .values(version=table.c.version + 1, updated_at=now)
+            )
+        missing = [row for row in rows if row['key'] not in existing]
+        if missing:
+            session.execute(insert(table), missing)
+
+    def version(self, key):
+        """Return ``(version, updated_at)``; pages never written are version 0."""
+        model = self.model
+        row = self.db.session.execute(
+            select(model.version, model.updated_at).where(model.key == key)
+        ).first()
+        return (row.version, row.updated_at) if row else (0, None)
+
+    def catalog_version(self):
+        """Return ``(version, updated_at)`` for listings that span the whole catalog."""
+        model = self.model
+        row = self.db.session.execute(
+            select(func.coalesce(func.sum(model.version), 0), func.max(model.updated_at))
+            .where(model.key.in_(STRIPE_KEYS))
+        ).one()
+        return row[0], row[1]
+
+    def respond(self, key, variant, render):
+        """Serve the page ``key`` as seen by ``variant`` (e.g. anonymous/user/admin).
+
+        ``render`` is only called when neither the client nor this process
+        holds the current version.
+        """
+        version, updated_at = self.version(key)
+        etag = f'{key}:{version}:{variant}'
+        last_modified = updated_at.replace(tzinfo=timezone.utc, microsecond=0) if updated_at else None
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            since = request.if_modified_since
+            not_modified = bool(last_modified and since and since >= last_modified)
+
+        if not_modified:
+            response = make_response('', 304)
+        else:
+            html = self.fragments.get(etag)
+            if html is None:
+                html = render()
+                self.fragments.set(etag, html)
+            response = make_response(html)
+
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+        return response
@@ -0,0 +1,106 @@
+"""Keyset (cursor) pagination.
+
+``Query.paginate`` issues a ``COUNT(*)`` and an ``OFFSET`` on every page, so
+deep pages get slower the further in they are. ``KeysetPagination`` instead
+remembers the sort key of the first and last row and asks for the rows right
+after (or before) it, which costs the same on every page.
+"""
+import base64
+import binascii
+import json
+import time
+
+from sqlalchemy import tuple_
+
+# (query text, params) -> (expires_at, total)
+_count_cache = {}
+COUNT_TTL = 60
+
+
+def encode_cursor(key, direction):
+    payload = json.dumps({'k': list(key), 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(key, direction)`` or ``None`` for a malformed cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key, direction = tuple(payload['k']), payload['d']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
+    if direction not in ('next', 'prev'):
+        return None
+    # Only values a sort column can hold; anything else would reach the database driver
+    if not all(value is None or isinstance(value, (str, int, float)) for value in key):
+        return None
+    return key, direction
+
+
+class KeysetPagination:
+    """One page of ``query`` ordered by ``columns``, which must end in a unique column.
+
+    Exposes ``items``, ``has_next``, ``has_prev``, ``next_cursor`` and
+    ``prev_cursor`` like the Flask-SQLAlchemy pagination object the templates
+    were written against. ``total`` is only counted when read, and cached.
+    """
+
+    def __init__(self, query, columns, cursor=None, per_page=10):
+        self.query = query
+        self.columns = columns
+        self.per_page = per_page
+
+        decoded = decode_cursor(cursor) if cursor else None
+        if decoded is not None and len(decoded[0]) != len(columns):
+            decoded = None
+        key, direction = decoded if decoded else (None, 'next')
+
+        page_query = query
+        if direction == 'next':
+            if key is not None:
+                page_query = page_query.filter(tuple_(*columns) > tuple_(*key))
+            page_query = page_query.order_by(*columns)
+        else:
+            page_query = page_query.filter(tuple_(*columns) < tuple_(*key))
+            page_query = page_query.order_by(*(column.desc() for column in columns))
+
+        rows = page_query.limit(per_page + 1).all()
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+
+        if direction == 'next':
+            self.items = rows
+            self.has_next = more
+            self.has_prev = key is not None
+        else:
+            self.items = rows[::-1]
+            self.has_next = True
+            self.has_prev = more
+
+    def _key(self, item):
+        return tuple(getattr(item, column.key) for column in self.columns)
+
+    @property
+    def next_cursor(self):
+        if not self.has_next or not self.items:
+            return None
+        return encode_cursor(self._key(self.items[-1]), 'next')
+
+    @property
+    def prev_cursor(self):
+        if not self.has_prev or not self.items:
+            return None
+        return encode_cursor(self._key(self.items[0]), 'prev')
+
+    @property
+    def total(self):
+        statement = self.query.statement
+        cache_key = (str(statement), repr(sorted(statement.compile().params.items())))
+        cached = _count_cache.get(cache_key)
+        now = time.monotonic()
+        if cached and cached[0] > now:
+            return cached[1]
+        total = self.query.order_by(None).count()
+        _count_cache[cache_key] = (now + COUNT_TTL, total)
+        return total
@@ -0,0 +1,142 @@
+"""Full-text search over the book catalog.
+
+Books are indexed in an SQLite FTS5 table (``book_fts``) keyed by ``book.id``.
+Triggers on ``book`` and ``author`` keep the index in step with every write,
+so routes never have to maintain it by hand. On databases without FTS5 the
+search falls back to the old ``ILIKE`` scan.
+"""
+import re
+import weakref
+
+from sqlalchemy import column, false, func, literal_column, or_, table, text
+
+book_fts = table('book_fts', column('rowid'))
+
+# Column weights for bm25(): title, description, author name.
+RANK = func.bm25(literal_column('book_fts'), 10.0, 1.0, 5.0)
+
+SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE book_fts USING fts5(
+        title, description, author_name,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS book_fts_insert AFTER INSERT ON book BEGIN
+        INSERT INTO book_fts (rowid, title, description, author_name)
+        VALUES (new.id, new.title, coalesce(new.description, ''),
+                (SELECT name FROM author WHERE id = new.author_id));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS book_fts_delete AFTER DELETE ON book BEGIN
+        DELETE FROM book_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS book_fts_update
+    AFTER UPDATE OF title, description, author_id ON book BEGIN
+        DELETE FROM book_fts WHERE rowid = old.id;
+        INSERT INTO book_fts (rowid, title, description, author_name)
+        VALUES (new.id, new.title, coalesce(new.description, ''),
+                (SELECT name FROM author WHERE id = new.author_id));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS author_fts_update AFTER UPDATE OF name ON author BEGIN
+        UPDATE book_fts SET author_name = new.name
+        WHERE rowid IN (SELECT id FROM book WHERE author_id = new.id);
+    END
+    """,
+)
+
+REBUILD = """
+    INSERT INTO book_fts (rowid, title, description, author_name)
+    SELECT book.id, book.title, coalesce(book.description, ''), author.name
+    FROM book JOIN author ON author.id = book.author_id
+"""
+
+_TOKEN = re.compile(r'\w+')
+
+# engine -> whether book_fts exists, so the check runs once per process
+_available = weakref.WeakKeyDictionary()
+
+
+def install(engine):
+    """Create the FTS index and its triggers if missing. Returns availability."""
+    if engine.dialect.name != 'sqlite':
+        _available[engine] = False
+        return False
+    with engine.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'book_fts'")
+        ).first()
+        if not exists:
+            try:
+                connection.execute(text(SCHEMA[0]))
+            except Exception:
+                # SQLite built without FTS5
+                _available[engine] = False
+                return False
+        for statement in SCHEMA[1:]:
+            connection.execute(text(statement))
+        if not exists:
+            connection.execute(text(REBUILD))
+    _available[engine] = True
+    return True
+
+
+def rebuild(engine):
+    """Re-populate the index from the catalog tables."""
+    with engine.begin() as connection:
+        connection.execute(text('DELETE FROM book_fts'))
+        connection.execute(text(REBUILD))
+
+
+def drop(engine):
+    """Remove the index; the triggers go with the tables they are defined on."""
+    with engine.begin() as connection:
+        connection.execute(text('DROP TABLE IF EXISTS book_fts'))
+    _available.pop(engine, None)
+
+
+def is_available(engine):
+    if engine not in _available:
+        if engine.dialect.name != 'sqlite':
+            _available[engine] = False
+        else:
+            with engine.connect() as connection:
+                _available[engine] = connection.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'book_fts'")
+                ).first() is not None
+    return _available[engine]
+
+
+def match_expression(search_query):
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    tokens = _TOKEN.findall(search_query.lower())
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def apply(query, book_id, search_query, engine, fallback=()):
+    """Restrict ``query`` to books matching ``search_query``, best match first.
+
+    ``book_id`` is the column joined against the index and ``fallback`` the
+    columns scanned with ``ILIKE`` when FTS5 is not available.
+    """
+    if not is_available(engine):
+        pattern = f'%{search_query}%'
+        return query.filter(or_(*(c.ilike(pattern) for c in fallback)))
+
+    expression = match_expression(search_query)
+    if expression is None:
+        return query.filter(false())
+    return (
+        query.join(book_fts, book_fts.c.rowid == book_id)
+        .filter(text('book_fts MATCH :fts_match').bindparams(fts_match=expression))
+        .order_by(RANK)
+    )
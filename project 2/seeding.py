@@ -0,0 +1,178 @@
+"""Synthetic data for load tests.
+
+Generates users, authors, books and open loans with skewed, library-like
+distributions: a few prolific authors and many with one or two books, mostly
+single copies, a long tail of rarely borrowed titles under a small set of
+popular ones, and a minority of heavy readers holding most loans. Rows go in
+with executemany, one transaction per batch, so a million books take
+seconds of Python rather than a million round trips. Output is reproducible
+for a given ``seed``.
+
+Every seeded user shares one password (hashed once, since hashing 100k
+passwords would dominate the run); usernames are ``reader<n>`` and
+``admin<n>``.
+"""
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select, update
+
+from pagecache import CATALOG_KEY
+
+ADJECTIVES = ('Silent', 'Hidden', 'Last', 'Broken', 'Golden', 'Distant', 'Forgotten', 'Burning',
+              'Quiet', 'Endless', 'Crimson', 'Northern', 'Paper', 'Glass', 'Winter', 'Little')
+NOUNS = ('River', 'Garden', 'Kingdom', 'Letter', 'Harbor', 'Forest', 'Machine', 'Mountain',
+         'Daughter', 'Empire', 'Station', 'Library', 'Orchard', 'Voyage', 'Island', 'Clock')
+FIRST_NAMES = ('Amina', 'Omar', 'Lena', 'Youssef', 'Sara', 'Karim', 'Nour', 'Hassan', 'Mona',
+               'Ali', 'Laila', 'Tarek', 'Hana', 'Ziad', 'Rana', 'Samir', 'Dina', 'Adam')
+LAST_NAMES = ('Haddad', 'Mansour', 'Farouk', 'Nasser', 'Saleh', 'Khalil', 'Rahman', 'Aziz',
+              'Hamdy', 'Fouad', 'Zaki', 'Samy', 'Kamal', 'Shawky', 'Ibrahim', 'Lotfy')
+COPIES = (1, 2, 3, 5, 10)
+COPY_WEIGHTS = (60, 20, 10, 7, 3)
+
+
+def skewed(rng, n, exponent):
+    """An index in ``range(n)`` where low indexes are much more likely."""
+    return min(n - 1, int(n * rng.random() ** exponent))
+
+
+class SeedResult:
+    def __init__(self, counts, elapsed):
+        self.counts = counts
+        self.elapsed = elapsed
+
+    def to_dict(self):
+        return dict(self.counts, seconds=round(self.elapsed, 3))
+
+
+class SeedGenerator:
+    def __init__(self, db, user_model, author_model, book_model, loan_model, password_hash,
+                 page_cache=None, stats=None, batch_size=10000, seed=0, progress=None, loan_days=14):
+        self.db = db
+        self.User = user_model
+        self.Author = author_model
+        self.Book = book_model
+        self.Loan = loan_model
+        self.password_hash = password_hash
+        self.page_cache = page_cache
+        self.stats = stats
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.progress = progress  # called as progress(table, rows_done) after each batch
+        self.loan_period = timedelta(days=loan_days)
+
+    def run(self, users=0, authors=0, books=0, loans=0, admins=1):
+        started = time.perf_counter()
+        user_ids = self.users(users, admins)
+        author_ids = self.authors(authors)
+        books = self.books(books, author_ids)
+        opened = self.loans(loans, user_ids, books)
+        if self.page_cache is not None:
+            self.page_cache.bump(CATALOG_KEY)
+            self.db.session.commit()
+        counts = {'users': len(user_ids), 'authors': len(author_ids), 'books': len(books[0]), 'loans': opened}
+        return SeedResult(counts, time.perf_counter() - started)
+
+    def _insert(self, model, rows, table):
+        """Insert ``rows`` in batches and return their new ids, in order."""
+        ids = []
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            ids.extend(self.db.session.execute(
+                insert(model).returning(model.id, sort_by_parameter_order=True), batch
+            ).scalars())
+            self.db.session.commit()
+            if self.progress is not None:
+                self.progress(table, len(ids))
+        return ids
+
+    def _next_number(self):
+        return (self.db.session.execute(select(func.max(self.User.id))).scalar() or 0) + 1
+
+    def users(self, count, admins):
+        rng, first = self.rng, self._next_number()
+        rows = []
+        for n in range(first, first + count + admins):
+            kind = 'admin' if n - first < admins else 'reader'
+            rows.append({
+                'first_name': rng.choice(FIRST_NAMES),
+                'last_name': rng.choice(LAST_NAMES),
+                'username': f'{kind}{n}',
+                'password': self.password_hash,
+                'phone_number': f'555-{n:07d}',
+                'email': f'{kind}{n}@example.com',
+                'is_admin': kind == 'admin',
+            })
+        return self._insert(self.User, rows, 'users')[admins:]
+
+    def authors(self, count):
+        rng = self.rng
+        rows = [
+            {'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {n}', 'bio': None}
+            for n in range(count)
+        ]
+        return self._insert(self.Author, rows, 'authors')
+
+    def books(self, count, author_ids):
+        """Returns ``(ids, quantities)``; ids are ordered from most to least popular."""
+        rng = self.rng
+        if count and not author_ids:
+            author_ids = self.db.session.execute(select(self.Author.id)).scalars().all()
+            if not author_ids:
+                raise ValueError('Books need at least one author')
+        quantities = rng.choices(COPIES, COPY_WEIGHTS, k=count)
+        rows = [
+            {
+                'title': f'The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {n}',
+                'description': None,
+                'quantity': quantities[n],
+                'borrowed': 0,
+                'author_id': author_ids[skewed(rng, len(author_ids), 2)],
+            }
+            for n in range(count)
+        ]
+        ids = self._insert(self.Book, rows, 'books')
+        if self.stats is not None:
+            # After the last batch: a run that dies part way needs 'reconcile-stats'
+            per_author = Counter(row['author_id'] for row in rows)
+            self.stats.adjust(('titles', 0, count), ('copies', 0, sum(quantities)),
+                              *(('author_books', author_id, n) for author_id, n in per_author.items()))
+            self.db.session.commit()
+        return ids, quantities
+
+    def loans(self, count, user_ids, books):
+        """Open up to ``count`` loans, never more than a book's copies."""
+        book_ids, quantities = books
+        if not count or not book_ids or not user_ids:
+            return 0
+        rng = self.rng
+        borrowed = {}
+        now = datetime.utcnow()
+        rows = []
+        # Bounded so a catalog with fewer free copies than requested loans still finishes
+        for _ in range(count * 3):
+            if len(rows) == count:
+                break
+            index = skewed(rng, len(book_ids), 3)
+            if borrowed.get(index, 0) >= quantities[index]:
+                continue
+            borrowed[index] = borrowed.get(index, 0) + 1
+            borrowed_at = now - timedelta(minutes=rng.randrange(60 * 24 * 90))
+            rows.append({
+                'user_id': user_ids[skewed(rng, len(user_ids), 2)],
+                'book_id': book_ids[index],
+                'borrowed_at': borrowed_at,
+                'due_at': borrowed_at + self.loan_period,
+            })
+        self._insert(self.Loan, rows, 'loans')
+        counters = [{'id': book_ids[index], 'borrowed': taken} for index, taken in borrowed.items()]
+        for start in range(0, len(counters), self.batch_size):
+            self.db.session.execute(update(self.Book), counters[start:start + self.batch_size])
+            self.db.session.commit()
+        if self.stats is not None:
+            self.stats.adjust(('on_loan', 0, len(rows)),
+                              *(('book_borrows', book_ids[index], taken) for index, taken in borrowed.items()))
+            self.db.session.commit()
+        return len(rows)
@@ -0,0 +1,224 @@
+"""Read-through cache for catalog rows, shared by every worker process.
+
+Entries live in a small SQLite file next to the app (``SQLiteStore``), so a
+book loaded by one gunicorn worker is a hit in all the others. Where that
+file can't be used, ``MemoryStore`` keeps the same interface per process.
+
+Invalidation is version-stamped. Every key has a version in the store, and
+write routes bump it after their transaction commits. A reader notes the
+version before it loads from the database and stores its copy under that
+version, so a copy loaded while a write was in flight is never served once
+the write's bump lands. A TTL bounds the staleness if a process dies
+between its commit and its bump.
+
+Store errors (a locked or unreadable file) count as misses and fall back to
+the database; the cache never fails a request.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class StoreError(Exception):
+    pass
+
+
+class MemoryStore:
+    """Per-process store, for tests, single-process runs and as a fallback."""
+
+    name = 'memory'
+
+    def __init__(self, maxsize=10000, ttl=300):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.versions = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        """Return ``(value or None, current version)``."""
+        version = self.versions.get(key, 0)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1], version
+        return None, version
+
+    def store(self, key, version, value, ttl=None):
+        self.entries.set(key, (version, value), ttl)
+
+    def bump(self, keys):
+        with self._lock:
+            for key in keys:
+                self.versions[key] = self.versions.get(key, 0) + 1
+                self.entries.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self.versions.clear()
+            self.entries.clear()
+
+
+class SQLiteStore:
+    """Store in a SQLite file that every process on the host opens."""
+
+    name = 'sqlite'
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS cache_version (key TEXT PRIMARY KEY, version INTEGER NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS cache_entry ('
+        'key TEXT PRIMARY KEY, version INTEGER NOT NULL, value TEXT NOT NULL, expires REAL NOT NULL)',
+    )
+    PURGE_EVERY = 1000  # stores between sweeps of expired entries
+
+    def __init__(self, path, ttl=300, timeout=2.0):
+        self.path = path
+        self.ttl = ttl
+        self.timeout = timeout
+        self._local = threading.local()
+        self._inherited = []  # connections opened before a fork, kept open but never used
+        self._stores = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # On a connection of its own: this runs at import, before a preloading server forks,
+        # and a SQLite connection must not be carried into a child process
+        try:
+            connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+            try:
+                for statement in self.SCHEMA:
+                    connection.execute(statement)
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            raise StoreError(str(e)) from e
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid != os.getpid():
+            # Opened by the parent of this forked process; closing it here could
+            # disturb the parent's locks, so it is only set aside
+            self._inherited.append(connection)
+            connection = None
+        if connection is None:
+            # In WAL mode reads never wait; only bumps queue behind another bump
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')  # losing the cache in a crash is harmless
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _run(self):
+        try:
+            yield self._connection()
+        except sqlite3.Error as e:
+            raise StoreError(str(e)) from e
+
+    def lookup(self, key):
+        with self._run() as connection:
+            row = connection.execute(
+                'SELECT coalesce((SELECT version FROM cache_version WHERE key = ?1), 0), '
+                '(SELECT value FROM cache_entry WHERE key = ?1 AND expires > ?2 AND version = '
+                'coalesce((SELECT version FROM cache_version WHERE key = ?1), 0))',
+                (key, time.time()),
+            ).fetchone()
+        version, value = row
+        return (json.loads(value) if value is not None else None), version
+
+    def store(self, key, version, value, ttl=None):
+        with self._run() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO cache_entry (key, version, value, expires) VALUES (?, ?, ?, ?)',
+                (key, version, json.dumps(value), time.time() + (self.ttl if ttl is None else ttl)),
+            )
+            self._stores += 1
+            if self._stores % self.PURGE_EVERY == 0:
+                connection.execute('DELETE FROM cache_entry WHERE expires <= ?', (time.time(),))
+
+    def bump(self, keys):
+        with self._run() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.executemany(
+                    'INSERT INTO cache_version (key, version) VALUES (?, 1) '
+                    'ON CONFLICT (key) DO UPDATE SET version = version + 1',
+                    [(key,) for key in keys],
+                )
+                connection.executemany('DELETE FROM cache_entry WHERE key = ?', [(key,) for key in keys])
+                connection.execute('COMMIT')
+            except sqlite3.Error:
+                connection.execute('ROLLBACK')
+                raise
+
+    def clear(self):
+        with self._run() as connection:
+            connection.execute('DELETE FROM cache_entry')
+            connection.execute('DELETE FROM cache_version')
+
+
+def make_store(backend, path=None, ttl=300):
+    """Build the store for ``backend`` ('sqlite' or 'memory'), falling back to memory."""
+    if backend == 'sqlite':
+        try:
+            return SQLiteStore(path, ttl=ttl)
+        except (OSError, StoreError) as e:
+            logger.warning('Catalog cache file %s unusable (%s); caching per process instead', path, e)
+    return MemoryStore(ttl=ttl)
+
+
+class CatalogCache:
+    def __init__(self, store, enabled=True, namespace='', ttl=None):
+        self.store = store
+        self.enabled = enabled
+        self.namespace = namespace  # keeps apps on different databases apart in one store
+        self.ttl = ttl  # overrides the store's TTL for the entries this cache stores
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, key, load):
+        """Return the cached value of ``key``, or ``load()`` it and cache the result.
+
+        ``load`` returns something JSON-serializable, or ``None`` for a row that
+        doesn't exist (which is not cached).
+        """
+        if not self.enabled:
+            return load()
+        key = self.namespace + key
+        try:
+            value, version = self.store.lookup(key)
+        except StoreError:
+            self.errors += 1
+            return load()
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = load()
+        if value is not None:
+            try:
+                self.store.store(key, version, value, self.ttl)
+            except StoreError:
+                self.errors += 1
+        return value
+
+    def invalidate(self, *keys):
+        """Bump ``keys``; call after the transaction that changed them has committed."""
+        if not keys:
+            return
+        keys = [self.namespace + key for key in keys]
+        try:
+            self.store.bump(keys)
+        except StoreError:
+            self.errors += 1
+            logger.warning('Could not invalidate %s in the catalog cache', ', '.join(keys))
+
+    def clear(self):
+        self.store.clear()
+        self.hits = self.misses = self.errors = 0
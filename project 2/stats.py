@@ -0,0 +1,150 @@
+"""Catalog statistics kept up to date by the writes that change them.
+
+Each statistic is a row ``(kind, subject_id, value)``: the totals ``titles``,
+``copies`` and ``on_loan`` (subject 0), ``author_books`` per author, and
+``book_borrows``, the number of times each book has been lent. Writes call
+``adjust`` with deltas inside their own transaction, so the numbers commit or
+roll back with the change itself. Reading the totals is a primary-key lookup
+and the top authors and books walk the ``(kind, value)`` index, so nothing
+scans ``book`` or ``borrowed_book``.
+
+``reconcile`` recomputes everything with aggregates and reports the drift.
+Lifetime borrow counts can't be rebuilt from open loans; reconciling only
+drops rows of deleted books and raises counts that are below the loans
+currently open.
+"""
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+TOTALS = ('titles', 'copies', 'on_loan')
+
+
+class CatalogStats:
+    def __init__(self, db, model, author_model, book_model, loan_model):
+        self.db = db
+        self.model = model
+        self.Author = author_model
+        self.Book = book_model
+        self.Loan = loan_model
+
+    def adjust(self, *changes):
+        """Apply ``(kind, subject_id, delta)`` changes; call inside the writing transaction."""
+        merged = {}
+        for kind, subject_id, delta in changes:
+            merged[kind, subject_id] = merged.get((kind, subject_id), 0) + delta
+        rows = [{'kind': kind, 'subject_id': subject_id, 'value': delta}
+                for (kind, subject_id), delta in merged.items() if delta]
+        if not rows:
+            return
+        table, session = self.model.__table__, self.db.session
+        if session.get_bind().dialect.name == 'sqlite':
+            upsert = sqlite_insert(table)
+            session.execute(
+                upsert.on_conflict_do_update(
+                    index_elements=['kind', 'subject_id'],
+                    set_={'value': table.c.value + upsert.excluded.value},
+                ),
+                rows,
+            )
+            return
+        for row in rows:
+            result = session.execute(
+                update(table)
+                .where(table.c.kind == row['kind'], table.c.subject_id == row['subject_id'])
+                .values(value=table.c.value + row['value'])
+            )
+            if result.rowcount == 0:
+                session.execute(insert(table), [row])
+
+    # What each write changes
+
+    def book_added(self, author_id, quantity):
+        self.adjust(('titles', 0, 1), ('copies', 0, quantity), ('author_books', author_id, 1))
+
+    def book_removed(self, book_id, author_id, quantity, open_loans):
+        self.adjust(('titles', 0, -1), ('copies', 0, -quantity), ('on_loan', 0, -open_loans),
+                    ('author_books', author_id, -1))
+        table = self.model.__table__
+        self.db.session.execute(
+            delete(table).where(table.c.kind == 'book_borrows', table.c.subject_id == book_id)
+        )
+
+    def borrowed(self, book_id, copies=1):
+        self.adjust(('on_loan', 0, copies), ('book_borrows', book_id, copies))
+
+    def returned(self, copies=1):
+        self.adjust(('on_loan', 0, -copies))
+
+    # Reading
+
+    def totals(self):
+        model = self.model
+        stored = dict(self.db.session.execute(
+            select(model.kind, model.value).where(model.kind.in_(TOTALS), model.subject_id == 0)
+        ).all())
+        return {kind: stored.get(kind, 0) for kind in TOTALS}
+
+    def top(self, kind, subject_model, label, limit=10):
+        model = self.model
+        rows = self.db.session.execute(
+            select(model.subject_id, label, model.value)
+            .join(subject_model, subject_model.id == model.subject_id)
+            .where(model.kind == kind, model.value > 0)
+            .order_by(model.value.desc(), model.subject_id)
+            .limit(limit)
+        )
+        return [{'id': subject_id, 'name': name, 'count': value} for subject_id, name, value in rows]
+
+    def snapshot(self, limit=10):
+        return {
+            'totals': self.totals(),
+            'top_authors': self.top('author_books', self.Author, self.Author.name, limit),
+            'most_borrowed': self.top('book_borrows', self.Book, self.Book.title, limit),
+        }
+
+    # Reconciliation
+
+    def _actual(self):
+        session, Book, Loan = self.db.session, self.Book, self.Loan
+        titles, copies = session.execute(select(func.count(Book.id), func.coalesce(func.sum(Book.quantity), 0))).one()
+        actual = {
+            ('titles', 0): titles,
+            ('copies', 0): copies,
+            ('on_loan', 0): session.execute(select(func.count(Loan.id))).scalar(),
+        }
+        for author_id, count in session.execute(select(Book.author_id, func.count()).group_by(Book.author_id)):
+            actual['author_books', author_id] = count
+        return actual
+
+    def reconcile(self, fix=True):
+        """Compare stored statistics with the tables. Returns ``[(kind, subject, stored, actual)]``.
+
+        With ``fix``, stored values are replaced by the actual ones and committed.
+        """
+        model, session = self.model, self.db.session
+        stored = {(kind, subject_id): value for kind, subject_id, value in session.execute(
+            select(model.kind, model.subject_id, model.value)
+        )}
+        actual = self._actual()
+
+        open_loans = dict(session.execute(select(self.Loan.book_id, func.count()).group_by(self.Loan.book_id)).all())
+        book_ids = set(session.execute(select(self.Book.id)).scalars())
+        for (kind, book_id), value in stored.items():
+            if kind == 'book_borrows':
+                actual[kind, book_id] = max(value, open_loans.get(book_id, 0)) if book_id in book_ids else 0
+        for book_id, count in open_loans.items():
+            actual.setdefault(('book_borrows', book_id), count)
+
+        drift = sorted(
+            (kind, subject_id, stored.get((kind, subject_id), 0), value)
+            for (kind, subject_id), value in {**{key: 0 for key in stored}, **actual}.items()
+            if stored.get((kind, subject_id), 0) != value
+        )
+        if fix:
+            session.execute(delete(model))
+            rows = [{'kind': kind, 'subject_id': subject_id, 'value': value}
+                    for (kind, subject_id), value in actual.items() if value or kind in TOTALS]
+            if rows:
+                session.execute(insert(model), rows)
+            session.commit()
+        return drift
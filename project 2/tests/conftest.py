@@ -0,0 +1,75 @@
+import os
+import sys
+import tempfile
+
+import pytest
+from flask import g, request_started
+
+# app.py builds its engine at import time, so point it at a scratch database first.
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_db_dir, 'test.db')
+os.environ['CATALOG_CACHE_PATH'] = os.path.join(_db_dir, 'catalog_cache.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app, db, init_db, drop_db, identity_cache, page_cache, password_hasher, User, Author, Book
+
+# The production default (scrypt) is deliberately slow; tests don't need that.
+password_hasher.method = 'pbkdf2:sha256:1000'
+
+
+# Tests keep an app context pushed, and Flask reuses it for test requests instead of
+# pushing a fresh one. Give each request a clean g and session, as in production.
+@request_started.connect_via(flask_app)
+def fresh_request_state(sender, **extra):
+    g.__dict__.clear()
+    db.session.remove()
+
+
+@pytest.fixture
+def app():
+    flask_app.config.update({"TESTING": True})
+    with flask_app.app_context():
+        init_db()
+        yield flask_app
+        db.session.remove()
+        drop_db()
+        identity_cache.clear()
+        page_cache.fragments.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def make_user(username='reader', is_admin=False, password='secret'):
+    user = User(
+        first_name='Test',
+        last_name='User',
+        username=username,
+        password=password_hasher.hash(password),
+        phone_number='555-0100',
+        email=f'{username}@example.com',
+        is_admin=is_admin,
+    )
+    db.session.add(user)
+    db.session.commit()
+    db.session.refresh(user)  # keep attributes readable once a request detaches it
+    return user
+
+
+def make_book(title, author_name='Author', description='', quantity=1):
+    author = Author.query.filter_by(name=author_name).first()
+    if not author:
+        author = Author(name=author_name)
+        db.session.add(author)
+        db.session.flush()
+    book = Book(title=title, description=description, quantity=quantity, author_id=author.id)
+    db.session.add(book)
+    db.session.commit()
+    db.session.refresh(book)
+    return book
+
+
+def login(client, username='reader', password='secret'):
+    return client.post('/login', data={'login_input': username, 'password': password})
@@ -0,0 +1,113 @@
+import json
+
+from flask import g
+
+from app import Author, catalog_changed, db
+
+from conftest import make_user, make_book, login
+
+
+def test_books_listing_pages_by_cursor(client):
+    for i in range(5):
+        make_book(f'Book {i}', quantity=2)
+    first = client.get('/api/v1/books?limit=3').get_json()
+    assert [book['title'] for book in first['books']] == ['Book 0', 'Book 1', 'Book 2']
+    assert first['books'][0]['available'] == 2
+    assert first['books'][0]['author'] == 'Author'
+
+    second = client.get(f"/api/v1/books?limit=3&cursor={first['next_cursor']}").get_json()
+    assert [book['title'] for book in second['books']] == ['Book 3', 'Book 4']
+    assert second['next_cursor'] is None
+
+
+def test_unchanged_catalog_answers_304_with_one_query(client):
+    make_book('Polled')
+    first = client.get('/api/v1/books')
+    assert first.headers['ETag']
+    with client:
+        again = client.get('/api/v1/books', headers={'If-None-Match': first.headers['ETag']})
+        assert again.status_code == 304
+        assert g.query_count == 1  # the catalog version lookup
+
+
+def test_borrow_changes_etag_and_availability(client):
+    make_user()
+    book = make_book('Popular', quantity=2)
+    login(client)
+    before = client.get(f'/api/v1/books/{book.id}')
+    assert before.get_json()['available'] == 2
+
+    client.post(f'/borrow_book/{book.id}')
+    after = client.get(f'/api/v1/books/{book.id}', headers={'If-None-Match': before.headers['ETag']})
+    assert after.status_code == 200
+    assert after.get_json()['available'] == 1
+
+
+def test_book_etag_ignores_changes_to_other_books(client):
+    make_user()
+    book_id = make_book('Quiet', quantity=2).id
+    other_id = make_book('Busy', quantity=2).id
+    login(client)
+    listing = client.get('/api/v1/books')
+    before = client.get(f'/api/v1/books/{book_id}')
+
+    client.post(f'/borrow_book/{other_id}')
+    again = client.get(f'/api/v1/books/{book_id}', headers={'If-None-Match': before.headers['ETag']})
+    assert again.status_code == 304
+    changed = client.get('/api/v1/books', headers={'If-None-Match': listing.headers['ETag']})
+    assert changed.status_code == 200
+
+
+def test_book_etag_follows_its_author(client):
+    book = make_book('Renamed', author_name='Before')
+    before = client.get(f'/api/v1/books/{book.id}')
+
+    db.session.get(Author, book.author_id).name = 'After'
+    catalog_changed(f'author:{book.author_id}')
+    db.session.commit()
+    after = client.get(f'/api/v1/books/{book.id}', headers={'If-None-Match': before.headers['ETag']})
+    assert after.status_code == 200
+    assert after.get_json()['author'] == 'After'
+
+
+def test_missing_book_is_404(client):
+    assert client.get('/api/v1/books/999').status_code == 404
+    assert client.get('/api/v1/books/99999999999999999999').status_code == 404
+
+
+def test_ndjson_streams_every_book(client):
+    for i in range(4):
+        make_book(f'Streamed {i}')
+    response = client.get('/api/v1/books?format=ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['title'] for row in rows] == [f'Streamed {i}' for i in range(4)]
+
+
+def test_availability_for_several_books(client):
+    one = make_book('One', quantity=3)
+    two = make_book('Two', quantity=1)
+    data = client.get(f'/api/v1/availability?ids={one.id},{two.id},999').get_json()
+    assert data['availability'] == {str(one.id): 3, str(two.id): 1}
+    assert client.get('/api/v1/availability?ids=a,b').status_code == 400
+    assert client.get('/api/v1/availability?ids=1,99999999999999999999999').status_code == 400
+
+
+def test_loans_are_scoped_to_the_reader(client):
+    make_user('reader')
+    make_user('other')
+    make_user('admin', is_admin=True)
+    book = make_book('Shared', quantity=5)
+    assert client.get('/api/v1/loans').status_code == 401
+
+    login(client, 'reader')
+    client.post(f'/borrow_book/{book.id}')
+    client.get('/logout')
+    login(client, 'other')
+    client.post(f'/borrow_book/{book.id}')
+    mine = client.get('/api/v1/loans').get_json()['loans']
+    assert len(mine) == 1 and mine[0]['title'] == 'Shared'
+
+    client.get('/logout')
+    login(client, 'admin')
+    assert len(client.get('/api/v1/loans').get_json()['loans']) == 2
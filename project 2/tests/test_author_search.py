@@ -0,0 +1,41 @@
+from flask import g
+
+from conftest import make_user, make_book, login
+
+
+def search(client, q, **params):
+    return client.get('/api/v1/authors/search', query_string=dict(q=q, **params)).get_json()['authors']
+
+
+def test_prefix_matches_ignore_case_and_are_ordered(client):
+    for name in ('Bronte', 'brown', 'Brooks', 'Austen', 'Br'):
+        make_book(f'By {name}', author_name=name)
+    assert [a['name'] for a in search(client, 'BRO')] == ['Bronte', 'Brooks', 'brown']
+    assert [a['name'] for a in search(client, 'br', limit=2)] == ['Br', 'Bronte']
+    assert search(client, 'zz') == []
+    assert search(client, '') == []
+
+
+def test_hot_prefix_is_served_from_cache(client):
+    make_book('Cached', author_name='Tolkien')
+    search(client, 'tol')
+    with client:
+        assert [a['name'] for a in search(client, 'Tol')] == ['Tolkien']
+        assert g.get('query_count', 0) == 0
+
+
+def test_adding_an_author_refreshes_suggestions(client):
+    make_user('admin', is_admin=True)
+    login(client, 'admin')
+    assert search(client, 'Orw') == []
+    client.post('/add_author', data={'name': 'Orwell', 'bio': ''})
+    assert [a['name'] for a in search(client, 'Orw')] == ['Orwell']
+
+
+def test_add_book_form_no_longer_lists_authors(client):
+    make_user('admin', is_admin=True)
+    make_book('Existing', author_name='Listed Author')
+    login(client, 'admin')
+    page = client.get('/add_book').get_data(as_text=True)
+    assert 'Listed Author' not in page
+    assert 'author_search' in page
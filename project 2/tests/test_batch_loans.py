@@ -0,0 +1,75 @@
+from app import catalog_stats, db, Book, BorrowedBook
+from conftest import make_user, make_book, login
+
+
+def borrowed(book_id):
+    return db.session.get(Book, book_id, populate_existing=True).borrowed
+
+
+def test_batch_checkout_lends_every_book_in_one_commit(client):
+    user_id = make_user().id
+    ids = [make_book(f'Cart {i}', quantity=2).id for i in range(3)]
+    login(client)
+    response = client.post('/borrow_books', json={'book_ids': ids + [ids[0]]})
+    assert response.status_code == 200
+    assert response.get_json() == {'borrowed': ids + [ids[0]]}
+    assert [borrowed(book_id) for book_id in ids] == [2, 1, 1]
+    assert BorrowedBook.query.filter_by(user_id=user_id).count() == 4
+    assert catalog_stats.totals()['on_loan'] == 4
+
+
+def test_one_unavailable_book_fails_the_whole_batch(client):
+    make_user()
+    free = make_book('Free', quantity=1).id
+    taken = make_book('Taken', quantity=1).id
+    login(client)
+    client.post(f'/borrow_book/{taken}')
+
+    response = client.post('/borrow_books', json={'book_ids': [free, taken, 999]})
+    assert response.status_code == 409
+    assert response.get_json()['problems'] == [
+        {'book_id': taken, 'error': 'not available'},
+        {'book_id': 999, 'error': 'not found'},
+    ]
+    assert borrowed(free) == 0
+    assert BorrowedBook.query.count() == 1
+
+
+def test_batch_return(client):
+    make_user()
+    make_user('other')
+    ids = [make_book(f'Back {i}', quantity=3).id for i in range(2)]
+    login(client, 'other')
+    client.post('/borrow_books', json={'book_ids': [ids[1]]})
+    client.get('/logout')
+    login(client)
+    client.post('/borrow_books', json={'book_ids': ids})
+
+    # Only this reader's own loans count: one copy of each, so two of ids[1] fails
+    assert client.post('/return_books', json={'book_ids': [ids[1], ids[1]]}).status_code == 409
+    response = client.post('/return_books', json={'book_ids': ids})
+    assert response.get_json() == {'returned': ids}
+    assert [borrowed(book_id) for book_id in ids] == [0, 1]
+    assert catalog_stats.totals()['on_loan'] == 1
+
+
+def test_dashboard_form_and_limits(app, client):
+    make_user()
+    ids = [make_book(f'Form {i}', quantity=1).id for i in range(2)]
+    login(client)
+    page = client.get('/dashboard').get_data(as_text=True)
+    assert 'form="cart"' in page
+
+    response = client.post('/borrow_books', data={'book_ids': [str(book_id) for book_id in ids]})
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        assert session['_flashes'][-1][1] == '2 books borrowed successfully'
+
+    too_many = [ids[0]] * (app.config['BATCH_LOAN_LIMIT'] + 1)
+    assert client.post('/borrow_books', json={'book_ids': too_many}).status_code == 409
+    assert client.post('/borrow_books', json={'book_ids': ['x']}).status_code == 409
+    for body in ([1, 2], {'book_ids': '12'}, {'book_ids': {'1': 1}}, 'text',
+                 {'book_ids': [1.5]}, {'book_ids': [True]}, {'book_ids': ['1']}):
+        response = client.post('/borrow_books', json=body)
+        assert response.status_code == 409
+        assert 'send between 1 and' in response.get_json()['problems'][0]['error']
@@ -0,0 +1,67 @@
+import pytest
+
+from app import db, BorrowedBook
+from conftest import make_user, make_book, login
+
+
+@pytest.fixture
+def loans(app):
+    admin = make_user('admin', is_admin=True)
+    alice, bob = make_user('alice'), make_user('bob')
+    dune = make_book('Dune', quantity=5)
+    emma = make_book('Emma', quantity=5)
+    make_book('Unborrowed')
+    for user, book in [(alice, dune), (bob, dune), (admin, dune), (bob, emma)]:
+        db.session.add(BorrowedBook(user_id=user.id, book_id=book.id))
+    db.session.commit()
+    return dune.id, emma.id
+
+
+def test_groups_are_counted_in_sql(client, loans):
+    login(client, 'admin')
+    html = client.get('/borrowed_books').get_data(as_text=True)
+    assert '3 borrowed' in html and '1 borrowed' in html
+    assert 'Unborrowed' not in html
+    assert 'alice' not in html  # borrower details load on demand
+
+
+def test_filters(client, loans):
+    login(client, 'admin')
+    html = client.get('/borrowed_books', query_string={'book': 'emm'}).get_data(as_text=True)
+    assert 'Emma' in html and 'Dune' not in html
+
+    html = client.get('/borrowed_books', query_string={'user': 'ali'}).get_data(as_text=True)
+    assert 'Dune' in html and 'Emma' not in html
+    assert '1 borrowed' in html
+
+
+def test_pagination(client, app):
+    make_user('admin', is_admin=True)
+    reader = make_user()
+    for i in range(25):
+        book = make_book(f'Book {i:02d}')
+        db.session.add(BorrowedBook(user_id=reader.id, book_id=book.id))
+    db.session.commit()
+    login(client, 'admin')
+
+    first = client.get('/borrowed_books').get_data(as_text=True)
+    assert 'Book 19' in first and 'Book 20' not in first
+    second = client.get('/borrowed_books', query_string={'page': 2}).get_data(as_text=True)
+    assert 'Book 20' in second and 'Book 19' not in second
+
+
+def test_loans_endpoint(client, loans):
+    dune_id, _ = loans
+    login(client, 'admin')
+    data = client.get(f'/borrowed_books/{dune_id}/loans').json
+    assert sorted(loan['username'] for loan in data['loans']) == ['admin', 'alice', 'bob']
+    assert data['loans'][0]['email'].endswith('@example.com')
+
+    data = client.get(f'/borrowed_books/{dune_id}/loans', query_string={'user': 'bo'}).json
+    assert [loan['username'] for loan in data['loans']] == ['bob']
+
+
+def test_loans_endpoint_is_admin_only(client, loans):
+    dune_id, _ = loans
+    login(client, 'alice')
+    assert client.get(f'/borrowed_books/{dune_id}/loans').status_code == 403
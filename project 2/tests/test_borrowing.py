@@ -0,0 +1,90 @@
+import random
+import threading
+
+from app import app as flask_app, db, Book, BorrowedBook, checkout_copy, checkin_copy
+from conftest import make_user, make_book, login
+
+
+def run_workers(target, workers=8):
+    errors = []
+
+    def guarded(n):
+        try:
+            with flask_app.app_context():
+                target(n)
+                db.session.remove()
+        except Exception as e:  # surfaced by the assertion below
+            errors.append(e)
+
+    threads = [threading.Thread(target=guarded, args=(n,)) for n in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_concurrent_borrows_never_oversubscribe(app):
+    user = make_user()
+    book = make_book('Scarce', quantity=5)
+    book_id, user_id = book.id, user.id
+
+    wins = []
+    run_workers(lambda n: wins.extend(
+        ok for ok in (checkout_copy(book_id, user_id) for _ in range(10)) if ok
+    ))
+
+    db.session.expire_all()
+    assert len(wins) == 5
+    assert db.session.get(Book, book_id).borrowed == 5
+    assert BorrowedBook.query.filter_by(book_id=book_id).count() == 5
+
+
+def test_mixed_borrow_and_return_keeps_counters_consistent(app):
+    user = make_user()
+    book = make_book('Popular', quantity=3)
+    book_id, user_id = book.id, user.id
+
+    def churn(n):
+        rng = random.Random(n)
+        for _ in range(20):
+            if rng.random() < 0.5:
+                checkout_copy(book_id, user_id)
+            else:
+                loan_id = db.session.execute(
+                    db.select(BorrowedBook.id).filter_by(book_id=book_id).limit(1)
+                ).scalar()
+                if loan_id:
+                    checkin_copy(loan_id, book_id)
+            borrowed = db.session.execute(db.select(Book.borrowed).filter_by(id=book_id)).scalar()
+            assert 0 <= borrowed <= 3
+
+    run_workers(churn)
+
+    db.session.expire_all()
+    book = db.session.get(Book, book_id)
+    assert book.borrowed == BorrowedBook.query.filter_by(book_id=book_id).count()
+    assert 0 <= book.borrowed <= book.quantity
+
+
+def flashes(client):
+    with client.session_transaction() as session:
+        return [message for _, message in session.pop('_flashes', [])]
+
+
+def test_borrow_route_reports_unavailable(client):
+    make_user()
+    book = make_book('Single')
+    login(client)
+
+    client.post(f'/borrow_book/{book.id}')
+    assert flashes(client) == ['Book borrowed successfully']
+    client.post(f'/borrow_book/{book.id}')
+    assert flashes(client) == ['Book is not available']
+    db.session.expire_all()
+    assert db.session.get(Book, book.id).borrowed == 1
+
+    client.post(f'/return_book/{book.id}')
+    assert flashes(client) == ['Book returned successfully']
+    db.session.expire_all()
+    assert db.session.get(Book, book.id).borrowed == 0
@@ -0,0 +1,86 @@
+from app import catalog_cache, catalog_changed, db
+from conftest import make_user, make_book, login
+from sharedcache import CatalogCache, MemoryStore, SQLiteStore, make_store
+
+
+def loader(value, calls):
+    def load():
+        calls.append(1)
+        return value
+    return load
+
+
+def test_workers_share_entries_through_the_file(tmp_path):
+    path = str(tmp_path / 'shared.db')
+    first, second = CatalogCache(SQLiteStore(path)), CatalogCache(SQLiteStore(path))
+    calls = []
+    assert first.get('book:1', loader({'title': 'Shared'}, calls)) == {'title': 'Shared'}
+    assert second.get('book:1', loader({'title': 'Other'}, calls)) == {'title': 'Shared'}
+    assert calls == [1]
+    assert (first.misses, second.hits) == (1, 1)
+
+    second.invalidate('book:1')
+    assert first.get('book:1', loader({'title': 'Renamed'}, calls)) == {'title': 'Renamed'}
+
+
+def test_forked_worker_opens_its_own_connection(tmp_path, monkeypatch):
+    store = SQLiteStore(str(tmp_path / 'shared.db'))
+    assert getattr(store._local, 'connection', None) is None  # nothing opened at construction
+    store.store('book:1', 0, {'title': 'Before fork'})
+    parent = store._local.connection
+
+    monkeypatch.setattr('os.getpid', lambda: -1)
+    assert store.lookup('book:1') == ({'title': 'Before fork'}, 0)
+    assert store._local.connection is not parent
+    assert store._inherited == [parent]
+
+
+def test_copy_loaded_during_a_write_is_never_served():
+    store = MemoryStore()
+    cache = CatalogCache(store)
+    # A reader notes the version and loads the old row while a writer commits and bumps
+    _, version = store.lookup('book:1')
+    cache.invalidate('book:1')
+    store.store('book:1', version, {'title': 'Old'})
+    calls = []
+    assert cache.get('book:1', loader({'title': 'New'}, calls)) == {'title': 'New'}
+    assert calls == [1]
+
+
+def test_disabled_cache_always_loads():
+    cache = CatalogCache(MemoryStore(), enabled=False)
+    calls = []
+    cache.get('author:1', loader({'name': 'A'}, calls))
+    cache.get('author:1', loader({'name': 'A'}, calls))
+    assert len(calls) == 2
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_unusable_file_falls_back_to_memory(tmp_path):
+    blocker = tmp_path / 'not-a-directory'
+    blocker.write_text('')
+    assert isinstance(make_store('sqlite', str(blocker / 'cache.db')), MemoryStore)
+
+
+def test_borrow_invalidates_after_commit(client):
+    make_user()
+    book_id = make_book('Popular', quantity=2).id
+    assert client.get(f'/api/v1/books/{book_id}').get_json()['available'] == 2
+    hits = catalog_cache.hits
+    client.get(f'/api/v1/books/{book_id}', headers={'If-None-Match': 'stale'})
+    assert catalog_cache.hits == hits + 2  # book and author rows
+
+    login(client)
+    client.post(f'/borrow_book/{book_id}')
+    assert client.get(f'/api/v1/books/{book_id}').get_json()['available'] == 1
+    assert 'library_cache_hits_total{cache="catalog"}' in client.get('/metrics').get_data(as_text=True)
+
+
+def test_rolled_back_changes_do_not_invalidate(app):
+    book_id = make_book('Kept').id
+    calls = []
+    catalog_cache.get(f'book:{book_id}', loader({'title': 'Kept'}, calls))
+    catalog_changed(f'book:{book_id}')
+    db.session.rollback()
+    catalog_cache.get(f'book:{book_id}', loader({'title': 'Reloaded'}, calls))
+    assert calls == [1]
@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import create_engine, event, text
+
+from app import db
+from dbconfig import EngineSettings, apply_pragmas
+
+
+def connect(settings):
+    engine = create_engine(settings.uri, **settings.engine_options)
+    event.listen(engine, 'connect', lambda dbapi_connection, record: apply_pragmas(dbapi_connection, settings.pragmas))
+    return engine
+
+
+def pragma(connection, name):
+    return connection.execute(text(f'PRAGMA {name}')).scalar()
+
+
+def test_profile_pragmas_apply_to_file_database(tmp_path):
+    settings = EngineSettings.from_env({
+        'DATABASE_URL': f"sqlite:///{tmp_path / 'tuned.db'}",
+        'DB_PROFILE': 'throughput',
+    })
+    assert settings.engine_options['pool_size'] == 10
+    engine = connect(settings)
+    with engine.connect() as connection:
+        assert pragma(connection, 'journal_mode') == 'wal'
+        assert pragma(connection, 'synchronous') == 1  # NORMAL
+        assert pragma(connection, 'cache_size') == -65536
+        assert pragma(connection, 'busy_timeout') == 5000
+    assert engine.pool.size() == 10
+    engine.dispose()
+
+
+def test_environment_overrides_profile(tmp_path):
+    settings = EngineSettings.from_env({
+        'DATABASE_URL': f"sqlite:///{tmp_path / 'tuned.db'}",
+        'DB_PROFILE': 'throughput',
+        'DB_POOL_SIZE': '3',
+        'DB_POOL_PRE_PING': 'true',
+        'SQLITE_SYNCHRONOUS': 'full',
+        'SQLITE_MMAP_SIZE': '0',
+    })
+    assert settings.engine_options == {'pool_size': 3, 'max_overflow': 20, 'pool_pre_ping': True}
+    engine = connect(settings)
+    with engine.connect() as connection:
+        assert pragma(connection, 'synchronous') == 2  # FULL
+        assert pragma(connection, 'mmap_size') == 0
+    engine.dispose()
+
+
+def test_memory_database_drops_pool_sizing():
+    settings = EngineSettings.from_env({'DATABASE_URL': 'sqlite://', 'DB_PROFILE': 'throughput'})
+    assert 'pool_size' not in settings.engine_options
+    assert 'max_overflow' not in settings.engine_options
+    engine = connect(settings)
+    with engine.connect() as connection:
+        assert pragma(connection, 'cache_size') == -65536
+    engine.dispose()
+
+
+def test_server_databases_get_no_pragmas():
+    settings = EngineSettings('postgresql://library@db/library', profile='server')
+    assert settings.pragmas == {}
+    assert settings.engine_options['pool_pre_ping'] is True
+
+
+def test_bad_settings_are_rejected():
+    with pytest.raises(ValueError, match='Unknown database profile'):
+        EngineSettings('sqlite://', profile='turbo')
+    with pytest.raises(ValueError, match='synchronous'):
+        EngineSettings.from_env({'DATABASE_URL': 'sqlite://', 'SQLITE_SYNCHRONOUS': 'NORMAL; DROP TABLE book'})
+
+
+def test_app_engine_uses_configured_pragmas(app):
+    with db.engine.connect() as connection:
+        assert pragma(connection, 'journal_mode') == 'wal'
+        assert pragma(connection, 'busy_timeout') == 5000
@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+
+from app import db, password_hasher, User
+from conftest import make_user, login
+from hashing import HashingBusy, PasswordHasher
+
+
+def test_login_upgrades_hash_made_under_old_policy(client):
+    make_user()
+    old_hash = User.query.one().password
+    password_hasher.method = 'pbkdf2:sha256:2000'
+    try:
+        response = login(client)
+        assert response.status_code == 302
+        db.session.expire_all()
+        new_hash = User.query.one().password
+        assert new_hash != old_hash
+        assert new_hash.startswith('pbkdf2:sha256:2000$')
+        assert password_hasher.verify(new_hash, 'secret')
+    finally:
+        password_hasher.method = 'pbkdf2:sha256:1000'
+
+
+def test_wrong_password_does_not_rehash(client):
+    make_user()
+    old_hash = User.query.one().password
+    password_hasher.method = 'pbkdf2:sha256:2000'
+    try:
+        login(client, password='wrong')
+        db.session.expire_all()
+        assert User.query.one().password == old_hash
+    finally:
+        password_hasher.method = 'pbkdf2:sha256:1000'
+
+
+def test_process_pool_hashes_and_verifies():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=2)
+    try:
+        stored = hasher.hash('secret')
+        assert hasher.verify(stored, 'secret')
+        assert not hasher.verify(stored, 'nope')
+        assert not hasher.needs_rehash(stored)
+    finally:
+        hasher.shutdown()
+
+
+def test_concurrency_cap_rejects_when_queue_times_out():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', concurrency=1, queue_timeout=0.05)
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow(*args):
+        started.set()
+        release.wait()
+
+    holder = threading.Thread(target=hasher._run, args=(slow,))
+    holder.start()
+    started.wait()
+    with pytest.raises(HashingBusy):
+        hasher.hash('secret')
+    release.set()
+    holder.join()
+    assert hasher.verify(hasher.hash('secret'), 'secret')
@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+
+from flask import g
+from itsdangerous import URLSafeTimedSerializer
+
+from app import app as flask_app, db, identity_cache, shared_namespace, User
+from sharedcache import CatalogCache, SQLiteStore
+from conftest import make_user, login
+
+
+def queries_for(client, url):
+    with client:
+        client.get(url)
+        return g.query_count
+
+
+def test_authenticated_requests_skip_the_user_query(client):
+    make_user()
+    login(client)
+    identity_cache.clear()
+
+    cold = queries_for(client, '/dashboard')
+    warm = queries_for(client, '/dashboard')
+    assert warm == cold - 1
+
+
+def cached_identity(user_id):
+    return identity_cache.get(f'user:{user_id}', lambda: None)
+
+
+def test_admin_flag_change_takes_effect_immediately(client):
+    user = make_user()
+    login(client)
+    client.get('/dashboard')
+    assert cached_identity(user.id)['is_admin'] is False
+
+    db.session.get(User, user.id).is_admin = True
+    db.session.commit()
+    assert cached_identity(user.id) is None
+    assert 'Borrowed Books' in client.get('/dashboard').get_data(as_text=True)
+
+
+def test_change_in_another_worker_reaches_this_one(client):
+    user_id = make_user('admin', is_admin=True).id
+    login(client, 'admin')
+    assert 'Add Book' in client.get('/dashboard').get_data(as_text=True)
+
+    # Another worker demotes the admin: its own connection and store handle, none of our events
+    with db.engine.begin() as connection:
+        connection.execute(db.update(User).where(User.id == user_id).values(is_admin=False))
+    worker = CatalogCache(SQLiteStore(flask_app.config['CATALOG_CACHE_PATH']), namespace=shared_namespace)
+    worker.invalidate(f'user:{user_id}')
+    assert 'Add Book' not in client.get('/dashboard').get_data(as_text=True)
+
+
+def test_password_reset_invalidates_entry(client):
+    user = make_user()
+    login(client)
+    client.get('/dashboard')
+    assert cached_identity(user.id) is not None
+
+    token = URLSafeTimedSerializer(flask_app.config['SECRET_KEY']).dumps(user.email, salt='password-reset')
+    client.post(f'/reset_password/{token}', data={'password': 'changed'})
+    assert cached_identity(user.id) is None
+
+
+def test_deleted_user_is_logged_out(client):
+    user = make_user()
+    login(client)
+    client.get('/dashboard')
+
+    db.session.delete(db.session.get(User, user.id))
+    db.session.commit()
+    assert client.get('/dashboard').status_code == 302
+
+
+def test_turning_the_catalog_cache_off_keeps_identities_shared(tmp_path):
+    # Configuration is read at import, so look at a freshly imported app
+    script = ('import app; print(app.identity_cache.store.name, app.catalog_cache.store.name, '
+              'app.catalog_cache.enabled)')
+    env = dict(os.environ, CATALOG_CACHE='off', CATALOG_CACHE_PATH=str(tmp_path / 'cache.db'),
+               DATABASE_URL='sqlite:///' + str(tmp_path / 'library.db'), OUTBOX_DISPATCHER_THREAD='0')
+    output = subprocess.run([sys.executable, '-c', script], env=env, check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    assert output.split() == ['sqlite', 'memory', 'False']
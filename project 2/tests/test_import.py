@@ -0,0 +1,101 @@
+import io
+import json
+
+import pytest
+
+from app import catalog_importer, Author, Book, ImportJob
+from conftest import make_user, make_book, login
+
+
+def rows(n, start=0):
+    return [{'title': f'Title {i}', 'author': f'Author {i % 3}', 'quantity': '2'} for i in range(start, n)]
+
+
+def test_cli_imports_csv_in_batches(app, tmp_path):
+    make_book('Existing', author_name='Author 0')
+    path = tmp_path / 'catalog.csv'
+    path.write_text('title,author,description,quantity\n' + ''.join(
+        f'Title {i},Author {i % 3},Desc {i},2\n' for i in range(25)
+    ) + ',Nobody,missing title,1\n')
+
+    result = app.test_cli_runner().invoke(args=['import-catalog', str(path), '--batch-size', '10'])
+    assert result.exit_code == 0, result.output
+    assert '25 books inserted, 1 rows skipped' in result.output
+
+    assert Book.query.count() == 26
+    assert Author.query.count() == 3  # 'Author 0' was reused, not duplicated
+    assert Book.query.filter_by(title='Title 7').one().author.name == 'Author 1'
+
+
+def test_import_resumes_after_failure(app):
+    def failing():
+        yield from rows(15)
+        raise RuntimeError('disk went away')
+
+    with pytest.raises(RuntimeError):
+        catalog_importer(batch_size=10).run(failing(), 'nightly.jsonl')
+    job = ImportJob.query.one()
+    assert job.status == 'failed' and job.rows_done == 10
+    assert Book.query.count() == 10
+
+    result = catalog_importer(batch_size=10).run(iter(rows(30)), 'nightly.jsonl')
+    assert result.resumed_from == 10
+    assert result.inserted == 20
+    assert Book.query.count() == 30
+    assert ImportJob.query.one().status == 'done'
+
+
+def test_admin_endpoint_streams_jsonl_and_feeds_search(client):
+    make_user('admin', is_admin=True)
+    login(client, 'admin')
+    payload = '\n'.join(json.dumps(row) for row in rows(5)) + '\n'
+
+    response = client.post('/admin/import', data={'file': (io.BytesIO(payload.encode()), 'books.jsonl')})
+    assert response.status_code == 200
+    assert response.json['inserted'] == 5
+    assert response.json['status'] == 'done'
+
+    html = client.get('/dashboard', query_string={'search': 'title'}).get_data(as_text=True)
+    assert 'Title 4' in html
+
+
+def test_import_requires_admin(client):
+    make_user()
+    login(client)
+    response = client.post('/admin/import', data={'file': (io.BytesIO(b''), 'books.csv')})
+    assert response.status_code == 403
+
+
+def post_import(client, payload, filename):
+    return client.post('/admin/import', data={'file': (io.BytesIO(payload.encode()), filename)})
+
+
+def test_rows_with_bad_quantities_or_fields_are_skipped(client):
+    make_user('admin', is_admin=True)
+    login(client, 'admin')
+    response = post_import(client, 'title,author,quantity\nX,Y,-3\nZ,Y,0\nHuge,Y,10000000000000000000000\n'
+                                   'Kept,Y,2\n', 'books.csv')
+    assert (response.json['inserted'], response.json['skipped']) == (1, 3)
+
+    lines = [
+        {'title': 5, 'author': 'Y'},
+        {'title': 'T', 'author': ['Y']},
+        {'title': 'T', 'author': 'Y', 'quantity': True},
+        {'title': 'T', 'author': 'Y', 'quantity': 2.5},
+        {'title': 'T', 'author': 'New', 'description': 7},
+        {'title': 'Also kept', 'author': 'Y', 'quantity': 3},
+    ]
+    response = post_import(client, '\n'.join(json.dumps(line) for line in lines), 'books.jsonl')
+    assert (response.json['inserted'], response.json['skipped']) == (1, 5)
+
+    assert sorted(book.quantity for book in Book.query) == [2, 3]
+    assert Author.query.filter_by(name='New').count() == 0  # skipped rows add no authors
+    assert client.get('/api/v1/stats').json['totals']['copies'] == 5
+
+
+def test_jsonl_line_that_is_not_an_object_is_a_400(client):
+    make_user('admin', is_admin=True)
+    login(client, 'admin')
+    response = post_import(client, json.dumps({'title': 'T', 'author': 'A'}) + '\n"x"\n', 'books.jsonl')
+    assert response.status_code == 400
+    assert 'Line 2 is not a JSON object' in response.json['error']
@@ -0,0 +1,69 @@
+import pytest
+
+from app import request_metrics
+from conftest import make_user, make_book, login
+from metrics import normalize_sql
+
+
+def observed(histogram, labels):
+    series = histogram.series.get(labels)
+    return (sum(series[:-1]), series[-1]) if series else (0, 0.0)
+
+
+@pytest.fixture
+def metrics_settings():
+    sample_rate, slow = request_metrics.sample_rate, request_metrics.slow_query_seconds
+    yield request_metrics
+    request_metrics.sample_rate, request_metrics.slow_query_seconds = sample_rate, slow
+
+
+def test_request_is_measured_per_endpoint(client):
+    book = make_book('Measured')
+    before = observed(request_metrics.queries, ('book_details',))
+    renders = observed(request_metrics.render_time, ('book_details',))
+    client.get(f'/book/{book.id}')
+
+    count, statements = observed(request_metrics.queries, ('book_details',))
+    assert count == before[0] + 1
+    assert statements - before[1] >= 2  # the version lookup, then the book itself
+    assert observed(request_metrics.render_time, ('book_details',))[1] > renders[1]
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert '# TYPE library_request_duration_seconds histogram' in text
+    assert 'library_request_duration_seconds_bucket{endpoint="book_details",method="GET",le="+Inf"}' in text
+    assert 'library_requests_total{endpoint="book_details",method="GET",status="200"}' in text
+    assert 'library_cache_misses_total{cache="page"}' in text
+
+
+def test_unsampled_requests_are_only_counted(client, metrics_settings):
+    metrics_settings.sample_rate = 0
+    before = observed(request_metrics.latency, ('index', 'GET'))
+    counted = request_metrics.requests.values.get(('index', 'GET', 200), 0)
+    client.get('/')
+    assert observed(request_metrics.latency, ('index', 'GET')) == before
+    assert request_metrics.requests.values[('index', 'GET', 200)] == counted + 1
+
+
+def test_slow_queries_are_logged_normalized(client, metrics_settings, caplog):
+    make_user()
+    metrics_settings.slow_query_seconds = 0
+    with caplog.at_level('WARNING'):
+        login(client)
+    _, _, endpoint, sql = request_metrics.slow_queries[-1]
+    assert endpoint == 'login'
+    assert "'" not in sql
+    assert any('Slow query' in record.getMessage() for record in caplog.records)
+
+
+def test_normalize_sql():
+    assert normalize_sql("SELECT * FROM book\n WHERE id IN (?, ?, ?) AND title = 'x''y' LIMIT 10") == \
+        'SELECT * FROM book WHERE id IN (...) AND title = ? LIMIT ?'
+
+
+def test_metrics_token(app, client):
+    app.config['METRICS_TOKEN'] = 'scrape'
+    try:
+        assert client.get('/metrics').status_code == 403
+        assert client.get('/metrics', headers={'Authorization': 'Bearer scrape'}).status_code == 200
+    finally:
+        app.config['METRICS_TOKEN'] = None
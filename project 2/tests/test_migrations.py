@@ -0,0 +1,80 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import exists, func, select
+
+from app import db, drop_db, init_db, Author, Book, BorrowedBook
+
+SHIPPED_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'library.db')
+
+
+def index_names(table):
+    # From sqlite_master: the inspector leaves out expression indexes
+    with db.engine.connect() as connection:
+        return set(connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+        ).scalars())
+
+
+def test_upgrades_a_database_created_before_migrations(app):
+    drop_db()
+    shipped = sqlite3.connect(SHIPPED_DB)
+    ddl = [sql for (sql,) in shipped.execute("SELECT sql FROM sqlite_master WHERE type = 'table'")]
+    shipped.close()
+    with db.engine.begin() as connection:
+        for statement in ddl:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql("INSERT INTO author (id, name) VALUES (1, 'Kept')")
+        connection.exec_driver_sql(
+            "INSERT INTO borrowed_book (id, user_id, book_id, borrowed_at) VALUES (1, 1, 1, '2026-01-01 00:00:00')"
+        )
+    assert index_names('book') == set()
+
+    applied = init_db()
+    assert [step.split(':')[0] for step in applied] == ['1', '2', '3', '4', '5', '6', '7']
+    assert {'ix_book_title', 'ix_book_author_id'} <= index_names('book')
+    assert {'ix_borrowed_book_book_id', 'ix_borrowed_book_user_id', 'ix_borrowed_book_next_reminder_at',
+            'ix_borrowed_book_user_id_next_reminder_at'} <= index_names('borrowed_book')
+    assert 'ix_borrowed_book_due_at' not in index_names('borrowed_book')
+    assert {'ix_author_name', 'ix_author_name_lower'} <= index_names('author')
+    assert Author.query.one().name == 'Kept'
+    loan = db.session.get(BorrowedBook, 1)
+    assert loan.due_at == datetime(2026, 1, 1) + timedelta(days=app.config['LOAN_DAYS'])
+    assert loan.next_reminder_at == loan.due_at
+
+    assert init_db() == []  # nothing left to apply
+
+
+def query_plan(statement):
+    sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    with db.engine.connect() as connection:
+        return ' / '.join(row[-1] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql))
+
+
+HOT_QUERIES = {
+    'return_book: loan by book and user': lambda: select(BorrowedBook).filter_by(book_id=1, user_id=1),
+    'remove_book: loans of a book': lambda: select(BorrowedBook.id).filter_by(book_id=1),
+    'borrowed_books: loans of a user': lambda: select(BorrowedBook.id).filter_by(user_id=1),
+    'remove_author: books of an author': lambda: select(Book.id).filter_by(author_id=1),
+    'add_author: author by name': lambda: select(Author.id).filter_by(name='Someone'),
+    'add_book: author typeahead': lambda: select(Author.id, Author.name)
+        .where(func.lower(Author.name) >= 'ab', func.lower(Author.name) < 'ab\U0010ffff')
+        .order_by(func.lower(Author.name), Author.id).limit(10),
+    'overdue-scan: anything due at all': lambda: select(
+        exists().where(BorrowedBook.next_reminder_at <= datetime(2026, 1, 1))),
+    'overdue-scan: next batch of readers to remind': lambda: select(BorrowedBook.user_id).distinct()
+        .where(BorrowedBook.next_reminder_at <= datetime(2026, 1, 1), BorrowedBook.user_id > 5)
+        .order_by(BorrowedBook.user_id).limit(500),
+    'overdue-scan: due loans of a batch of readers': lambda: select(BorrowedBook.id, BorrowedBook.book_id)
+        .where(BorrowedBook.user_id.in_([1, 2, 3]), BorrowedBook.next_reminder_at <= datetime(2026, 1, 1)),
+    'dashboard: first page by title': lambda: select(Book.id).order_by(Book.title, Book.id).limit(10),
+}
+
+
+@pytest.mark.parametrize('name', HOT_QUERIES)
+def test_hot_queries_use_an_index(app, name):
+    plan = query_plan(HOT_QUERIES[name]())
+    assert 'USING INDEX' in plan or 'USING COVERING INDEX' in plan, plan
+    assert 'TEMP B-TREE' not in plan, plan
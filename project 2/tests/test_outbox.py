@@ -0,0 +1,104 @@
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db, mail, outbox_dispatcher, OutboxMessage, queue_email
+from conftest import make_user
+
+aiosmtpd = pytest.importorskip('aiosmtpd.controller')
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.peers = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content.decode()))
+        self.peers.add(session.peer)
+        return '250 OK'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def use_smtp(app):
+    """Point Flask-Mail at a local port; the original settings come back afterwards."""
+    saved = {key: app.config.get(key) for key in ('MAIL_SERVER', 'MAIL_PORT', 'MAIL_USE_TLS')}
+
+    def point_at(port):
+        app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_USE_TLS=False, MAIL_SUPPRESS_SEND=False)
+        mail.init_app(app)
+
+    yield point_at
+    app.config.update(saved)
+    app.config.pop('MAIL_SUPPRESS_SEND')
+    mail.init_app(app)
+
+
+@pytest.fixture
+def smtp(use_smtp):
+    handler = RecordingHandler()
+    port = free_port()
+    controller = aiosmtpd.Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    use_smtp(port)
+    yield handler, port
+    controller.stop()
+
+
+def test_reset_request_only_enqueues(app, client):
+    make_user()
+    response = client.post('/reset_password_request', data={'email': 'reader@example.com'})
+    assert response.status_code == 302
+
+    message = OutboxMessage.query.one()
+    assert message.status == 'pending'
+    assert message.recipient == 'reader@example.com'
+    assert '/reset_password/' in message.body
+
+
+def test_dispatcher_sends_batch_over_one_connection(smtp):
+    handler, _ = smtp
+    for i in range(5):
+        queue_email(f'user{i}@example.com', 'Hello', f'Message {i}')
+
+    assert outbox_dispatcher.drain() == 5
+    assert len(handler.messages) == 5
+    assert len(handler.peers) == 1
+    assert {m.status for m in OutboxMessage.query} == {'sent'}
+
+
+def test_outage_is_retried_with_backoff(smtp, use_smtp):
+    handler, port = smtp
+    queue_email('later@example.com', 'Hello', 'Body')
+
+    use_smtp(free_port())  # nothing listening there
+    assert outbox_dispatcher.dispatch_once() == 0
+    message = OutboxMessage.query.one()
+    assert message.status == 'pending'
+    assert message.attempts == 1
+    assert message.next_attempt_at > datetime.utcnow()
+    assert outbox_dispatcher.dispatch_once() == 0  # not due yet
+
+    use_smtp(port)
+    message.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert outbox_dispatcher.dispatch_once() == 1
+    assert handler.messages[0][0] == ['later@example.com']
+
+
+def test_gives_up_after_max_attempts(use_smtp):
+    use_smtp(free_port())
+    queue_email('never@example.com', 'Hello', 'Body')
+    message = OutboxMessage.query.one()
+    for _ in range(outbox_dispatcher.max_attempts):
+        message.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        outbox_dispatcher.dispatch_once()
+    assert message.status == 'failed'
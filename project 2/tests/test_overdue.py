@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from app import db, overdue_scanner, BorrowedBook, OutboxMessage
+from conftest import make_book, make_user
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+def lend(user, book, days_overdue):
+    due_at = NOW - timedelta(days=days_overdue)
+    loan = BorrowedBook(user_id=user.id, book_id=book.id, borrowed_at=due_at - timedelta(days=14), due_at=due_at)
+    db.session.add(loan)
+    db.session.commit()
+    return loan.id
+
+
+def test_new_loans_are_due_after_the_loan_period(app):
+    user, book = make_user(), make_book('Dune')
+    db.session.add(BorrowedBook(user_id=user.id, book_id=book.id))
+    db.session.commit()
+    loan = BorrowedBook.query.one()
+    assert loan.due_at - loan.borrowed_at == timedelta(days=app.config['LOAN_DAYS'])
+    assert loan.next_reminder_at == loan.due_at
+
+
+def test_one_digest_per_reader(app):
+    alice, bob = make_user('alice'), make_user('bob')
+    dune, emma, ulysses = make_book('Dune'), make_book('Emma'), make_book('Ulysses')
+    lend(alice, dune, 3)
+    lend(alice, emma, 10)
+    lend(bob, ulysses, 1)
+    lend(bob, dune, -2)  # not due yet
+
+    result = overdue_scanner().scan(NOW)
+    assert (result.readers, result.loans) == (2, 3)
+
+    messages = {m.recipient: m for m in OutboxMessage.query.all()}
+    assert set(messages) == {'alice@example.com', 'bob@example.com'}
+    assert messages['alice@example.com'].subject == '2 overdue books'
+    body = messages['alice@example.com'].body
+    assert body.index('Emma') < body.index('Dune')  # longest overdue first
+    assert '10 days overdue' in body
+    assert 'Dune' not in messages['bob@example.com'].body
+
+
+def test_reminders_are_not_repeated_until_due_again(app):
+    user, book = make_user(), make_book('Dune')
+    lend(user, book, 3)
+    scanner = overdue_scanner()
+
+    assert scanner.scan(NOW).readers == 1
+    assert scanner.scan(NOW + timedelta(days=1)).readers == 0
+    assert scanner.scan(NOW + timedelta(days=app.config['OVERDUE_REMIND_EVERY'], hours=1)).readers == 1
+    assert OutboxMessage.query.count() == 2
+
+
+def test_small_batches_cover_every_loan(app):
+    users = [make_user(f'reader{n}') for n in range(3)]
+    books = [make_book(f'Book {n}', quantity=5) for n in range(4)]
+    loan_ids = {lend(users[n % 3], books[n % 4], n % 5 + 1) for n in range(11)}  # several share a due_at
+
+    result = overdue_scanner(batch_size=2).scan(NOW)
+    assert (result.readers, result.loans) == (3, len(loan_ids))
+    assert OutboxMessage.query.count() == 3
+    assert BorrowedBook.query.filter(BorrowedBook.next_reminder_at <= NOW).count() == 0
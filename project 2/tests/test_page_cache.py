@@ -0,0 +1,74 @@
+from flask import g
+
+from app import Author
+from conftest import make_user, make_book, login
+
+
+def test_repeat_visit_gets_304(client):
+    book = make_book('Cached', quantity=2)
+    first = client.get(f'/book/{book.id}')
+    assert first.status_code == 200
+    assert first.headers['ETag']
+
+    again = client.get(f'/book/{book.id}', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.get_data() == b''
+
+
+def test_cache_hit_skips_queries_and_render(client):
+    book = make_book('Cached')
+    client.get(f'/book/{book.id}')
+    with client:
+        response = client.get(f'/book/{book.id}')
+        assert response.status_code == 200
+        assert 'Cached' in response.get_data(as_text=True)
+        assert g.query_count == 1  # the version lookup
+
+
+def test_borrow_bumps_book_version(client):
+    make_user()
+    book = make_book('Cached', quantity=2)
+    login(client)
+    before = client.get(f'/book/{book.id}')
+    assert 'Available Copies:</strong> 2' in before.get_data(as_text=True)
+
+    client.post(f'/borrow_book/{book.id}')
+    after = client.get(f'/book/{book.id}', headers={'If-None-Match': before.headers['ETag']})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert 'Available Copies:</strong> 1' in after.get_data(as_text=True)
+
+
+def test_if_modified_since(client):
+    make_user('admin', is_admin=True)
+    login(client, 'admin')
+    client.post('/add_author', data={'name': 'Fresh', 'bio': ''})
+    author = Author.query.filter_by(name='Fresh').one()
+
+    first = client.get(f'/author/{author.id}')
+    assert first.headers['Last-Modified']
+    again = client.get(f'/author/{author.id}', headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert again.status_code == 304
+
+
+def test_adding_a_book_refreshes_author_page(client):
+    make_user('admin', is_admin=True)
+    book = make_book('First', author_name='Writer')
+    login(client, 'admin')
+    before = client.get(f'/author/{book.author_id}')
+
+    client.post('/add_book', data={'title': 'Second', 'quantity': 1, 'author_id': book.author_id})
+    after = client.get(f'/author/{book.author_id}', headers={'If-None-Match': before.headers['ETag']})
+    assert after.status_code == 200
+    assert 'Second' in after.get_data(as_text=True)
+
+
+def test_variants_do_not_leak_between_roles(client):
+    make_user('admin', is_admin=True)
+    book = make_book('Cached')
+    login(client, 'admin')
+    assert 'Add Book' in client.get(f'/book/{book.id}').get_data(as_text=True)
+
+    client.get('/logout')
+    anonymous = client.get(f'/book/{book.id}')
+    assert 'Add Book' not in anonymous.get_data(as_text=True)
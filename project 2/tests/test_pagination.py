@@ -0,0 +1,55 @@
+import re
+
+from app import Book
+from conftest import make_user, make_book, login
+from pagination import KeysetPagination, decode_cursor, encode_cursor
+
+
+def test_cursor_walks_forward_and_back_without_gaps(app):
+    for i in range(25):
+        make_book(f'Title {i % 7}')  # duplicate titles exercise the id tiebreak
+    expected = [book.id for book in Book.query.order_by(Book.title, Book.id)]
+
+    pages, cursor = [], None
+    while True:
+        page = KeysetPagination(Book.query, (Book.title, Book.id), cursor=cursor, per_page=10)
+        pages.append(page)
+        if not page.has_next:
+            break
+        cursor = page.next_cursor
+
+    assert [book.id for page in pages for book in page.items] == expected
+    assert [page.has_prev for page in pages] == [False, True, True]
+    assert pages[0].total == 25
+
+    back = KeysetPagination(Book.query, (Book.title, Book.id), cursor=pages[2].prev_cursor, per_page=10)
+    assert [book.id for book in back.items] == [book.id for book in pages[1].items]
+    assert back.has_prev and back.has_next
+
+
+def test_malformed_cursor_falls_back_to_first_page(app):
+    make_book('Only')
+    assert decode_cursor('not a cursor!') is None
+    page = KeysetPagination(Book.query, (Book.title, Book.id), cursor='garbage', per_page=10)
+    assert [book.title for book in page.items] == ['Only']
+    assert not page.has_prev
+
+    nested = encode_cursor([{'a': 1}, 2], 'next')
+    assert decode_cursor(nested) is None
+    page = KeysetPagination(Book.query, (Book.title, Book.id), cursor=nested, per_page=10)
+    assert [book.title for book in page.items] == ['Only']
+
+
+def test_dashboard_links_use_cursors(client):
+    make_user()
+    for i in range(12):
+        make_book(f'Book {i:02d}')
+    login(client)
+
+    html = client.get('/dashboard').get_data(as_text=True)
+    assert 'Book 09' in html and 'Book 10' not in html
+    cursor = re.search(r'cursor=([\w-]+)">Next', html).group(1)
+
+    html = client.get('/dashboard', query_string={'cursor': cursor}).get_data(as_text=True)
+    assert 'Book 10' in html and 'Book 11' in html and 'Book 09' not in html
+    assert '>Previous<' in html and '>Next<' not in html
@@ -0,0 +1,38 @@
+import pytest
+
+from app import db, Author, BorrowedBook, QueryBudgetExceeded
+from conftest import make_user, make_book, login
+
+
+@pytest.fixture
+def catalog(app):
+    admin = make_user('admin', is_admin=True)
+    books = [make_book(f'Book {i}', author_name=f'Author {i}') for i in range(10)]
+    for i, book in enumerate(books):
+        reader = make_user(f'reader{i}')
+        db.session.add(BorrowedBook(user_id=reader.id, book_id=book.id))
+        db.session.add(BorrowedBook(user_id=admin.id, book_id=book.id))
+    for i in range(10):
+        make_book(f'Extra {i}', author_name='Prolific')
+    db.session.commit()
+    app.config['QUERY_BUDGET'] = 3
+    yield
+    app.config['QUERY_BUDGET'] = None
+
+
+@pytest.mark.parametrize('url', ['/dashboard', '/dashboard?search=book', '/borrowed_books'])
+def test_listing_pages_stay_within_budget(client, catalog, url):
+    login(client, 'admin')
+    assert client.get(url).status_code == 200
+
+
+def test_author_details_stays_within_budget(client, catalog):
+    author = Author.query.filter_by(name='Prolific').one()
+    assert client.get(f'/author/{author.id}').status_code == 200
+
+
+def test_guard_fails_routes_over_budget(app, client, catalog):
+    app.config['QUERY_BUDGET'] = 1
+    login(client, 'admin')
+    with pytest.raises(QueryBudgetExceeded):
+        client.get('/dashboard')
@@ -0,0 +1,49 @@
+from app import db, Author, Book
+from conftest import make_user, make_book, login
+
+
+def dashboard_titles(client, query):
+    response = client.get('/dashboard', query_string={'search': query})
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    return [book.title for book in Book.query.order_by(Book.id) if book.title in html]
+
+
+def test_search_matches_title_description_and_author(client):
+    make_user()
+    make_book('The Hobbit', author_name='Tolkien')
+    make_book('Dune', author_name='Herbert', description='Desert planet politics')
+    make_book('Emma', author_name='Austen')
+    login(client)
+
+    assert dashboard_titles(client, 'hobbit') == ['The Hobbit']
+    assert dashboard_titles(client, 'desert') == ['Dune']
+    assert dashboard_titles(client, 'austen') == ['Emma']
+
+
+def test_search_supports_prefixes_and_ranks_title_hits_first(client):
+    make_user()
+    make_book('Notes', author_name='Someone', description='A book about dragons')
+    make_book('Dragonflight', author_name='McCaffrey')
+    login(client)
+
+    html = client.get('/dashboard', query_string={'search': 'drag'}).get_data(as_text=True)
+    assert html.index('Dragonflight') < html.index('Notes')
+
+
+def test_index_follows_book_and_author_changes(app, client):
+    make_user()
+    book = make_book('Old Title', author_name='Anon')
+    login(client)
+
+    book = db.session.get(Book, book.id)
+    book.title = 'Brand New Title'
+    Author.query.filter_by(name='Anon').one().name = 'Pseudonymous'
+    db.session.commit()
+    assert dashboard_titles(client, 'brand') == ['Brand New Title']
+    assert dashboard_titles(client, 'pseudonym') == ['Brand New Title']
+    assert dashboard_titles(client, 'old') == []
+
+    db.session.delete(book)
+    db.session.commit()
+    assert dashboard_titles(client, 'brand') == []
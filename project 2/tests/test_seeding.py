@@ -0,0 +1,44 @@
+from sqlalchemy import func
+
+from app import db, seed_generator, Author, Book, BorrowedBook, User
+from conftest import login
+
+
+def test_seed_generates_consistent_data(app):
+    result = seed_generator(seed=7, batch_size=50).run(users=40, authors=10, books=200, loans=120)
+    assert result.counts == {'users': 40, 'authors': 10, 'books': 200, 'loans': 120}
+    assert User.query.count() == 41  # plus one admin
+    assert BorrowedBook.query.count() == 120
+
+    # borrowed matches the open loans and never exceeds the copies
+    loans = dict(db.session.query(BorrowedBook.book_id, func.count()).group_by(BorrowedBook.book_id))
+    for book in Book.query:
+        assert book.borrowed == loans.get(book.id, 0) <= book.quantity
+
+    # skewed: the busiest author has several times the average number of books
+    per_author = db.session.query(func.count()).select_from(Book).group_by(Book.author_id).all()
+    assert max(count for (count,) in per_author) > 3 * 200 / 10
+
+
+def test_seed_is_repeatable(app):
+    seed_generator(seed=3).run(users=5, authors=3, books=20, loans=10)
+    first = [(b.title, b.quantity, b.borrowed) for b in Book.query.order_by(Book.id)]
+    db.session.query(BorrowedBook).delete()
+    db.session.query(Book).delete()
+    db.session.query(Author).delete()
+    db.session.query(User).delete()
+    db.session.commit()
+
+    seed_generator(seed=3).run(users=5, authors=3, books=20, loans=10)
+    assert [(b.title, b.quantity, b.borrowed) for b in Book.query.order_by(Book.id)] == first
+
+
+def test_cli_seeds_and_accounts_can_log_in(app, client):
+    result = app.test_cli_runner().invoke(
+        args=['seed-data', '--users', '3', '--authors', '2', '--books', '10', '--loans', '4']
+    )
+    assert result.exit_code == 0, result.output
+    assert '3 readers, 2 authors, 10 books, 4 loans' in result.output
+
+    reader = User.query.filter_by(is_admin=False).first()
+    assert login(client, reader.username, 'password').status_code == 302
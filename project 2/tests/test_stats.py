@@ -0,0 +1,88 @@
+from flask import g
+
+from app import catalog_importer, catalog_stats, seed_generator, Book
+from conftest import make_user, make_book, login
+
+
+def totals():
+    return catalog_stats.totals()
+
+
+def test_writes_keep_statistics_current(client):
+    make_user('admin', is_admin=True)
+    make_user('reader')
+    login(client, 'admin')
+    client.post('/add_book', data={'title': 'Counted', 'quantity': 3, 'new_author_name': 'Writer'})
+    book_id = Book.query.filter_by(title='Counted').one().id
+    assert totals() == {'titles': 1, 'copies': 3, 'on_loan': 0}
+
+    client.get('/logout')
+    login(client, 'reader')
+    client.post(f'/borrow_book/{book_id}')
+    client.post(f'/borrow_book/{book_id}')
+    client.post(f'/return_book/{book_id}')
+    assert totals() == {'titles': 1, 'copies': 3, 'on_loan': 1}
+    assert catalog_stats.snapshot()['most_borrowed'] == [{'id': book_id, 'name': 'Counted', 'count': 2}]
+
+    client.get('/logout')
+    login(client, 'admin')
+    client.get(f'/remove_book/{book_id}')
+    assert totals() == {'titles': 0, 'copies': 0, 'on_loan': 0}
+    assert catalog_stats.snapshot()['most_borrowed'] == []
+    assert catalog_stats.reconcile(fix=False) == []
+
+
+def test_refused_borrow_changes_nothing(client):
+    make_user()
+    book_id = make_book('Scarce', quantity=1).id
+    catalog_stats.reconcile()
+    login(client)
+    client.post(f'/borrow_book/{book_id}')
+    client.post(f'/borrow_book/{book_id}')  # no copy left
+    assert totals()['on_loan'] == 1
+
+
+def test_stats_page_and_api_read_a_few_rows(client):
+    make_user('admin', is_admin=True)
+    make_book('One', author_name='Prolific')
+    make_book('Two', author_name='Prolific')
+    catalog_stats.reconcile()
+    login(client, 'admin')
+    client.get('/dashboard')  # warm the identity cache
+
+    with client:
+        data = client.get('/api/v1/stats').get_json()
+        assert g.query_count == 3  # totals, top authors, most borrowed
+    assert data['totals']['titles'] == 2
+    assert data['top_authors'][0]['name'] == 'Prolific'
+    assert data['top_authors'][0]['count'] == 2
+    assert 'Prolific' in client.get('/admin/stats').get_data(as_text=True)
+
+
+def test_stats_are_for_admins(client):
+    make_user()
+    login(client)
+    assert client.get('/api/v1/stats').status_code == 403
+    assert client.get('/admin/stats').status_code == 302
+
+
+def test_reconcile_reports_and_fixes_drift(app):
+    make_book('Unrecorded', quantity=2)  # written straight to the table, bypassing the counters
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=['reconcile-stats', '--dry-run'])
+    assert result.exit_code == 1
+    assert 'titles: stored 0, actual 1' in result.output
+    assert 'copies: stored 0, actual 2' in result.output
+
+    assert runner.invoke(args=['reconcile-stats']).exit_code == 0
+    assert 'consistent' in runner.invoke(args=['reconcile-stats', '--dry-run']).output
+
+
+def test_bulk_writers_keep_statistics_consistent(app):
+    catalog_importer(batch_size=3).run(
+        [{'title': f'Imported {i}', 'author': f'Author {i % 2}', 'quantity': '2'} for i in range(7)], 'stats-test'
+    )
+    seed_generator(seed=1).run(users=5, authors=3, books=30, loans=10)
+    assert catalog_stats.reconcile(fix=False) == []
+    assert totals()['titles'] == 37